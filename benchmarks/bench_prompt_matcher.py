@@ -0,0 +1,84 @@
+"""
+提示符匹配微基准：对比旧的 8KB 尾部窗口匹配与 StreamingPromptMatcher 的单块开销。
+
+用法（在仓库根目录）：
+    python benchmarks/bench_prompt_matcher.py [--size-mb 40] [--chunk 16384]
+"""
+import os
+import re
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from connection.prompt_matcher import StreamingPromptMatcher, compile_prompt  # noqa: E402
+from connection.utils import ConnectionUtils  # noqa: E402
+
+
+def build_chunks(size_mb: int, chunk_size: int):
+    """构造类似 display current-configuration 的回显，末尾带提示符"""
+    line = b" interface GigabitEthernet0/0/1\r\n  description uplink-to-core-01\r\n  ip address 10.0.0.1 255.255.255.0\r\n#\r\n"
+    body = line * (size_mb * 1024 * 1024 // len(line)) + b"\r\n<HUAWEI-CORE-01>"
+    return [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)]
+
+
+def legacy_tail_match(chunks, pattern):
+    """旧实现：维护 8KB bytearray，每块 bytes(tail) 后全量 search"""
+    tail = bytearray()
+    tail_keep = 8192
+    hits = 0
+    for data in chunks:
+        tail.extend(data)
+        if len(tail) > tail_keep:
+            del tail[:len(tail) - tail_keep]
+        if pattern.search(bytes(tail)):
+            hits += 1
+    return hits
+
+
+def streaming_match(chunks, pattern):
+    matcher = StreamingPromptMatcher(pattern)
+    hits = 0
+    for data in chunks:
+        if matcher.feed(data):
+            hits += 1
+    return hits
+
+
+def run(label, func, chunks, pattern, repeat):
+    best = None
+    hits = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        hits = func(chunks, pattern)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    per_chunk_us = best / len(chunks) * 1e6
+    print(f"{label:<28} 总耗时 {best * 1000:8.2f} ms  单块 {per_chunk_us:7.2f} us  命中 {hits}")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="提示符匹配微基准")
+    parser.add_argument("--size-mb", type=int, default=40)
+    parser.add_argument("--chunk", type=int, default=16384)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    chunks = build_chunks(args.size_mb, args.chunk)
+    print(f"数据量 {args.size_mb}MB, 块大小 {args.chunk}B, 块数 {len(chunks)}")
+
+    patterns = [
+        ("字面量提示符", compile_prompt(b"<HUAWEI-CORE-01>")),
+        ("通用提示符", re.compile(ConnectionUtils.GENERIC_PROMPT_BYTES)),
+    ]
+    for name, pattern in patterns:
+        print(f"-- {name}")
+        legacy = run("legacy 8KB tail", legacy_tail_match, chunks, pattern, args.repeat)
+        streaming = run("StreamingPromptMatcher", streaming_match, chunks, pattern, args.repeat)
+        print(f"加速比 {legacy / streaming:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+SSH 传输画像基准：对每个传输画像（压缩/密码算法/窗口/包长/读块）测量大输出命令的
+吞吐（MB/s）、本进程 CPU 占用（CPU%）与单位数据 CPU 开销（CPU 毫秒/MB，即 CPU% 每 MB/s 的 10 倍）。
+
+用法（在仓库根目录）：
+    # 本机回环：子进程启动 paramiko SSH 服务端，输出类似配置文件的文本（服务端 CPU 不计入）
+    python benchmarks/bench_ssh_transport.py --loopback [--size-mb 40]
+    # 真实设备：通过 exec 通道执行大输出命令
+    python benchmarks/bench_ssh_transport.py --host 192.168.1.1 --user admin --password xxx \\
+        --command "display current-configuration" [--profiles lan,wan]
+"""
+import os
+import sys
+import time
+import socket
+import logging
+import argparse
+import threading
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import paramiko  # noqa: E402
+
+from connection.ssh_tuning import TRANSPORT_PROFILES  # noqa: E402
+
+CONFIG_LINE = b" interface GigabitEthernet0/0/1\r\n  description uplink-to-core-01\r\n  ip address 10.0.0.1 255.255.255.0\r\n#\r\n"
+
+
+class _BenchServer(paramiko.ServerInterface):
+    """回环服务端：接受任意口令，exec 请求返回 size 字节的配置文本"""
+
+    def check_auth_password(self, username, password):
+        return paramiko.AUTH_SUCCESSFUL
+
+    def get_allowed_auths(self, username):
+        return 'password'
+
+    def check_channel_request(self, kind, chanid):
+        return paramiko.OPEN_SUCCEEDED if kind == 'session' else paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_exec_request(self, channel, command):
+        return True
+
+
+def _serve_connection(sock, host_key, size):
+    transport = paramiko.Transport(sock)
+    transport.add_server_key(host_key)
+    transport.use_compression(True)  # 允许客户端按画像选择是否压缩
+    transport.start_server(server=_BenchServer())
+    channel = transport.accept(20)
+    if channel is None:
+        transport.close()
+        return
+    block = CONFIG_LINE * (65536 // len(CONFIG_LINE))
+    sent = 0
+    while sent < size:
+        piece = block[:size - sent]
+        channel.sendall(piece)
+        sent += len(piece)
+    channel.send_exit_status(0)
+    channel.close()
+    # 等客户端读完并断开，过早关闭会使客户端的窗口调整报文写入失败
+    deadline = time.time() + 30
+    while transport.is_active() and time.time() < deadline:
+        time.sleep(0.05)
+    transport.close()
+
+
+def _loopback_server(port_queue, size):
+    # 客户端测完即断开，服务端的连接重置日志无意义
+    logging.getLogger('paramiko').setLevel(logging.CRITICAL)
+    host_key = paramiko.RSAKey.generate(2048)
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(8)
+    port_queue.put(listener.getsockname()[1])
+    while True:
+        sock, _ = listener.accept()
+        threading.Thread(target=_serve_connection, args=(sock, host_key, size), daemon=True).start()
+
+
+def run_profile(profile, host, port, user, password, command):
+    """按画像建立连接并通过 exec 通道读取全部输出，返回 (字节数, 墙钟秒, CPU 秒, 协商密码算法, 是否压缩)"""
+    client = paramiko.SSHClient()
+    client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    client.connect(hostname=host, port=port, username=user, password=password, timeout=10,
+                   compress=profile.compress, look_for_keys=False, allow_agent=False,
+                   transport_factory=profile.transport_factory())
+    transport = client.get_transport()
+    try:
+        channel = transport.open_session()
+        cpu_start = time.process_time()
+        start = time.perf_counter()
+        channel.exec_command(command)
+        total = 0
+        while True:
+            data = channel.recv(profile.chunk_size)
+            if not data:
+                break
+            total += len(data)
+        wall = time.perf_counter() - start
+        cpu = time.process_time() - cpu_start
+        return total, wall, cpu, transport.remote_cipher, transport.remote_compression != 'none'
+    finally:
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SSH 传输画像基准")
+    parser.add_argument("--loopback", action="store_true", help="使用本机回环服务端")
+    parser.add_argument("--size-mb", type=int, default=40, help="回环模式的输出大小")
+    parser.add_argument("--host")
+    parser.add_argument("--port", type=int, default=22)
+    parser.add_argument("--user", default="bench")
+    parser.add_argument("--password", default="bench")
+    parser.add_argument("--command", default="display current-configuration")
+    parser.add_argument("--profiles", default=",".join(TRANSPORT_PROFILES), help="逗号分隔的画像名")
+    parser.add_argument("--repeat", type=int, default=2)
+    args = parser.parse_args()
+
+    server = None
+    host, port = args.host, args.port
+    if args.loopback:
+        port_queue = multiprocessing.Queue()
+        server = multiprocessing.Process(target=_loopback_server,
+                                         args=(port_queue, args.size_mb * 1024 * 1024), daemon=True)
+        server.start()
+        host, port = '127.0.0.1', port_queue.get(timeout=30)
+    elif not host:
+        parser.error("需指定 --host 或 --loopback")
+
+    print(f"目标 {host}:{port}, 命令 {args.command!r}, CPU 核数 {os.cpu_count()}")
+    print(f"{'画像':<10}{'密码算法':<26}{'压缩':<6}{'MB/s':>9}{'CPU%':>8}{'CPU ms/MB':>11}")
+    try:
+        for name in args.profiles.split(","):
+            profile = TRANSPORT_PROFILES.get(name.strip())
+            if profile is None:
+                print(f"{name:<10}未知画像，跳过")
+                continue
+            best = None
+            for _ in range(args.repeat):
+                result = run_profile(profile, host, port, args.user, args.password, args.command)
+                if best is None or result[1] < best[1]:
+                    best = result
+            total, wall, cpu, cipher, compressed = best
+            mb = total / 1024 / 1024
+            print(f"{profile.name:<10}{cipher:<26}{'是' if compressed else '否':<6}"
+                  f"{mb / wall:>9.1f}{cpu / wall * 100:>8.0f}{cpu * 1000 / max(mb, 1e-9):>11.1f}")
+    finally:
+        if server is not None:
+            server.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+from .sections import SectionIndex
+from .histogram import diff_lines
+from .normalize import MaskRule, RuleBook
+from .tables import TableSpec
+from .section_diff import CompareReport, SectionDiff, compare_files
+
+__all__ = [
+    'SectionIndex',
+    'diff_lines',
+    'MaskRule',
+    'RuleBook',
+    'TableSpec',
+    'CompareReport',
+    'SectionDiff',
+    'compare_files'
+]
@@ -0,0 +1,54 @@
+"""
+命令行比对（无需 GUI，可在 Linux 跳板机上自动化执行）：
+    python -m compare 变更前文件 变更后文件 [-o 报告文件] [--commands command.txt] [-U 3] [--all]
+                      [--rules 规则文件.json] [--vendor huawei] [--no-normalize] [--no-tables]
+退出码：0 两个文件一致，1 存在差异，2 参数或文件错误。
+"""
+import os
+import sys
+import logging
+import argparse
+
+from .normalize import RuleBook
+from .section_diff import compare_files
+
+
+def _read_commands(path: str):
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m compare', description='按命令块比对变更前/变更后采集文件')
+    parser.add_argument('before', help='变更前采集文件（.txt/.log 或 .cap）')
+    parser.add_argument('after', help='变更后采集文件（.txt/.log 或 .cap）')
+    parser.add_argument('-o', '--output', help='报告输出文件（默认输出到标准输出）')
+    parser.add_argument('--commands', help='命令文件，用于识别命令块边界')
+    parser.add_argument('-U', '--context', type=int, default=3, help='差异上下文行数（默认 3）')
+    parser.add_argument('--all', action='store_true', help='报告中也列出相同的命令块')
+    parser.add_argument('--rules', help='追加的易变字段规范化规则文件（JSON）')
+    parser.add_argument('--vendor', help='规范化规则使用的厂商（默认按变更前文件识别）')
+    parser.add_argument('--no-normalize', action='store_true', help='不屏蔽易变字段，按原始回显比对')
+    parser.add_argument('--no-tables', action='store_true', help='表格型命令也按行比对（不按记录键比对）')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format='%(levelname)s %(message)s')
+    for path in (args.before, args.after):
+        if not os.path.isfile(path):
+            print(f"文件不存在: {path}", file=sys.stderr)
+            return 2
+    commands = _read_commands(args.commands) if args.commands else None
+
+    report = compare_files(args.before, args.after, commands=commands, context=max(0, args.context),
+                           normalize=not args.no_normalize, rules=RuleBook.load(args.rules), vendor=args.vendor,
+                           tables=not args.no_tables)
+    if args.output:
+        report.write(args.output, include_unchanged=args.all)
+        print(report.summary())
+    else:
+        sys.stdout.write(report.text(include_unchanged=args.all))
+    return 0 if report.identical else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
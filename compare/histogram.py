@@ -0,0 +1,183 @@
+import difflib
+from bisect import bisect_left
+from typing import Dict, List, Sequence, Tuple
+
+# 某行在区域 A 中出现次数超过该值时不作为匹配种子（如空行、分隔线），避免退化为 O(N*M)
+MAX_CHAIN = 64
+# 找不到低频公共行的区域，不超过该规模时交给 difflib 细比，否则整体视为替换
+FALLBACK_LIMIT = 2000
+
+Opcode = Tuple[str, int, int, int, int]
+
+
+def _find_lcs(a: Sequence[bytes], alo: int, ahi: int,
+              b: Sequence[bytes], blo: int, bhi: int) -> Tuple[int, int, int]:
+    """
+    histogram diff 的核心：在 a[alo:ahi] / b[blo:bhi] 中找一段以"在 A 中出现次数最少"的行为种子的公共片段，
+    次数相同时取最长的片段。返回 (i, j, size)，size 为 0 表示没有可用的公共行。
+    """
+    positions: Dict[bytes, List[int]] = {}
+    for i in range(alo, ahi):
+        positions.setdefault(a[i], []).append(i)
+
+    best_i = best_j = best_size = 0
+    best_count = MAX_CHAIN
+    j = blo
+    while j < bhi:
+        next_j = j + 1
+        occurrences = positions.get(b[j])
+        if occurrences is not None and len(occurrences) <= best_count:
+            for i in occurrences:
+                # 向两侧扩展公共片段
+                si, sj = i, j
+                while si > alo and sj > blo and a[si - 1] == b[sj - 1]:
+                    si -= 1
+                    sj -= 1
+                ei, ej = i + 1, j + 1
+                while ei < ahi and ej < bhi and a[ei] == b[ej]:
+                    ei += 1
+                    ej += 1
+                size = ei - si
+                count = len(occurrences)
+                if count < best_count or (count == best_count and size > best_size):
+                    best_i, best_j, best_size, best_count = si, sj, size, count
+                # 已覆盖的 B 行无需再作为种子
+                next_j = max(next_j, ej)
+        j = next_j
+    return best_i, best_j, best_size
+
+
+def _unique_anchors(a: Sequence[bytes], alo: int, ahi: int,
+                    b: Sequence[bytes], blo: int, bhi: int) -> List[Tuple[int, int]]:
+    """
+    patience diff 的锚点：两侧都只出现一次的行，取其在 B 中位置的最长递增子序列（O(n log n)），
+    一次得到整个区域的对齐骨架，避免 histogram 逐段切分时反复为剩余区域建索引。
+    """
+    seen: Dict[bytes, List[int]] = {}
+    for i in range(alo, ahi):
+        entry = seen.get(a[i])
+        if entry is None:
+            seen[a[i]] = [i, -1]
+        else:
+            entry[0] = -1
+    for j in range(blo, bhi):
+        entry = seen.get(b[j])
+        if entry is not None and entry[0] >= 0:
+            # -1：尚未出现；-2：在 B 中重复
+            entry[1] = j if entry[1] == -1 else -2
+    pairs = [(i, j) for i, j in seen.values() if i >= 0 and j >= 0]
+    if not pairs:
+        return []
+    pairs.sort()
+
+    # 按 A 的顺序求 B 位置的最长递增子序列
+    tails: List[int] = []        # 各长度递增子序列的最小结尾（B 位置）
+    tail_index: List[int] = []   # 对应 pairs 下标
+    previous = [-1] * len(pairs)
+    for k, (_, j) in enumerate(pairs):
+        pos = bisect_left(tails, j)
+        if pos == len(tails):
+            tails.append(j)
+            tail_index.append(k)
+        else:
+            tails[pos] = j
+            tail_index[pos] = k
+        previous[k] = tail_index[pos - 1] if pos else -1
+    anchors = []
+    k = tail_index[-1]
+    while k >= 0:
+        anchors.append(pairs[k])
+        k = previous[k]
+    anchors.reverse()
+    return anchors
+
+
+def diff_lines(a: Sequence[bytes], b: Sequence[bytes]) -> List[Opcode]:
+    """
+    计算两组行的差异，返回与 difflib.SequenceMatcher.get_opcodes 相同格式的操作序列
+    （'equal' / 'replace' / 'delete' / 'insert', i1, i2, j1, j2）。
+    每个区域先用 patience diff 以两侧唯一的公共行对齐，锚点之间的区域再递归处理；
+    没有唯一公共行时退回 histogram diff（以低频公共行切分）。
+    对大文件只需线性扫描加少量哈希表，不会像 LCS 动态规划那样随行数平方增长。
+    """
+    matches: List[Tuple[int, int, int]] = []
+    # 显式栈代替递归，避免超长差异区域触发递归深度限制
+    stack = [(0, len(a), 0, len(b))]
+    while stack:
+        alo, ahi, blo, bhi = stack.pop()
+        # 先去掉首尾相同的行
+        head = 0
+        while alo + head < ahi and blo + head < bhi and a[alo + head] == b[blo + head]:
+            head += 1
+        if head:
+            matches.append((alo, blo, head))
+            alo += head
+            blo += head
+        tail = 0
+        while alo < ahi - tail and blo < bhi - tail and a[ahi - tail - 1] == b[bhi - tail - 1]:
+            tail += 1
+        if tail:
+            ahi -= tail
+            bhi -= tail
+            matches.append((ahi, bhi, tail))
+        if alo == ahi or blo == bhi:
+            continue
+
+        anchors = _unique_anchors(a, alo, ahi, b, blo, bhi)
+        if anchors:
+            pa, pb = alo, blo
+            run_i = run_j = run_size = 0
+            for i, j in anchors:
+                if i == pa and j == pb and run_size:
+                    # 与上一个锚点相邻，合并为一段
+                    run_size += 1
+                else:
+                    if run_size:
+                        matches.append((run_i, run_j, run_size))
+                    if i > pa or j > pb:
+                        stack.append((pa, i, pb, j))
+                    run_i, run_j, run_size = i, j, 1
+                pa, pb = i + 1, j + 1
+            matches.append((run_i, run_j, run_size))
+            if pa < ahi or pb < bhi:
+                stack.append((pa, ahi, pb, bhi))
+            continue
+
+        i, j, size = _find_lcs(a, alo, ahi, b, blo, bhi)
+        if size == 0:
+            if (ahi - alo) + (bhi - blo) <= FALLBACK_LIMIT:
+                matcher = difflib.SequenceMatcher(None, a[alo:ahi], b[blo:bhi], autojunk=False)
+                for ma, mb, ms in matcher.get_matching_blocks():
+                    if ms:
+                        matches.append((alo + ma, blo + mb, ms))
+            continue
+        matches.append((i, j, size))
+        stack.append((i + size, ahi, j + size, bhi))
+        stack.append((alo, i, blo, j))
+
+    return _opcodes(sorted(matches), len(a), len(b))
+
+
+def _opcodes(matches: List[Tuple[int, int, int]], na: int, nb: int) -> List[Opcode]:
+    opcodes: List[Opcode] = []
+    i = j = 0
+
+    def gap(ai: int, bj: int):
+        if i < ai and j < bj:
+            opcodes.append(('replace', i, ai, j, bj))
+        elif i < ai:
+            opcodes.append(('delete', i, ai, j, bj))
+        elif j < bj:
+            opcodes.append(('insert', i, ai, j, bj))
+
+    for mi, mj, size in matches:
+        gap(mi, mj)
+        if opcodes and opcodes[-1][0] == 'equal' and opcodes[-1][2] == mi and opcodes[-1][4] == mj:
+            # 合并相邻的相等片段
+            _, i1, _, j1, _ = opcodes[-1]
+            opcodes[-1] = ('equal', i1, mi + size, j1, mj + size)
+        else:
+            opcodes.append(('equal', mi, mi + size, mj, mj + size))
+        i, j = mi + size, mj + size
+    gap(na, nb)
+    return opcodes
@@ -0,0 +1,295 @@
+import os
+import re
+import json
+import logging
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Pattern, Sequence, Tuple
+
+from .sections import SectionIndex, split_lines
+
+try:
+    from connection.vendor_profiles import detect_vendor
+except ImportError:  # 未安装采集依赖时不识别厂商，按通用规则处理
+    detect_vendor = None
+
+logger = logging.getLogger(__name__)
+
+MASK = '<*>'
+# 厂商识别只取版本命令回显的开头部分
+_VENDOR_SAMPLE = 64 * 1024
+_VERSION_COMMAND = re.compile(r'^(dis(play)?|sh(ow)?)\s+ver', re.IGNORECASE)
+_FIELD = re.compile(rb'\S+')
+
+
+def _compile(pattern: Optional[str]) -> Optional[Pattern[bytes]]:
+    if not pattern:
+        return None
+    return re.compile(pattern.encode('utf-8'), re.MULTILINE)
+
+
+def command_key(command: str) -> str:
+    """命令规范化（小写、合并空白），作为规则匹配与缓存的键"""
+    return ' '.join((command or '').lower().split())
+
+
+class MaskRule:
+    """
+    一条易变字段掩码规则：
+    - 正则掩码：pattern 的匹配替换为 replace（可引用分组，如 \\1）；
+      指定 within 时只处理含有 within 匹配的行（within 对小写化后的回显匹配，不区分大小写且无需写 (?i)）
+    - 列掩码：header 匹配到表头后，之后每行按空白切分，columns 指定的列（从 0 开始）替换为 replace
+    - commands：适用命令（正则，匹配规范化后的命令开头），为空时适用于所有命令
+    - vendors：适用厂商（VendorProfile.name），为空时适用于所有厂商
+    - triggers：小写字面量，数据块（小写化后）不含其中任何一个时跳过本规则，省去整块正则扫描
+    """
+
+    def __init__(self, name: str, pattern: Optional[str] = None, replace: str = MASK,
+                 within: Optional[str] = None, columns: Sequence[int] = (), header: Optional[str] = None,
+                 commands: Sequence[str] = (), vendors: Sequence[str] = (), triggers: Sequence[str] = ()):
+        self.name = name
+        self.pattern = _compile(pattern)
+        self.replace = replace.encode('utf-8')
+        self.within = _compile(within)
+        self.columns = sorted(set(int(c) for c in columns))
+        self.header = _compile(header)
+        self.commands = [re.compile(c, re.IGNORECASE) for c in commands]
+        self.vendors = {v.lower() for v in vendors}
+        self.triggers = [t.lower().encode('utf-8') for t in triggers if t]
+        if self.pattern is None and not (self.columns and self.header):
+            raise ValueError(f"规则 {name} 需要 pattern，或同时指定 columns 与 header")
+
+    @classmethod
+    def from_dict(cls, item: Dict[str, Any]) -> 'MaskRule':
+        return cls(item.get('name', ''), pattern=item.get('pattern'), replace=item.get('replace', MASK),
+                   within=item.get('within'), columns=item.get('columns', ()), header=item.get('header'),
+                   commands=item.get('commands', ()), vendors=item.get('vendors', ()),
+                   triggers=item.get('triggers', ()))
+
+    @property
+    def is_column_rule(self) -> bool:
+        return self.pattern is None
+
+    def applies(self, vendor: str, key: str) -> bool:
+        # 厂商未识别（generic）时各厂商的规则都参与：命令与表头本身已足够区分
+        if self.vendors and vendor != 'generic' and vendor not in self.vendors:
+            return False
+        return not self.commands or any(c.match(key) for c in self.commands)
+
+    @property
+    def needs_folded(self) -> bool:
+        return bool(self.triggers) or self.within is not None
+
+    def apply(self, chunk: bytes, folded: Optional[bytes] = None) -> Tuple[bytes, int]:
+        """
+        对整块数据做正则掩码（re.MULTILINE，一次 C 层扫描），返回 (结果, 替换次数)。
+        folded 为 chunk.lower()（ASCII 小写化不改变长度，偏移与原数据一致），由调用方在多条规则间复用。
+        """
+        if self.needs_folded and folded is None:
+            folded = chunk.lower()
+        if self.triggers and not any(t in folded for t in self.triggers):
+            return chunk, 0
+        if self.within is None:
+            return self.pattern.subn(self.replace, chunk)
+        # 在小写副本上定位命中行，只对这些行做替换（(?i) 的正则在 sre 中逐字节比较，明显更慢）
+        parts = []
+        pos = count = 0
+        for match in self.within.finditer(folded):
+            if match.start() < pos:
+                continue
+            line_start = chunk.rfind(b'\n', 0, match.start()) + 1
+            line_end = chunk.find(b'\n', match.start())
+            if line_end < 0:
+                line_end = len(chunk)
+            text, n = self.pattern.subn(self.replace, chunk[line_start:line_end])
+            parts.append(chunk[pos:line_start])
+            parts.append(text)
+            count += n
+            pos = line_end
+        if not count:
+            return chunk, 0
+        parts.append(chunk[pos:])
+        return b''.join(parts), count
+
+
+_NUMBER = r'\d+(?:\.\d+)?'
+_COUNTER_LINE = (r'rate|packets|bytes|errors|drops|discard|unicast|multicast|broadcast|'
+                 r'crc|overrun|giants|runts|frames|pause|peak|bps|pps')
+# 时刻必然含冒号：大表（ARP/MAC/路由）通常没有冒号，可整块跳过时间规则
+_TIME_TRIGGERS = (':',)
+
+# 内置规则：时间戳、运行时长、CPU/内存利用率、接口计数器、协议邻居计时
+BUILTIN_RULES: List[MaskRule] = [
+    MaskRule('timestamp',
+             pattern=r'\b\d{4}[-/]\d{1,2}[-/]\d{1,2}[ T]\d{1,2}:\d{2}:\d{2}(?:\.\d+)?(?:[ \t]*(?:[+-]\d{2}:?\d{2}|UTC|DST))?',
+             replace='<time>', triggers=_TIME_TRIGGERS),
+    MaskRule('syslog-time',
+             pattern=r'\b(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[ \t]+\d{1,2}[ \t]+(?:\d{4}[ \t]+)?\d{1,2}:\d{2}:\d{2}(?:\.\d+)?',
+             replace='<time>', triggers=_TIME_TRIGGERS),
+    MaskRule('uptime',
+             pattern=r'(?i)(\buptime is[ \t]+|\bup ?time[ \t]*:[ \t]*|\bsystem booted[ \t]*:.*?\()[^\n)]*',
+             replace=r'\1<uptime>', triggers=['uptime', 'up time', 'booted']),
+    MaskRule('ago',
+             pattern=r'\([^()\n]*\bago\)',
+             replace='(<uptime> ago)', triggers=['ago)']),
+    MaskRule('cpu-usage', pattern=_NUMBER + r'[ \t]*%', replace='<n>%',
+             commands=[r'dis(?:play)?\s+cpu', r'sh(?:ow)?\s+proc(?:esses)?\s+cpu', r'sh(?:ow)?\s+system\s+resources']),
+    MaskRule('cpu-process-runtime', columns=(1, 2, 3), header=r'^\s*PID\s+Runtime\(ms\)\s+Invoked', vendors=['cisco'],
+             commands=[r'sh(?:ow)?\s+proc(?:esses)?\s+cpu']),
+    MaskRule('memory-usage', pattern=_NUMBER, replace='<n>',
+             within=r'used|free|using|usage|percentage|idle|cached|buffers|available',
+             commands=[r'dis(?:play)?\s+mem', r'sh(?:ow)?\s+mem', r'sh(?:ow)?\s+proc(?:esses)?\s+mem', r'free\b']),
+    MaskRule('interface-counters', pattern=_NUMBER, replace='<n>', within=_COUNTER_LINE,
+             commands=[r'dis(?:play)?\s+int(?:erface)?(?!\s+brief)(?:\s|$)', r'sh(?:ow)?\s+int(?:erfaces?)?(?!\s+(?:brief|terse|status|description))(?:\s|$)']),
+    MaskRule('interface-last-io', pattern=r'\b\d+[:dhwmy]\w*(?::\d+)*', replace='<time>',
+             within=r'^[ \t]*last (?:input|output|clearing)',
+             commands=[r'sh(?:ow)?\s+int']),
+    MaskRule('interface-brief-counters', columns=(3, 4, 5, 6), vendors=['huawei'],
+             header=r'^Interface\s+PHY\s+Protocol\s+InUti\s+OutUti\s+inErrors\s+outErrors',
+             commands=[r'dis(?:play)?\s+int(?:erface)?\s+brief']),
+    MaskRule('bgp-peer-huawei', columns=(3, 4, 5, 6), vendors=['huawei'],
+             header=r'^\s*Peer\s+V\s+AS\s+MsgRcvd\s+MsgSent\s+OutQ\s+Up/Down',
+             commands=[r'dis(?:play)?\s+bgp\s+(?:\S+\s+)*peer']),
+    MaskRule('bgp-peer-h3c', columns=(2, 3, 4, 6), vendors=['h3c'],
+             header=r'^\s*Peer\s+AS\s+MsgRcvd\s+MsgSent\s+OutQ\s+PrefRcv\s+Up/Down',
+             commands=[r'dis(?:play)?\s+bgp\s+(?:\S+\s+)*peer']),
+    MaskRule('bgp-summary-cisco', columns=(3, 4, 5, 6, 7, 8), vendors=['cisco'],
+             header=r'^Neighbor\s+V\s+AS\s+MsgRcvd\s+MsgSent\s+TblVer\s+InQ\s+OutQ\s+Up/Down',
+             commands=[r'sh(?:ow)?\s+(?:ip\s+)?bgp\s+(?:\S+\s+)*summary']),
+    MaskRule('ospf-peer-timers', pattern=r'\b\d+(?::\d{2}){1,2}\b|\b\d+[ \t]*sec\b', replace='<time>',
+             within=r'dead timer|up for|uptime|dead time',
+             commands=[r'dis(?:play)?\s+ospf\s+(?:\S+\s+)*peer']),
+    MaskRule('ospf-neighbor-cisco', columns=(3,), vendors=['cisco'],
+             header=r'^Neighbor ID\s+Pri\s+State\s+Dead Time',
+             commands=[r'sh(?:ow)?\s+(?:ip\s+)?ospf\s+(?:\S+\s+)*neighbor']),
+    MaskRule('arp-expire-vrp', pattern=r'(\b[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}[ \t]+)\d+[ \t]+', replace=r'\1<n> ',
+             vendors=['huawei', 'h3c'], commands=[r'dis(?:play)?\s+arp']),
+    MaskRule('arp-age-cisco', columns=(2,), vendors=['cisco'], header=r'^Protocol\s+Address\s+Age',
+             commands=[r'sh(?:ow)?\s+(?:ip\s+)?arp']),
+    MaskRule('linux-uptime', pattern=r'^.*load average.*$', replace='<uptime>', vendors=['linux'],
+             commands=[r'uptime\b']),
+]
+
+
+class RuleSet:
+    """某厂商、某条命令适用的规则（由 RuleBook 预编译并缓存），对命令块回显做单遍流式规范化"""
+
+    def __init__(self, rules: List[MaskRule]):
+        self.regex_rules = [r for r in rules if not r.is_column_rule]
+        self.column_rules = [r for r in rules if r.is_column_rule]
+
+    def __bool__(self) -> bool:
+        return bool(self.regex_rules or self.column_rules)
+
+    def normalize(self, chunks: Iterable[bytes], stats: Optional[Dict[str, int]] = None) -> Iterator[bytes]:
+        """
+        逐块读取命令块回显并产出规范化后的行：正则规则整块执行（C 层扫描），列规则只在识别到表头后逐行处理。
+        stats['masked'] 累计替换次数。
+        """
+        active: List[MaskRule] = []   # 已出现表头的列规则
+        masked = 0
+        for chunk in chunks:
+            if b'\r' in chunk:
+                chunk = chunk.replace(b'\r\n', b'\n')
+            folded = None
+            for rule in self.regex_rules:
+                if folded is None and rule.needs_folded:
+                    folded = chunk.lower()
+                chunk, count = rule.apply(chunk, folded)
+                if count:
+                    masked += count
+                    folded = None
+            lines = split_lines(chunk)
+            if self.column_rules:
+                for i, line in enumerate(lines):
+                    for rule in self.column_rules:
+                        if rule in active:
+                            line, count = self._mask_columns(rule, line)
+                            lines[i] = line
+                            masked += count
+                        elif rule.header.search(line):
+                            active.append(rule)
+            yield from lines
+        if stats is not None:
+            stats['masked'] = stats.get('masked', 0) + masked
+
+    @staticmethod
+    def _mask_columns(rule: MaskRule, line: bytes) -> Tuple[bytes, int]:
+        fields = list(_FIELD.finditer(line))
+        if len(fields) <= rule.columns[-1]:
+            return line, 0
+        # 被屏蔽的列两侧的对齐空白也随取值长度变化，统一为一个空格
+        parts = [line[:fields[0].start()]]
+        masked_prev = False
+        for k, field in enumerate(fields):
+            masked = k in rule.columns
+            if k:
+                parts.append(b' ' if masked or masked_prev else line[fields[k - 1].end():field.start()])
+            parts.append(rule.replace if masked else field.group(0))
+            masked_prev = masked
+        parts.append(line[fields[-1].end():])
+        return b''.join(parts), len(rule.columns)
+
+
+class RuleBook:
+    """
+    规则库：规则只编译一次；按 (厂商, 命令) 选出的 RuleSet 缓存复用。
+    instance() 为内置规则；load(path) 在内置规则之后追加 JSON 规则文件中的规则（按路径与修改时间缓存）。
+    """
+
+    _instance: Optional['RuleBook'] = None
+    _loaded: Dict[Tuple[str, float], 'RuleBook'] = {}
+
+    def __init__(self, rules: Optional[List[MaskRule]] = None):
+        self.rules = list(BUILTIN_RULES if rules is None else rules)
+        self._cache: Dict[Tuple[str, str], RuleSet] = {}
+
+    @classmethod
+    def instance(cls) -> 'RuleBook':
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    @classmethod
+    def load(cls, path: Optional[str]) -> 'RuleBook':
+        """
+        JSON 规则文件：规则对象数组，字段同 MaskRule（name/pattern/replace/within/columns/header/commands/vendors/triggers），
+        正则按 UTF-8 字节匹配。文件为空或不存在时只使用内置规则。
+        """
+        if not path or not os.path.exists(path):
+            if path:
+                logger.warning(f"规范化规则文件不存在: {path}，只使用内置规则")
+            return cls.instance()
+        key = (os.path.abspath(path), os.path.getmtime(path))
+        book = cls._loaded.get(key)
+        if book is None:
+            with open(path, 'r', encoding='utf-8') as f:
+                items = json.load(f)
+            book = cls(BUILTIN_RULES + [MaskRule.from_dict(item) for item in items])
+            cls._loaded[key] = book
+            logger.info(f"加载规范化规则 {len(items)} 条: {path}")
+        return book
+
+    def ruleset(self, vendor: str, command: str) -> RuleSet:
+        key = ((vendor or 'generic').lower(), command_key(command))
+        ruleset = self._cache.get(key)
+        if ruleset is None:
+            ruleset = RuleSet([r for r in self.rules if r.applies(key[0], key[1])])
+            self._cache[key] = ruleset
+        return ruleset
+
+
+def detect_file_vendor(index: SectionIndex) -> str:
+    """按采集文件的提示符与版本命令回显识别厂商（VendorProfile.name），无法识别时为 generic"""
+    if detect_vendor is None or not index.sections:
+        return 'generic'
+    sample = b''
+    for ref in index:
+        if _VERSION_COMMAND.match(ref.command):
+            sample = next(index.body(ref).chunks(_VENDOR_SAMPLE), b'')[:_VENDOR_SAMPLE]
+            break
+    prompt = index.prompt
+    if not prompt:
+        # 采集容器：每个命令块的回显以提示符收尾
+        for line in index.body(index.sections[0]).lines():
+            if line.strip():
+                prompt = line.strip()
+    return detect_vendor(sample, b'\n' + prompt).name
@@ -0,0 +1,365 @@
+import os
+import time
+import logging
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .histogram import diff_lines
+from .normalize import RuleBook, RuleSet, detect_file_vendor
+from .sections import LineRange, SectionIndex, SectionRef
+from .tables import TableSpec, diff_table, table_specs
+
+logger = logging.getLogger(__name__)
+
+WindowOp = Tuple[str, int, int, int, int, List[bytes], List[bytes]]
+
+STATUS_CHANGED = 'changed'
+STATUS_UNCHANGED = 'unchanged'
+STATUS_ONLY_BEFORE = 'only-before'
+STATUS_ONLY_AFTER = 'only-after'
+
+STATUS_LABELS = {
+    STATUS_CHANGED: '变更',
+    STATUS_UNCHANGED: '相同',
+    STATUS_ONLY_BEFORE: '仅在变更前',
+    STATUS_ONLY_AFTER: '仅在变更后',
+}
+
+
+def _text(line: bytes) -> str:
+    return line.decode('utf-8', errors='replace')
+
+
+def _read(index: SectionIndex, ref: SectionRef, ruleset: Optional[RuleSet], stats: Dict[str, int]) -> Iterator[bytes]:
+    """命令块回显的行；有适用的规范化规则时在读取的同一遍中完成规范化"""
+    if ruleset:
+        return ruleset.normalize(index.body(ref).chunks(), stats)
+    return index.body(ref).lines()
+
+
+def _count_lines(lines: LineRange) -> int:
+    return sum(chunk.count(b'\n') + (not chunk.endswith(b'\n')) for chunk in lines.chunks())
+
+
+class SectionDiff:
+    """单个命令块的比对结果：状态、增删行数、按键比对的表格中变更的行数与差异片段"""
+
+    def __init__(self, command: str, occurrence: int, status: str,
+                 added: int = 0, removed: int = 0, hunks: Optional[List[str]] = None, rows_changed: int = 0):
+        self.command = command
+        self.occurrence = occurrence
+        self.status = status
+        self.added = added
+        self.removed = removed
+        self.hunks: List[str] = hunks or []
+        self.rows_changed = rows_changed
+
+    @property
+    def changed(self) -> bool:
+        return self.status != STATUS_UNCHANGED
+
+    def title(self) -> str:
+        name = self.command if self.occurrence == 0 else f"{self.command} (#{self.occurrence + 1})"
+        label = STATUS_LABELS[self.status]
+        if self.status == STATUS_CHANGED:
+            rows = f" ~{self.rows_changed}" if self.rows_changed else ''
+            return f"=== {name} [{label} +{self.added} -{self.removed}{rows}]"
+        if self.status == STATUS_ONLY_BEFORE:
+            return f"=== {name} [{label} {self.removed} 行]"
+        if self.status == STATUS_ONLY_AFTER:
+            return f"=== {name} [{label} {self.added} 行]"
+        return f"=== {name} [{label}]"
+
+
+# 流式比对的窗口行数：每次从前后两侧各读入一个窗口做差异计算，只输出窗口前部已确定的结果
+DIFF_WINDOW = 16 * 1024
+# 单个差异区域超过窗口时窗口倍增，直至该上限（内存随最大的差异区域增长，而不是随命令输出大小增长）
+MAX_DIFF_WINDOW = 4 * 1024 * 1024
+
+
+def _hunk_range(start: int, length: int) -> str:
+    # 与 diff -u 相同：起始行号从 1 开始，空范围时为前一行
+    begin = start + 1
+    if length == 1:
+        return f"{begin}"
+    if length == 0:
+        begin -= 1
+    return f"{begin},{length}"
+
+
+def _fill(buf: List[bytes], lines: Iterator[bytes], size: int) -> bool:
+    """把 buf 补足到 size 行，返回来源是否已读完"""
+    while len(buf) < size:
+        line = next(lines, None)
+        if line is None:
+            return True
+        buf.append(line)
+    return False
+
+
+def _window_opcodes(before: Iterable[bytes], after: Iterable[bytes], window: int = DIFF_WINDOW) -> Iterator[WindowOp]:
+    """
+    流式产出差异操作 (tag, i1, i2, j1, j2, A 侧行, B 侧行)，行号为命令块内的绝对行号。
+    前后两侧各读入一个窗口计算差异，只输出距窗口末尾足够远的最后一个相等片段及其之前的结果，
+    其余部分留到下一个窗口与新读入的行一起重新比对，避免窗口截断造成错误对齐。
+    """
+    lines_a = iter(before)
+    lines_b = iter(after)
+    a_buf: List[bytes] = []
+    b_buf: List[bytes] = []
+    a_base = b_base = 0
+    a_eof = b_eof = False
+    size = window
+    while True:
+        a_eof = a_eof or _fill(a_buf, lines_a, size)
+        b_eof = b_eof or _fill(b_buf, lines_b, size)
+        if not a_buf and not b_buf:
+            return
+        if a_buf == b_buf:
+            yield 'equal', a_base, a_base + len(a_buf), b_base, b_base + len(b_buf), a_buf, b_buf
+            a_base += len(a_buf)
+            b_base += len(b_buf)
+            a_buf, b_buf = [], []
+            size = window
+            continue
+
+        opcodes = diff_lines(a_buf, b_buf)
+        if not (a_eof and b_eof):
+            # 只输出到距窗口末尾 margin 行之前的最后一个相等片段（必要时截断该片段）
+            margin = size // 4
+            limit_a, limit_b = len(a_buf) - margin, len(b_buf) - margin
+            cut = 0
+            for k in range(len(opcodes) - 1, -1, -1):
+                tag, i1, i2, j1, j2 = opcodes[k]
+                if tag == 'equal' and i1 < limit_a and j1 < limit_b:
+                    keep = min(i2 - i1, limit_a - i1, limit_b - j1)
+                    opcodes[k] = (tag, i1, i1 + keep, j1, j1 + keep)
+                    cut = k + 1
+                    break
+            if cut == 0 and size < MAX_DIFF_WINDOW:
+                size *= 2
+                continue
+            if cut:
+                # 差异区域超过最大窗口时 cut 为 0：按当前窗口全部输出
+                del opcodes[cut:]
+
+        for tag, i1, i2, j1, j2 in opcodes:
+            yield tag, a_base + i1, a_base + i2, b_base + j1, b_base + j2, a_buf[i1:i2], b_buf[j1:j2]
+        _, _, i2, _, j2 = opcodes[-1]
+        del a_buf[:i2]
+        del b_buf[:j2]
+        a_base += i2
+        b_base += j2
+        size = window
+
+
+class _HunkWriter:
+    """
+    把流式差异操作渲染为统一格式（unified）的差异片段。
+    相等片段只保留首尾各 context 行与行数，片段之间相隔不超过 2*context 行时合并为一个片段。
+    """
+
+    def __init__(self, context: int):
+        self.context = context
+        self.lines: List[str] = []
+        self.added = 0
+        self.removed = 0
+        self._hunk: Optional[List[str]] = None
+        self._hunk_a = self._hunk_b = 0      # 当前片段起始行号
+        self._len_a = self._len_b = 0        # 当前片段行数
+        # 尚未处理的连续相等行：起始行号、行数、首尾 context 行
+        self._eq_a = self._eq_b = self._eq_count = 0
+        self._eq_head: List[bytes] = []
+        self._eq_tail: deque = deque(maxlen=context)
+
+    def feed(self, tag: str, i1: int, i2: int, j1: int, j2: int, a_lines: List[bytes], b_lines: List[bytes]):
+        if tag == 'equal':
+            if not self._eq_count:
+                self._eq_a, self._eq_b = i1, j1
+            room = self.context - len(self._eq_head)
+            if room > 0:
+                self._eq_head.extend(a_lines[:room])
+            self._eq_tail.extend(a_lines[-self.context:] if self.context else [])
+            self._eq_count += i2 - i1
+            return
+        self._settle_equal(final=False)
+        if tag in ('replace', 'delete'):
+            self.removed += i2 - i1
+            self._len_a += i2 - i1
+            self._hunk.extend('-' + _text(line) for line in a_lines)
+        if tag in ('replace', 'insert'):
+            self.added += j2 - j1
+            self._len_b += j2 - j1
+            self._hunk.extend('+' + _text(line) for line in b_lines)
+
+    def finish(self) -> Tuple[int, int, List[str]]:
+        self._settle_equal(final=True)
+        return self.added, self.removed, self.lines
+
+    def _settle_equal(self, final: bool):
+        count = self._eq_count
+        if self._hunk is not None:
+            if count <= self.context * 2 and not final:
+                # 与下一处差异相隔不远：相等行全部作为片段内的上下文（此时首尾两段即全部行）
+                middle = self._eq_head + list(self._eq_tail)[len(self._eq_head) + len(self._eq_tail) - count:]
+                self._context(middle)
+            else:
+                self._context(self._eq_head[:min(count, self.context)])
+                self._close()
+        if not final and self._hunk is None:
+            lead = list(self._eq_tail)[-min(count, self.context):] if count and self.context else []
+            self._hunk = []
+            self._hunk_a = self._eq_a + count - len(lead)
+            self._hunk_b = self._eq_b + count - len(lead)
+            self._len_a = self._len_b = 0
+            self._context(lead)
+        self._eq_count = 0
+        self._eq_head = []
+        self._eq_tail.clear()
+
+    def _context(self, lines: List[bytes]):
+        self._len_a += len(lines)
+        self._len_b += len(lines)
+        self._hunk.extend(' ' + _text(line) for line in lines)
+
+    def _close(self):
+        self.lines.append(f"@@ -{_hunk_range(self._hunk_a, self._len_a)} +{_hunk_range(self._hunk_b, self._len_b)} @@")
+        self.lines.extend(self._hunk)
+        self._hunk = None
+
+
+def diff_section(before: Iterable[bytes], after: Iterable[bytes], context: int = 3) -> Tuple[int, int, List[str]]:
+    """
+    比对一个命令块的前后两份回显，返回 (新增行数, 删除行数, 差异片段行)。
+    两侧按窗口流式读取，相同的行只计数并保留上下文，内存占用与差异规模成正比，而不是与命令输出大小成正比。
+    """
+    writer = _HunkWriter(max(0, context))
+    for op in _window_opcodes(before, after):
+        writer.feed(*op)
+    return writer.finish()
+
+
+def diff_table_section(specs: List[TableSpec], before: Iterable[bytes], after: Iterable[bytes],
+                       context: int = 3) -> Optional[Tuple[int, int, int, List[str]]]:
+    """
+    表格型命令块按记录键比对（tables.diff_table），表格之外的行（表头前的说明、合计等）仍按行比对，
+    返回 (新增行数, 删除行数, 变更行数, 差异片段行)；两侧未识别到同一表格时返回 None。
+    """
+    table = diff_table(specs, before, after)
+    if table is None:
+        return None
+    added, removed, hunks = diff_section(table.other_before, table.other_after, context)
+    lines = table.lines() if table else []
+    lines.extend(hunks)
+    return len(table.added) + added, len(table.removed) + removed, len(table.changed), lines
+
+
+class CompareReport:
+    """两个采集文件的分段比对报告"""
+
+    def __init__(self, before_path: str, after_path: str):
+        self.before_path = before_path
+        self.after_path = after_path
+        self.sections: List[SectionDiff] = []
+        self.elapsed = 0.0
+        # 比对前的易变字段规范化：使用的厂商规则与屏蔽次数（未启用时 vendor 为空）
+        self.vendor = ''
+        self.masked = 0
+
+    def count(self, status: str) -> int:
+        return sum(1 for s in self.sections if s.status == status)
+
+    @property
+    def identical(self) -> bool:
+        return not any(s.changed for s in self.sections)
+
+    def summary(self) -> str:
+        return (f"命令块 {len(self.sections)} 个：变更 {self.count(STATUS_CHANGED)}，"
+                f"仅在变更前 {self.count(STATUS_ONLY_BEFORE)}，仅在变更后 {self.count(STATUS_ONLY_AFTER)}，"
+                f"相同 {self.count(STATUS_UNCHANGED)}{self._normalize_note()}（耗时 {self.elapsed:.2f}s）")
+
+    def _normalize_note(self) -> str:
+        if not self.vendor:
+            return ''
+        return f"，已屏蔽易变字段 {self.masked} 处（{self.vendor} 规则）"
+
+    def lines(self, include_unchanged: bool = False) -> Iterable[str]:
+        yield f"变更前: {self.before_path}"
+        yield f"变更后: {self.after_path}"
+        yield self.summary()
+        for section in self.sections:
+            if not section.changed and not include_unchanged:
+                continue
+            yield ''
+            yield section.title()
+            yield from section.hunks
+
+    def text(self, include_unchanged: bool = False) -> str:
+        return '\n'.join(self.lines(include_unchanged)) + '\n'
+
+    def write(self, path: str, include_unchanged: bool = False) -> str:
+        with open(path, 'w', encoding='utf-8', newline='\n') as f:
+            for line in self.lines(include_unchanged):
+                f.write(line + '\n')
+        return path
+
+
+def compare_files(before_path: str, after_path: str, commands: Optional[Iterable[str]] = None,
+                  context: int = 3, normalize: bool = True, rules: Optional[RuleBook] = None,
+                  vendor: Optional[str] = None, tables: bool = True) -> CompareReport:
+    """
+    按命令块比对变更前/变更后两个采集文件（纯文本或 .cap 采集容器）。
+    命令块按 (命令, 第几次出现) 配对，报告顺序为变更前文件中的顺序，之后是只在变更后文件中出现的命令块。
+    commands 为命令文件中的命令，用于更可靠地识别纯文本中的块边界（可省略）。
+    normalize 为 True 时比对前按规则库（默认内置规则）屏蔽易变字段（时间戳、运行时长、利用率、计数器等），
+    两侧回显在读取的同一遍中完成规范化；vendor 省略时按变更前文件识别厂商。
+    tables 为 True 时接口/路由协议邻居/ARP/MAC 等表格型命令按记录键比对（行重排不算差异），
+    回显中未识别到表头时仍按行比对。
+    """
+    started = time.time()
+    commands = list(commands or [])
+    before = SectionIndex(before_path, commands)
+    after = SectionIndex(after_path, commands)
+    after_by_key = after.by_key()
+    report = CompareReport(before_path, after_path)
+    book = (rules or RuleBook.instance()) if normalize else None
+    if book is not None or tables:
+        vendor = vendor or detect_file_vendor(before)
+    if book is not None:
+        report.vendor = vendor
+    stats = {'masked': 0}
+
+    matched = set()
+    for ref in before:
+        other: Optional[SectionRef] = after_by_key.get(ref.key)
+        if other is None:
+            removed = _count_lines(before.body(ref))
+            report.sections.append(SectionDiff(ref.command, ref.occurrence, STATUS_ONLY_BEFORE, removed=removed))
+            continue
+        matched.add(ref.key)
+        ruleset = book.ruleset(vendor, ref.command) if book is not None else None
+        specs = table_specs(vendor, ref.command) if tables else []
+        result = None
+        if specs:
+            # 未识别到表格时改按行比对会重新读取，屏蔽次数只在表格比对生效时计入
+            counter = {'masked': 0}
+            result = diff_table_section(specs, _read(before, ref, ruleset, counter),
+                                        _read(after, other, ruleset, counter), context)
+            if result is not None:
+                stats['masked'] += counter['masked']
+        if result is None:
+            added, removed, hunks = diff_section(_read(before, ref, ruleset, stats),
+                                                 _read(after, other, ruleset, stats), context)
+            result = added, removed, 0, hunks
+        added, removed, rows_changed, hunks = result
+        status = STATUS_CHANGED if hunks else STATUS_UNCHANGED
+        report.sections.append(SectionDiff(ref.command, ref.occurrence, status, added, removed, hunks, rows_changed))
+    for ref in after:
+        if ref.key not in matched:
+            added = _count_lines(after.body(ref))
+            report.sections.append(SectionDiff(ref.command, ref.occurrence, STATUS_ONLY_AFTER, added=added))
+
+    report.masked = stats['masked']
+    report.elapsed = time.time() - started
+    logger.info(f"比对完成 {os.path.basename(before_path)} ↔ {os.path.basename(after_path)}: {report.summary()}")
+    return report
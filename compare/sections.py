@@ -0,0 +1,210 @@
+import os
+import logging
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+try:
+    from connection.capture_store import CAPTURE_SUFFIX, CaptureReader, is_capture_file
+except ImportError:  # 跳板机未安装 PyQt5 等采集依赖时仍可比对纯文本文件
+    CAPTURE_SUFFIX = '.cap'
+    CaptureReader = None
+    is_capture_file = None
+
+logger = logging.getLogger(__name__)
+
+_TAIL_PROBE = 4096
+_CHUNK = 1024 * 1024
+
+
+def _strip_eol(line: bytes) -> bytes:
+    return line.rstrip(b'\r\n')
+
+
+def split_lines(chunk: bytes) -> List[bytes]:
+    """以换行结束的数据块切分为行（去掉行尾 \r）"""
+    lines = chunk.split(b'\n')
+    if lines[-1] == b'':
+        lines.pop()
+    if b'\r' in chunk:
+        lines = [line.rstrip(b'\r') for line in lines]
+    return lines
+
+
+class SectionRef:
+    """采集文件中的一个命令块：命令、同名命令的出现序号、回显在文件中的字节范围（或容器中的命令序号）"""
+
+    __slots__ = ('command', 'occurrence', 'start', 'end', 'capture_index')
+
+    def __init__(self, command: str, occurrence: int, start: int = 0, end: int = 0,
+                 capture_index: Optional[int] = None):
+        self.command = command
+        self.occurrence = occurrence
+        self.start = start
+        self.end = end
+        self.capture_index = capture_index
+
+    @property
+    def key(self) -> Tuple[str, int]:
+        """前后两个文件按 (命令, 第几次出现) 配对"""
+        return self.command, self.occurrence
+
+
+class LineRange:
+    """
+    命令块回显的字节范围视图：按块或逐行读取（只读文件，不整体载入）。
+    行均为去掉行尾换行符的 bytes。
+    """
+
+    def __init__(self, path: Optional[str], start: int, end: int, data: Optional[bytes] = None):
+        self.path = path
+        self.start = start
+        self.end = end
+        self._data = data
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'LineRange':
+        return cls(None, 0, len(data), data)
+
+    def chunks(self, chunk_size: int = _CHUNK) -> Iterator[bytes]:
+        """按块读取，每块都在换行处结束（最后一块除外），供逐块规范化与切行"""
+        if self._data is not None:
+            pos = self.start
+            while pos < self.end:
+                stop = min(self.end, pos + chunk_size)
+                if stop < self.end:
+                    nl = self._data.rfind(b'\n', pos, stop)
+                    if nl < 0:
+                        # 超长行：延伸到该行结束
+                        nl = self._data.find(b'\n', stop, self.end)
+                    stop = self.end if nl < 0 else nl + 1
+                yield self._data[pos:stop]
+                pos = stop
+            return
+        with open(self.path, 'rb') as f:
+            f.seek(self.start)
+            remaining = self.end - self.start
+            carry = b''
+            while remaining > 0:
+                block = f.read(min(chunk_size, remaining))
+                if not block:
+                    break
+                remaining -= len(block)
+                block = carry + block
+                nl = block.rfind(b'\n')
+                if nl < 0:
+                    carry = block
+                    continue
+                carry = block[nl + 1:]
+                yield block[:nl + 1]
+            if carry:
+                yield carry
+
+    def lines(self) -> Iterator[bytes]:
+        """逐行读取（行不含换行符）"""
+        for chunk in self.chunks():
+            yield from split_lines(chunk)
+
+
+class SectionIndex:
+    """
+    采集输出文件的命令块索引（format_command_output 写出的 "命令\\n回显\\n\\n" 布局）：
+    - 采集容器（.cap）直接使用容器内的命令索引，边界精确
+    - 纯文本文件顺序扫描一遍，只记录每个命令块回显的字节范围，不保存内容
+    纯文本的块边界判定：空行之后的行是已知命令（commands），或空行之前的行是设备提示符
+    （读取在提示符处结束，每个块的回显都以提示符收尾；提示符取文件最后一个非空行）。
+    """
+
+    def __init__(self, path: str, commands: Optional[Iterable[str]] = None):
+        self.path = path
+        self.commands: Set[str] = {c.strip() for c in (commands or []) if c and c.strip()}
+        self.sections: List[SectionRef] = []
+        self.prompt = b''
+        self._capture: Optional[CaptureReader] = None
+        self._seen: Dict[str, int] = {}
+        if CaptureReader is None:
+            if path.endswith(CAPTURE_SUFFIX):
+                raise ValueError(f"读取采集容器需要 connection 模块的依赖: {path}")
+            self._index_text()
+        elif is_capture_file(path):
+            self._index_capture()
+        else:
+            self._index_text()
+
+    def __iter__(self) -> Iterator[SectionRef]:
+        return iter(self.sections)
+
+    def by_key(self) -> Dict[Tuple[str, int], SectionRef]:
+        return {ref.key: ref for ref in self.sections}
+
+    def body(self, ref: SectionRef) -> LineRange:
+        """命令块回显的行视图"""
+        if ref.capture_index is None:
+            return LineRange(self.path, ref.start, ref.end)
+        block = self._capture.read_bytes(ref.capture_index)
+        # 容器中每条命令的数据与纯文本块一致：命令行 + 回显 + 空行
+        start = block.find(b'\n') + 1 if b'\n' in block else len(block)
+        end = len(block)
+        for sep in (b'\r\n\r\n', b'\n\n'):
+            if block.endswith(sep) and end - len(sep) >= start:
+                end -= len(sep)
+                break
+        return LineRange(None, start, end, block)
+
+    def _add(self, command: str, start: int, end: int, capture_index: Optional[int] = None):
+        occurrence = self._seen.get(command, 0)
+        self._seen[command] = occurrence + 1
+        self.sections.append(SectionRef(command, occurrence, start, end, capture_index))
+
+    def _index_capture(self):
+        self._capture = CaptureReader(self.path)
+        for i, entry in enumerate(self._capture.commands):
+            self._add(entry['command'], 0, 0, capture_index=i)
+
+    def _index_text(self):
+        size = os.path.getsize(self.path)
+        if size == 0:
+            return
+        self.prompt = self._detect_prompt(size)
+        command: Optional[str] = None
+        body_start = 0
+        blank_at = -1          # 当前连续空行的起始偏移（上一行非空时为 -1）
+        prev = b''             # 上一个非空行
+        before_blank = b''     # 当前连续空行之前的非空行
+        pos = 0
+        with open(self.path, 'rb') as f:
+            for raw in f:
+                line = _strip_eol(raw)
+                blank = not line.strip()
+                if command is None:
+                    if not blank:
+                        command = line.decode('utf-8', errors='replace').strip()
+                        body_start = pos + len(raw)
+                elif not blank and blank_at >= 0 and self._is_boundary(before_blank, line):
+                    self._add(command, body_start, blank_at)
+                    command = line.decode('utf-8', errors='replace').strip()
+                    body_start = pos + len(raw)
+                    blank_at = -1
+                    prev = b''
+                elif blank:
+                    if blank_at < 0:
+                        blank_at = pos
+                        before_blank = prev
+                else:
+                    blank_at = -1
+                    prev = line
+                pos += len(raw)
+        if command is not None:
+            self._add(command, body_start, blank_at if blank_at >= 0 else pos)
+
+    def _is_boundary(self, before_blank: bytes, line: bytes) -> bool:
+        if self.commands and line.decode('utf-8', errors='replace').strip() in self.commands:
+            return True
+        return bool(self.prompt) and before_blank.strip() == self.prompt
+
+    def _detect_prompt(self, size: int) -> bytes:
+        with open(self.path, 'rb') as f:
+            f.seek(max(0, size - _TAIL_PROBE))
+            tail = f.read()
+        for line in reversed(tail.splitlines()):
+            if line.strip():
+                return line.strip()
+        return b''
@@ -0,0 +1,263 @@
+import re
+import logging
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from .normalize import command_key
+
+logger = logging.getLogger(__name__)
+
+_INTERFACE = r'[A-Za-z][\w\-/.:]*\d'
+_IP = r'\d{1,3}(?:\.\d{1,3}){3}$|[0-9A-Fa-f]*:[0-9A-Fa-f:.]*$'
+_MAC = r'[0-9A-Fa-f]{4}[-.][0-9A-Fa-f]{4}[-.][0-9A-Fa-f]{4}$|[0-9A-Fa-f]{2}(?:[:-][0-9A-Fa-f]{2}){5}$'
+
+
+class TableSpec:
+    """
+    表格型命令回显的解析规则：
+    - header：表头正则（逐行 search），表头之前的行不参与按键比对
+    - key：组成记录键的列号（按空白切分，从 0 开始，负数从行尾数起），如接口名、邻居 IP、MAC+VLAN
+    - key_pattern：key 第一列须匹配的正则，不匹配的行不是表格行（分隔线、合计、空行等）
+    - columns：列名，仅用于报告中描述键与变化的列（超出列名个数的列按列号描述）
+    - continuation_columns：续行的列名（表头第二行，如华为 ARP 的 VLAN/CEVLAN、PVC）
+    - commands / vendors：适用命令（匹配规范化后的命令开头）与厂商，含义同 MaskRule
+    表格行之后缩进的非表格行视为该行的续行（如华为 ARP 第二行的 VLAN/CEVLAN），续行的列与首行分开比对和命名。
+    """
+
+    def __init__(self, name: str, header: str, key: Sequence[int], key_pattern: str,
+                 columns: Sequence[str] = (), commands: Sequence[str] = (), vendors: Sequence[str] = (),
+                 continuation_columns: Sequence[str] = ()):
+        self.name = name
+        self.header = re.compile(header.encode('utf-8'), re.IGNORECASE)
+        self.key = list(key)
+        self.key_pattern = re.compile(key_pattern.encode('utf-8'))
+        self.columns = list(columns)
+        self.continuation_columns = list(continuation_columns)
+        self.commands = [re.compile(c, re.IGNORECASE) for c in commands]
+        self.vendors = {v.lower() for v in vendors}
+        # 行的最少列数：能取到所有键列
+        self._min_fields = max(k + 1 if k >= 0 else -k for k in self.key)
+
+    def applies(self, vendor: str, key: str) -> bool:
+        if self.vendors and vendor != 'generic' and vendor not in self.vendors:
+            return False
+        return not self.commands or any(c.match(key) for c in self.commands)
+
+    def row_key(self, fields: List[bytes]) -> Optional[bytes]:
+        """表格行的记录键；不是表格行时为 None"""
+        if len(fields) < self._min_fields or not self.key_pattern.match(fields[self.key[0]]):
+            return None
+        if len(self.key) == 1:
+            return fields[self.key[0]]
+        return b' '.join(fields[k] for k in self.key)
+
+    def column_name(self, index: int) -> str:
+        if -len(self.columns) <= index < len(self.columns):
+            return self.columns[index]
+        return f"#{index + 1}" if index >= 0 else f"倒数第 {-index} 列"
+
+    def continuation_name(self, index: int) -> str:
+        if index < len(self.continuation_columns):
+            return self.continuation_columns[index]
+        return f"续行 #{index + 1}"
+
+
+_INTERFACE_BRIEF = [r'dis(?:play)?\s+int(?:erface)?\s+br(?:ief)?']
+_IP_INTERFACE_BRIEF = [r'dis(?:play)?\s+ip\s+int(?:erface)?\s+br(?:ief)?', r'sh(?:ow)?\s+ip\s+int(?:erface)?\s+br(?:ief)?']
+_BGP_PEER = [r'dis(?:play)?\s+bgp\s+(?:\S+\s+)*peer', r'sh(?:ow)?\s+(?:ip\s+)?bgp\s+(?:\S+\s+)*summary']
+_OSPF_PEER = [r'dis(?:play)?\s+ospf\s+(?:\S+\s+)*peer', r'sh(?:ow)?\s+(?:ip\s+)?ospf\s+(?:\S+\s+)*neighbor']
+_ARP = [r'dis(?:play)?\s+arp', r'sh(?:ow)?\s+(?:ip\s+)?arp']
+_MAC_TABLE = [r'dis(?:play)?\s+mac-address', r'sh(?:ow)?\s+mac[\s-]address-table']
+
+# 内置表格：接口简要信息、IP 接口简要信息、BGP 邻居、OSPF 邻居、ARP 表、MAC 地址表
+BUILTIN_TABLES: List[TableSpec] = [
+    TableSpec('interface-brief', r'^Interface\s+PHY\s+Protocol', key=(0,), key_pattern=_INTERFACE,
+              columns=('Interface', 'PHY', 'Protocol', 'InUti', 'OutUti', 'inErrors', 'outErrors'),
+              commands=_INTERFACE_BRIEF, vendors=['huawei']),
+    TableSpec('interface-brief-h3c', r'^Interface\s+Link\s+', key=(0,), key_pattern=_INTERFACE,
+              columns=('Interface', 'Link'), commands=_INTERFACE_BRIEF, vendors=['h3c']),
+    TableSpec('ip-interface-brief', r'^Interface\s+IP Address/Mask\s+Physical\s+Protocol', key=(0,), key_pattern=_INTERFACE,
+              columns=('Interface', 'IP Address/Mask', 'Physical', 'Protocol'),
+              commands=_IP_INTERFACE_BRIEF, vendors=['huawei']),
+    TableSpec('ip-interface-brief-h3c', r'^Interface\s+Physical\s+Protocol\s+IP Address', key=(0,), key_pattern=_INTERFACE,
+              columns=('Interface', 'Physical', 'Protocol', 'IP Address'), commands=_IP_INTERFACE_BRIEF, vendors=['h3c']),
+    TableSpec('ip-interface-brief-cisco', r'^Interface\s+IP-Address\s+OK\?\s+Method\s+Status\s+Protocol', key=(0,),
+              key_pattern=_INTERFACE, columns=('Interface', 'IP-Address', 'OK?', 'Method', 'Status', 'Protocol'),
+              commands=_IP_INTERFACE_BRIEF, vendors=['cisco']),
+    TableSpec('bgp-peer', r'^\s*Peer\s+V\s+AS\s+MsgRcvd\s+MsgSent\s+OutQ\s+Up/Down', key=(0,), key_pattern=_IP,
+              columns=('Peer', 'V', 'AS', 'MsgRcvd', 'MsgSent', 'OutQ', 'Up/Down', 'State', 'PrefRcv'),
+              commands=_BGP_PEER, vendors=['huawei']),
+    TableSpec('bgp-peer-h3c', r'^\s*Peer\s+AS\s+MsgRcvd\s+MsgSent\s+OutQ\s+PrefRcv\s+Up/Down', key=(0,), key_pattern=_IP,
+              columns=('Peer', 'AS', 'MsgRcvd', 'MsgSent', 'OutQ', 'PrefRcv', 'Up/Down', 'State'),
+              commands=_BGP_PEER, vendors=['h3c']),
+    TableSpec('bgp-summary-cisco', r'^Neighbor\s+V\s+AS\s+MsgRcvd\s+MsgSent', key=(0,), key_pattern=_IP,
+              columns=('Neighbor', 'V', 'AS', 'MsgRcvd', 'MsgSent', 'TblVer', 'InQ', 'OutQ', 'Up/Down', 'State/PfxRcd'),
+              commands=_BGP_PEER, vendors=['cisco']),
+    TableSpec('ospf-peer-brief', r'^\s*Area Id\s+Interface\s+Neighbor id\s+State', key=(1, 2), key_pattern=_INTERFACE,
+              columns=('Area Id', 'Interface', 'Neighbor id', 'State'), commands=_OSPF_PEER, vendors=['huawei']),
+    TableSpec('ospf-peer-h3c', r'^\s*Router ID\s+Address\s+Pri\s+Dead-Time\s+State\s+Interface', key=(0, -1), key_pattern=_IP,
+              columns=('Router ID', 'Address', 'Pri', 'Dead-Time', 'State', 'Interface'),
+              commands=_OSPF_PEER, vendors=['h3c']),
+    TableSpec('ospf-neighbor-cisco', r'^Neighbor ID\s+Pri\s+State\s+Dead Time\s+Address\s+Interface', key=(0, -1),
+              key_pattern=_IP, columns=('Neighbor ID', 'Pri', 'State', 'Dead Time', 'Address', 'Interface'),
+              commands=_OSPF_PEER, vendors=['cisco']),
+    TableSpec('arp', r'^IP ADDRESS\s+MAC ADDRESS\s+EXPIRE', key=(0,), key_pattern=_IP,
+              columns=('IP ADDRESS', 'MAC ADDRESS', 'EXPIRE(M)', 'TYPE', 'INTERFACE', 'VPN-INSTANCE'),
+              continuation_columns=('VLAN/CEVLAN', 'PVC'), commands=_ARP, vendors=['huawei']),
+    TableSpec('arp-h3c', r'^\s*IP address\s+MAC address\s+VLAN', key=(0,), key_pattern=_IP,
+              columns=('IP address', 'MAC address', 'VLAN', 'Interface', 'Aging', 'Type'), commands=_ARP, vendors=['h3c']),
+    TableSpec('arp-cisco', r'^Protocol\s+Address\s+Age', key=(1,), key_pattern=_IP,
+              columns=('Protocol', 'Address', 'Age (min)', 'Hardware Addr', 'Type', 'Interface'),
+              commands=_ARP, vendors=['cisco']),
+    TableSpec('mac-address', r'^MAC Address\s+VLAN/VSI/BD\s+Learned-From', key=(0, 1), key_pattern=_MAC,
+              columns=('MAC Address', 'VLAN/VSI/BD', 'Learned-From', 'Type', 'Age'), commands=_MAC_TABLE, vendors=['huawei']),
+    TableSpec('mac-address-vrp5', r'^MAC Address\s+VLAN/\s+PEVLAN\s+CEVLAN\s+Port', key=(0, 1), key_pattern=_MAC,
+              columns=('MAC Address', 'VLAN/VSI/SI', 'PEVLAN', 'CEVLAN', 'Port', 'Type', 'LSP/LSR-ID'),
+              commands=_MAC_TABLE, vendors=['huawei']),
+    TableSpec('mac-address-h3c', r'^MAC ADDR\s+VLAN ID\s+STATE\s+PORT INDEX', key=(0, 1), key_pattern=_MAC,
+              columns=('MAC ADDR', 'VLAN ID', 'STATE', 'PORT INDEX', 'AGING TIME(s)'), commands=_MAC_TABLE, vendors=['h3c']),
+    TableSpec('mac-address-cisco', r'^\s*Vlan\s+Mac Address\s+Type\s+Ports', key=(1, 0), key_pattern=_MAC,
+              columns=('Vlan', 'Mac Address', 'Type', 'Ports'), commands=_MAC_TABLE, vendors=['cisco']),
+]
+
+_SPEC_CACHE: Dict[Tuple[str, str], List[TableSpec]] = {}
+
+
+def table_specs(vendor: str, command: str) -> List[TableSpec]:
+    """某厂商、某条命令可能适用的表格规则（按 (厂商, 命令) 缓存）；实际使用哪一个由回显中的表头决定"""
+    key = ((vendor or 'generic').lower(), command_key(command))
+    specs = _SPEC_CACHE.get(key)
+    if specs is None:
+        specs = [s for s in BUILTIN_TABLES if s.applies(key[0], key[1])]
+        _SPEC_CACHE[key] = specs
+    return specs
+
+
+class _TableReader:
+    """单侧回显的表格解析：逐行产出 (记录键, 行内容)，表格之外的行收集在 other 中"""
+
+    def __init__(self, specs: List[TableSpec]):
+        self.specs = specs
+        self.spec: Optional[TableSpec] = None
+        self.other: List[bytes] = []
+
+    def rows(self, lines: Iterable[bytes]) -> Iterator[Tuple[bytes, bytes]]:
+        row_key: Optional[bytes] = None
+        row = b''
+        for line in lines:
+            if self.spec is None:
+                self.spec = next((s for s in self.specs if s.header.search(line)), None)
+                self.other.append(line)
+                continue
+            fields = line.split()
+            key = self.spec.row_key(fields) if fields else None
+            if key is not None:
+                if row_key is not None:
+                    yield row_key, row
+                row_key, row = key, line
+            elif row_key is not None and fields and line[:1] in (b' ', b'\t'):
+                row += b'\n' + line
+            else:
+                if row_key is not None:
+                    yield row_key, row
+                    row_key = None
+                self.other.append(line)
+        if row_key is not None:
+            yield row_key, row
+
+
+def _flat(value: Union[bytes, List[bytes]]) -> List[bytes]:
+    return value if isinstance(value, list) else [value]
+
+
+def _text(data: bytes) -> str:
+    return data.decode('utf-8', errors='replace')
+
+
+def _row_fields(row: bytes) -> Tuple[List[bytes], List[bytes]]:
+    """表格行拆为 (首行字段, 续行字段)"""
+    main, _, continuation = row.partition(b'\n')
+    return main.split(), continuation.split()
+
+
+def _describe_change(spec: TableSpec, key: bytes, before: Tuple[List[bytes], List[bytes]],
+                     after: Tuple[List[bytes], List[bytes]]) -> str:
+    changes = []
+    for name, label, old_fields, new_fields in ((spec.column_name, '', before[0], after[0]),
+                                                (spec.continuation_name, '续行 ', before[1], after[1])):
+        if len(old_fields) != len(new_fields):
+            # 列数不同（空列、续行增减）时无法按列对应，整段描述
+            changes.append(f"{label}{_text(b' '.join(old_fields))} -> {_text(b' '.join(new_fields))}")
+            continue
+        changes.extend(f"{name(i)} {_text(old)} -> {_text(new)}"
+                       for i, (old, new) in enumerate(zip(old_fields, new_fields)) if old != new)
+    return f"~ {_text(key)}: {', '.join(changes)}"
+
+
+class TableDiff:
+    """表格型命令块的按键比对结果：新增/删除的行、变更行的描述，以及两侧表格之外的行（交给行比对）"""
+
+    def __init__(self, spec: TableSpec, other_before: List[bytes], other_after: List[bytes]):
+        self.spec = spec
+        self.added: List[bytes] = []
+        self.removed: List[bytes] = []
+        self.changed: List[str] = []
+        self.other_before = other_before
+        self.other_after = other_after
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.changed)
+
+    def lines(self) -> List[str]:
+        spec = self.spec
+        key_names = ' + '.join(spec.column_name(k) for k in spec.key)
+        lines = [f"@@ 表格 {spec.name}（键 {key_names}）：新增 {len(self.added)}，删除 {len(self.removed)}，"
+                 f"变更 {len(self.changed)} @@"]
+        for row in self.removed:
+            lines.extend('-' + _text(part) for part in row.split(b'\n'))
+        for row in self.added:
+            lines.extend('+' + _text(part) for part in row.split(b'\n'))
+        lines.extend(self.changed)
+        return lines
+
+
+def diff_table(specs: List[TableSpec], before: Iterable[bytes], after: Iterable[bytes]) -> Optional[TableDiff]:
+    """
+    按记录键比对表格型命令块；两侧未识别到同一表头时返回 None（改按行比对）。
+    变更前一侧按键建哈希表，变更后一侧流式逐行查表（hash join）：时间与行数成线性，
+    只有一侧的表格驻留内存，行的重排、插入位移都不会产生差异。同一键重复出现时按出现顺序依次配对。
+    """
+    reader_a = _TableReader(specs)
+    table: Dict[bytes, Union[bytes, List[bytes]]] = {}
+    for key, row in reader_a.rows(before):
+        prior = table.get(key)
+        if prior is None:
+            table[key] = row
+        elif isinstance(prior, list):
+            prior.append(row)
+        else:
+            table[key] = [prior, row]
+    if reader_a.spec is None:
+        return None
+    spec = reader_a.spec
+
+    reader_b = _TableReader([spec])
+    result = TableDiff(spec, reader_a.other, reader_b.other)
+    for key, row in reader_b.rows(after):
+        prior = table.get(key)
+        if prior is None:
+            result.added.append(row)
+            continue
+        if isinstance(prior, list):
+            old = prior.pop(0)
+            if not prior:
+                del table[key]
+        else:
+            old = prior
+            del table[key]
+        old_fields, new_fields = _row_fields(old), _row_fields(row)
+        if old_fields != new_fields:
+            result.changed.append(_describe_change(spec, key, old_fields, new_fields))
+    if reader_b.spec is None:
+        return None
+    result.removed = [row for value in table.values() for row in _flat(value)]
+    return result
@@ -8,7 +8,34 @@ def load_config():
         config.read('config.ini', encoding='utf-8')
     else:
         config['DEFAULT'] = {
-            'beyond_compare_path': 'C:\\Program Files\\Beyond Compare 4\\BCompare.exe'
+            'compare_tool': 'builtin',
+            'compare_normalize': 'true',
+            'compare_rules_file': '',
+            'compare_tables': 'true',
+            'beyond_compare_path': 'C:\\Program Files\\Beyond Compare 4\\BCompare.exe',
+            'max_concurrency': '16',
+            'async_sessions': 'false',
+            'pipeline_commands': 'false',
+            'exec_channels': '0',
+            'reuse_sessions': 'true',
+            'session_idle_timeout': '900',
+            'device_profile_cache': 'device_profiles.json',
+            'ssh_transport_profile': 'auto',
+            'jump_host': '',
+            'jump_username': '',
+            'jump_password': '',
+            'jump_max_channels': '10',
+            'resume_interrupted': 'false',
+            'device_bandwidth_kbps': '0',
+            'site_bandwidth_kbps': '',
+            'large_output_concurrency': '0',
+            'command_history': 'true',
+            'command_history_file': 'command_history.json',
+            'output_format': 'text',
+            'device_charset': 'auto',
+            'output_soft_limit_mb': '48',
+            'output_hard_limit_mb': '0',
+            'output_memory_mb': '16'
         }
         with open('config.ini', 'w', encoding='utf-8') as configfile:
             config.write(configfile)
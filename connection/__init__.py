@@ -3,11 +3,37 @@ from .telnet_connection import TelnetConnection
 from .connection_worker import HighPerformanceConnectionWorker
 from .buffer_manager import BufferManager
 from .utils import ConnectionUtils
+from .fleet_collector import DeviceInventory, ParallelCollectionManager
+from .async_connection import AsyncSSHConnection, AsyncTelnetConnection, AsyncCollectionRunner
+from .session_pool import SessionPool
+from .device_profile import DeviceProfileCache
+from .vendor_profiles import VendorProfile, detect_vendor
+from .ssh_tuning import SSHTransportProfile
+from .jump_host import JumpHost
+from .run_journal import RunJournal
+from .rate_limiter import BandwidthScheduler
+from .command_history import CommandHistory
+from .capture_store import CaptureReader
 
 __all__ = [
     'SSHConnection',
     'TelnetConnection', 
     'HighPerformanceConnectionWorker',
     'BufferManager',
-    'ConnectionUtils'
+    'ConnectionUtils',
+    'DeviceInventory',
+    'ParallelCollectionManager',
+    'AsyncSSHConnection',
+    'AsyncTelnetConnection',
+    'AsyncCollectionRunner',
+    'SessionPool',
+    'DeviceProfileCache',
+    'VendorProfile',
+    'detect_vendor',
+    'SSHTransportProfile',
+    'JumpHost',
+    'RunJournal',
+    'BandwidthScheduler',
+    'CommandHistory',
+    'CaptureReader'
 ]
\ No newline at end of file
@@ -0,0 +1,727 @@
+import sys
+import abc
+import time
+import socket
+import asyncio
+import logging
+import re
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple, List, Dict, Any, Callable
+
+import paramiko
+
+from .buffer_manager import BufferManager
+from .utils import ConnectionUtils
+from .prompt_matcher import StreamingPromptMatcher, compile_prompt
+from .output_stream import CommandOutputStream, stitch_spilled_output
+from .spill import SpillBuffer, truncation_note, over_limit
+from .charset import SessionCharset
+from .vendor_profiles import detect_vendor
+from .link_timing import LinkTiming
+from .pager import PagerFilter
+from .telnet_protocol import TelnetProtocolParser, TelnetLoginMachine
+from .ssh_tuning import SSHTransportProfile, get_transport_profile, select_transport_profile
+
+try:
+    import asyncssh  # 可选依赖：纯 asyncio 的 SSH 实现，安装后无需每会话线程
+except ImportError:
+    asyncssh = None
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncSessionBase(abc.ABC):
+    """
+    asyncio 会话基类：与 SSHConnection/TelnetConnection 保持相同的
+    connect / execute_command / close 契约（均为协程），单个事件循环即可驱动大量会话。
+    子类只需实现 _open / _read_chunk / _write / _close。
+    execute_command 的 sink 可提供协程 write_async（如 AsyncCollectionRunner 把落盘放到线程池），
+    否则调用同步的 write。
+    """
+
+    protocol = ''
+    # Telnet 输出移除空行，与同步 TelnetConnection 的归一化保持一致
+    drop_blank_lines = False
+
+    def __init__(self, ip: str, port: int, username: str, password: str):
+        self.ip = ip
+        self.port = port
+        self.username = username
+        self.password = password
+        self.connected = False
+        self.last_error = ""
+        self.last_error_code = ""
+
+        # 连接参数
+        self.connect_timeout = 10
+
+        # 提示符模式（字节级）
+        self.prompt_pattern_bytes: Optional[re.Pattern[bytes]] = None
+        self.prompt_bytes = b''
+        self.banner = b''
+        self.vendor_profile = None  # 识别出的厂商画像（VendorProfile）
+
+        # 读写参数，与同步实现保持一致
+        self.chunk_size = 16384
+        # 输出上限：单条命令硬上限（0 不限制）；非流式读取超过内存预算的部分溢出到临时分段
+        self.max_output_size = 0
+        self.memory_budget = 16 * 1024 * 1024
+        self.spill_dir: Optional[str] = None
+        self._spill: Optional[SpillBuffer] = None
+        self.idle_probe_window = 0.6
+        # 会话字符集：首次出现非 ASCII 输出时判定 UTF-8/GBK，之后整个会话沿用
+        self.charset = SessionCharset()
+        self.timing = LinkTiming(default_window=self.idle_probe_window)
+
+    @abc.abstractmethod
+    async def _open(self) -> bool:
+        """建立连接并完成认证"""
+
+    @abc.abstractmethod
+    async def _read_chunk(self, timeout: float) -> bytes:
+        """读取一块数据；超时返回 b''，连接关闭抛出 EOFError"""
+
+    @abc.abstractmethod
+    async def _write(self, data: bytes):
+        """发送数据"""
+
+    @abc.abstractmethod
+    async def _close(self):
+        """关闭连接"""
+
+    async def connect(self) -> bool:
+        try:
+            ok = await asyncio.wait_for(self._open(), self.connect_timeout * 3)
+        except asyncio.TimeoutError:
+            ok = False
+            self.last_error_code = self.last_error_code or "NETWORK_TIMEOUT"
+            self.last_error = self.last_error or f"连接超时：{self.ip}:{self.port}"
+        except Exception as e:
+            ok = False
+            self.last_error_code = self.last_error_code or "UNKNOWN"
+            self.last_error = self.last_error or f"连接失败 原始错误[{e.__class__.__name__}]：{e}"
+        if not ok:
+            logger.error(f"{self.protocol.upper()}连接失败[{self.last_error_code}]: {self.last_error}")
+            await self._safe_close()
+            return False
+        self.banner = (self.banner + await self._drain())[-4096:]
+        await self._detect_prompt()
+        self.connected = True
+        logger.info(f"{self.protocol.upper()}(asyncio)连接成功: {self.ip}:{self.port}")
+        return True
+
+    async def _drain(self, quiet: float = 0.05) -> bytes:
+        """清空残留输出，直到静默 quiet 秒；返回读到内容的尾部（banner 识别使用）"""
+        tail = b''
+        try:
+            while True:
+                data = await self._read_chunk(quiet)
+                if not data:
+                    break
+                tail = (tail + data)[-4096:]
+        except EOFError:
+            pass
+        return tail
+
+    async def _detect_prompt(self):
+        """发送空行，静默后取最后一行作为提示符"""
+        try:
+            await self._write(b'\n')
+            buf = bytearray()
+            loop = asyncio.get_running_loop()
+            end_time = loop.time() + 2.0
+            while loop.time() < end_time:
+                data = await self._read_chunk(0.3)
+                if not data:
+                    if buf:
+                        break
+                    continue
+                buf.extend(data)
+            lines = [ln.strip() for ln in bytes(buf).splitlines() if ln.strip()]
+            prompt_bytes = lines[-1] if lines else b''
+            self.prompt_bytes = prompt_bytes
+            if prompt_bytes:
+                self.prompt_pattern_bytes = compile_prompt(prompt_bytes)
+            else:
+                self.prompt_pattern_bytes = re.compile(ConnectionUtils.GENERIC_PROMPT_BYTES)
+        except Exception as e:
+            logger.warning(f"{self.protocol.upper()}提示符检测失败: {e}")
+            self.prompt_pattern_bytes = re.compile(ConnectionUtils.GENERIC_PROMPT_BYTES)
+
+    async def prepare_terminal(self):
+        """
+        按 banner/提示符识别厂商（不执行版本命令，避免占用事件循环上的往返），
+        只下发该厂商的分页命令；未识别时逐条尝试通用候选，设备不支持的命令直接忽略
+        """
+        self.vendor_profile = detect_vendor(self.banner, self.prompt_bytes)
+        if not self.prompt_bytes:
+            self.prompt_pattern_bytes = self.vendor_profile.prompt_pattern()
+        for cmd in self.vendor_profile.pager_commands:
+            try:
+                await self.execute_command(cmd, timeout=10)
+            except Exception:
+                continue
+
+    async def execute_command(self, command: str, timeout: int = 300, sink=None) -> Tuple[bool, str]:
+        """发送命令并读取直到提示符出现；传入 sink 时输出流式写入 sink"""
+        if not self.connected:
+            return False, f"{self.protocol.upper()}连接未建立"
+        if self._spill is not None:
+            self.take_spilled_output().close()
+        try:
+            await self._drain(quiet=0.01)
+            await self._write(((command or "").strip() + "\n").encode("utf-8", "ignore"))
+            output = await self._read_until_prompt(timeout, sink=sink)
+            return True, output
+        except EOFError:
+            self.connected = False
+            return False, "会话已断开或通道已关闭：请重新连接后再试。"
+        except Exception as e:
+            return False, f"命令执行失败 原始错误[{e.__class__.__name__}]：{e}"
+
+    async def _read_until_prompt(self, timeout: int = 300, sink=None) -> str:
+        """读取直到尾部窗口匹配提示符或达到超时/上限（语义同同步实现）"""
+        loop = asyncio.get_running_loop()
+        buf = SpillBuffer(self.memory_budget, self.spill_dir)
+        write_async = getattr(sink, 'write_async', None)
+
+        async def append(data: bytes):
+            if write_async is not None:
+                await write_async(data)
+            elif sink is not None:
+                sink.write(data)
+            else:
+                buf.extend(data)
+        matcher = StreamingPromptMatcher(self.prompt_pattern_bytes)
+        # 分页未能关闭时在流中直接应答空格翻页，并去掉分页提示
+        pager = PagerFilter()
+        total = 0
+        start = loop.time()
+        last_data_ts = start
+        # 静默探测时刻由会话实测的 RTT/回显节奏决定，连续无回应时退避
+        probes = 0
+        probe_after = self.timing.idle_window
+
+        while loop.time() - start < timeout:
+            now = loop.time()
+            wait = min(max(probe_after - (now - last_data_ts), 0.01), max(timeout - (now - start), 0.01))
+            data = await self._read_chunk(wait)
+            if data:
+                now = loop.time()
+                if total == 0:
+                    self.timing.add_rtt(now - start)
+                else:
+                    self.timing.add_gap(now - last_data_ts)
+                clean, paged = pager.feed(data)
+                if paged:
+                    await self._write(b' ')
+                await append(clean)
+                total += len(data)
+                last_data_ts = now
+                probes = 0
+                probe_after = self.timing.idle_window
+
+                if over_limit(total, self.max_output_size):
+                    break
+
+                if matcher.feed(data):
+                    # 收集提示符行残余
+                    try:
+                        residue = await self._read_chunk(self.timing.residue_wait)
+                        while residue:
+                            await append(pager.feed(residue)[0])
+                            residue = await self._read_chunk(0.01)
+                    except EOFError:
+                        pass
+                    break
+            elif loop.time() - last_data_ts >= probe_after:
+                # 静默探测：轻回车一次拉取提示符
+                try:
+                    await self._write(b'\r')
+                except Exception:
+                    pass
+                probes += 1
+                probe_after = self.timing.probe_interval(probes)
+                last_data_ts = loop.time()
+
+        await append(pager.flush())
+        note = truncation_note(self.max_output_size) if over_limit(total, self.max_output_size) else ""
+        if sink is not None:
+            return note
+        if buf.spilled:
+            # 超过内存预算：输出留在临时分段中，由调用方逐块拼接进输出文件
+            self._spill = buf
+            return note
+
+        text = self.charset.decode(buf.getvalue())
+        text = text.replace('\x00', '')
+        text = re.sub(r'\r+\n', '\n', text).replace('\r', '') + note
+        if self.drop_blank_lines:
+            non_empty = [ln for ln in text.splitlines() if ln.strip() != '']
+            if non_empty:
+                text = "\n".join(non_empty)
+        return text
+
+    def take_spilled_output(self) -> Optional[SpillBuffer]:
+        """取走超过内存预算、已溢出到临时分段的命令输出；未溢出时返回 None"""
+        spill, self._spill = self._spill, None
+        return spill
+
+    async def _safe_close(self):
+        try:
+            await self._close()
+        except Exception:
+            pass
+
+    async def close(self):
+        await self._safe_close()
+        self.connected = False
+        logger.info(f"{self.protocol.upper()}(asyncio)连接已关闭: {self.ip}:{self.port}")
+
+
+class AsyncTelnetConnection(AsyncSessionBase):
+    """基于 asyncio 流的 Telnet 会话（不依赖 telnetlib，无需每会话线程）"""
+
+    protocol = 'telnet'
+    drop_blank_lines = True
+
+    def __init__(self, ip: str, port: int, username: str, password: str):
+        super().__init__(ip, port, username, password)
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+        # 与同步 TelnetConnection 共用协议解析（IAC 协商、NAWS、TTYPE）
+        self.parser = TelnetProtocolParser()
+
+        self.login_patterns = [b'login:', b'Login:', b'Username:', b'username:',
+                               b'User Name:', b'user name:', b'User:']
+        self.password_patterns = [b'Password:', b'password:', b'Passwd:', b'passwd:']
+        self.prompt_patterns = [b'#', b'$', b'>', b'%']
+        self.error_patterns = [b'incorrect', b'error', b'fail', b'invalid', b'denied']
+
+    async def _open(self) -> bool:
+        try:
+            self.reader, self.writer = await asyncio.wait_for(
+                asyncio.open_connection(self.ip, self.port), self.connect_timeout)
+        except (asyncio.TimeoutError, OSError) as e:
+            self.last_error_code = "NETWORK_TIMEOUT" if isinstance(e, asyncio.TimeoutError) else "CONNECTION_REFUSED"
+            self.last_error = f"无法建立到 {self.ip}:{self.port} 的Telnet连接：{e or '超时'}"
+            return False
+        self.writer.write(self.parser.initial_offers())
+        return await self._login()
+
+    async def _login(self) -> bool:
+        """登录状态机：只扫描新到达的字节，各阶段按各自时限等待"""
+        login = TelnetLoginMachine(self.username, self.password, self.login_patterns,
+                                   self.password_patterns, self.prompt_patterns, self.error_patterns)
+        stage_timeouts = {login.WAIT_USERNAME: 10, login.WAIT_PASSWORD: 10, login.VERIFY: 15}
+        loop = asyncio.get_running_loop()
+        state = login.state
+        deadline = loop.time() + stage_timeouts[state]
+        try:
+            while login.state not in (login.DONE, login.FAILED):
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                reply = login.feed(await self._read_chunk(min(remaining, 0.5)))
+                if reply:
+                    await self._write(reply)
+                if login.state != state and login.state in stage_timeouts:
+                    state = login.state
+                    deadline = loop.time() + stage_timeouts[state]
+        except EOFError:
+            pass
+
+        if login.state == login.DONE:
+            self.banner = bytes(login.banner)
+            return True
+        if login.state == login.FAILED:
+            self.last_error_code = "AUTH_FAILED"
+            self.last_error = "登录认证失败"
+        elif login.state == login.WAIT_USERNAME:
+            self.last_error_code = "LOGIN_PROMPT_NOT_FOUND"
+            self.last_error = f"未找到登录提示（等待 10s 超时）。目标 {self.ip}:{self.port} 可能不是Telnet服务或端口错误"
+        elif login.state == login.WAIT_PASSWORD:
+            self.last_error_code = "LOGIN_PROMPT_NOT_FOUND"
+            self.last_error = f"未找到密码提示（等待 10s 超时）。目标 {self.ip}:{self.port}"
+        else:
+            self.last_error_code = "LOGIN_TIMEOUT"
+            self.last_error = "登录超时，未找到命令提示符"
+        return False
+
+    async def _read_chunk(self, timeout: float) -> bytes:
+        if not self.reader:
+            raise EOFError("Telnet连接未建立")
+        try:
+            data = await asyncio.wait_for(self.reader.read(self.chunk_size), max(timeout, 0.01))
+        except asyncio.TimeoutError:
+            return b''
+        if not data:
+            raise EOFError("Telnet连接已关闭")
+        data, replies = self.parser.feed(data)
+        if replies and self.writer:
+            self.writer.write(replies)
+        return data
+
+    async def _write(self, data: bytes):
+        if not self.writer:
+            raise EOFError("Telnet连接未建立")
+        self.writer.write(TelnetProtocolParser.escape(data))
+        await self.writer.drain()
+
+    async def _close(self):
+        writer, self.writer, self.reader = self.writer, None, None
+        if writer:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except Exception:
+                pass
+
+
+class AsyncSSHConnection(AsyncSessionBase):
+    """
+    asyncio SSH 会话：
+    - 安装 asyncssh（requirements.txt 已包含）时使用纯 asyncio 实现，单事件循环驱动所有会话，无每会话线程
+    - 否则回退到 paramiko，仍是每会话一个线程：每个会话有自己的 paramiko Transport 收包线程，
+      握手/认证在线程池（executor，未指定时为事件循环默认线程池）中阻塞完成；
+      只有通道读写在事件循环上进行（loop.add_reader 监听 channel.fileno()，写入按 send_ready 分段发送）
+    """
+
+    protocol = 'ssh'
+
+    def __init__(self, ip: str, port: int, username: str, password: str):
+        super().__init__(ip, port, username, password)
+        self.banner_timeout = 10
+        self.auth_timeout = 10
+        self._conn = None       # asyncssh.SSHClientConnection
+        self._process = None    # asyncssh.SSHClientProcess
+        self.ssh: Optional[paramiko.SSHClient] = None
+        self.channel: Optional[paramiko.Channel] = None
+        # 传输画像：压缩开关、窗口与包长（paramiko 回退路径另含密码算法偏好）
+        self.transport_profile: SSHTransportProfile = get_transport_profile(None)
+        # paramiko 回退路径执行阻塞握手的线程池（None 为事件循环默认线程池）
+        self.executor: Optional[ThreadPoolExecutor] = None
+
+    async def _open(self) -> bool:
+        try:
+            if asyncssh is not None:
+                self._conn = await asyncio.wait_for(asyncssh.connect(
+                    self.ip, port=self.port, username=self.username, password=self.password,
+                    known_hosts=None, client_keys=None, agent_path=None,
+                    login_timeout=self.auth_timeout + self.banner_timeout,
+                    compression_algs=self.transport_profile.asyncssh_compression_algs(),
+                ), self.connect_timeout + self.auth_timeout)
+                self._process = await self._conn.create_process(
+                    term_type='vt100', term_size=(512, 1000), encoding=None,
+                    window=self.transport_profile.window_size,
+                    max_pktsize=self.transport_profile.max_packet_size)
+            else:
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(self.executor, self._paramiko_connect)
+            return True
+        except Exception as e:
+            el = str(e).lower()
+            if isinstance(e, asyncio.TimeoutError) or "timed out" in el or "timeout" in el:
+                self.last_error_code = "NETWORK_TIMEOUT"
+            elif "auth" in el or "permission denied" in el:
+                self.last_error_code = "AUTH_FAILED"
+            elif isinstance(e, ConnectionRefusedError) or "refused" in el:
+                self.last_error_code = "CONNECTION_REFUSED"
+            else:
+                self.last_error_code = "UNKNOWN"
+            self.last_error = f"无法建立SSH连接 {self.ip}:{self.port} 原始错误[{e.__class__.__name__}]：{e}"
+            return False
+
+    def _paramiko_connect(self):
+        """在线程池中完成 paramiko 握手/认证，并打开交互式通道"""
+        self.ssh = paramiko.SSHClient()
+        self.ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        self.ssh.connect(
+            hostname=self.ip,
+            port=self.port,
+            username=self.username,
+            password=self.password,
+            timeout=self.connect_timeout,
+            banner_timeout=self.banner_timeout,
+            auth_timeout=self.auth_timeout,
+            compress=self.transport_profile.compress,
+            look_for_keys=False,
+            allow_agent=False,
+            transport_factory=self.transport_profile.transport_factory()
+        )
+        self.channel = self.ssh.invoke_shell(term='vt100', width=512, height=1000)
+        self.channel.setblocking(0)
+
+    async def _read_chunk(self, timeout: float) -> bytes:
+        if self._process is not None:
+            try:
+                data = await asyncio.wait_for(self._process.stdout.read(self.chunk_size), max(timeout, 0.01))
+            except asyncio.TimeoutError:
+                return b''
+            if not data:
+                raise EOFError("SSH通道已关闭")
+            return data
+
+        channel = self.channel
+        if channel is None:
+            raise EOFError("SSH通道不可用")
+        if not channel.recv_ready():
+            if channel.closed or channel.eof_received:
+                raise EOFError("SSH通道已关闭")
+            # 通道有数据时 paramiko 会使 fileno() 可读，由事件循环唤醒
+            loop = asyncio.get_running_loop()
+            readable = asyncio.Event()
+            fd = channel.fileno()
+            loop.add_reader(fd, readable.set)
+            try:
+                await asyncio.wait_for(readable.wait(), max(timeout, 0.01))
+            except asyncio.TimeoutError:
+                return b''
+            finally:
+                loop.remove_reader(fd)
+            if not channel.recv_ready():
+                if channel.closed or channel.eof_received:
+                    raise EOFError("SSH通道已关闭")
+                return b''
+        return channel.recv(self.chunk_size)
+
+    async def _write(self, data: bytes):
+        if self._process is not None:
+            self._process.stdin.write(data)
+            return
+        # 通道为非阻塞模式：sendall 在发送窗口满时会抛出 socket.timeout，这里按窗口分段发送，窗口满时让出事件循环
+        pos = 0
+        while pos < len(data):
+            channel = self.channel
+            if channel is None or channel.closed:
+                raise EOFError("SSH通道不可用")
+            sent = 0
+            if channel.send_ready():
+                try:
+                    sent = channel.send(data[pos:pos + self.chunk_size])
+                except socket.timeout:
+                    sent = 0
+            if sent:
+                pos += sent
+            else:
+                await asyncio.sleep(0.01)
+
+    async def _close(self):
+        process, self._process = self._process, None
+        conn, self._conn = self._conn, None
+        if process is not None:
+            process.close()
+        if conn is not None:
+            conn.close()
+            try:
+                await conn.wait_closed()
+            except Exception:
+                pass
+        channel, self.channel = self.channel, None
+        ssh, self.ssh = self.ssh, None
+        if channel is not None:
+            channel.close()
+        if ssh is not None:
+            ssh.close()
+
+
+class _ExecutorSink:
+    """把同步的 CommandOutputStream 放到线程池中写入：写入线程背压/文件 I/O 只阻塞线程池，不阻塞事件循环上的其他会话"""
+
+    def __init__(self, stream: CommandOutputStream, io: Callable):
+        self.stream = stream
+        self._io = io
+
+    async def write_async(self, data: bytes):
+        if data:
+            await self._io(self.stream.write, data)
+
+
+class AsyncCollectionRunner:
+    """
+    单事件循环的多设备采集：用 asyncio.Semaphore 控制并发会话数，
+    每台设备独立 BufferManager 输出，结束后返回汇总统计（字段与 ParallelCollectionManager 一致）。
+    会话读写在事件循环上进行；BufferManager 的写入、检查点与 finalize（可能因写入线程背压或等待落盘而阻塞）
+    以及 paramiko 回退路径的握手都在 io_workers 个线程的线程池中执行，一台设备的阻塞不会拖住其他会话。
+    由 ParallelCollectionManager 在 async_sessions 开启时驱动（见 fleet_collector.AsyncCollectionThread）。
+    """
+
+    def __init__(self, devices: List[Dict[str, Any]], commands: List[str], mode: str, output_dir: str,
+                 max_concurrency: int = 500,
+                 progress_callback: Optional[Callable[[int, str], None]] = None,
+                 device_callback: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.devices = list(devices)
+        self.commands = commands
+        self.mode = mode
+        self.output_dir = output_dir
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.progress_callback = progress_callback
+        # 每台设备完成时回调（参数为该设备的结果字典）
+        self.device_callback = device_callback
+
+        # 性能参数
+        self.command_timeout = 300
+        self.large_command_timeout = 600
+        # 命令输出流式落盘，单设备内存占用与输出大小无关
+        self.stream_output = True
+        # SSH 传输画像：auto 时按并发会话数判断 CPU 是否受限（单进程驱动大量会话时关闭压缩）
+        self.transport_profile = 'auto'
+        # 输出格式：text / gzip / zstd（压缩采集容器）
+        self.output_format = 'text'
+        # 设备字符集：auto / utf-8 / gbk
+        self.device_charset = 'auto'
+        # 输出上限（KB）：单条命令软上限（只告警）、硬上限（0 不限制）、非流式读取的内存预算
+        self.soft_output_kb = 48 * 1024
+        self.max_output_kb = 0
+        self.output_memory_kb = 16 * 1024
+        # 执行阻塞 I/O（落盘、paramiko 握手）的线程数
+        self.io_workers = min(64, self.max_concurrency)
+
+        self._done = 0
+        self._stopped = False
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @staticmethod
+    def create_connection(device: Dict[str, Any]) -> AsyncSessionBase:
+        cls = AsyncSSHConnection if device['protocol'] == 'ssh' else AsyncTelnetConnection
+        return cls(device['ip'], device['port'], device['username'], device['password'])
+
+    def stop(self):
+        """停止采集：排队设备不再连接，运行中的设备在当前命令结束后停止（可从其他线程调用）"""
+        self._stopped = True
+
+    def run(self) -> Dict[str, Any]:
+        """同步入口：新建事件循环执行全部设备采集"""
+        if sys.platform == 'win32':
+            # paramiko 回退路径依赖 add_reader，Proactor 循环不支持
+            loop = asyncio.SelectorEventLoop()
+            try:
+                return loop.run_until_complete(self.run_async())
+            finally:
+                loop.close()
+        return asyncio.run(self.run_async())
+
+    async def run_async(self) -> Dict[str, Any]:
+        start = time.time()
+        self._done = 0
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=max(1, self.io_workers), thread_name_prefix='async-io')
+        try:
+            results = await asyncio.gather(*(self._collect_with_limit(semaphore, d) for d in self.devices))
+        finally:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+        duration = time.time() - start
+        summary = {
+            'total_devices': len(self.devices),
+            'succeeded_devices': sum(1 for r in results if r['success']),
+            'failed_devices': sum(1 for r in results if not r['success']),
+            'total_commands': sum(r['stats'].get('total_commands', 0) for r in results),
+            'completed_commands': sum(r['stats'].get('completed_commands', 0) for r in results),
+            'failed_commands': sum(r['stats'].get('failed_commands', 0) for r in results),
+            'total_bytes': sum(r['stats'].get('total_bytes', 0) for r in results),
+            'start_time': start,
+            'end_time': start + duration,
+            'duration': round(duration, 2),
+            'devices': list(results),
+        }
+        summary['speed_kb_s'] = round(summary['total_bytes'] / duration / 1024, 2) if duration > 0 else 0
+        return summary
+
+    async def _io(self, func: Callable, *args, **kwargs):
+        """在线程池中执行可能阻塞的同步调用（BufferManager 写入/落盘等）"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def _collect_with_limit(self, semaphore: asyncio.Semaphore, device: Dict[str, Any]) -> Dict[str, Any]:
+        async with semaphore:
+            if self._stopped:
+                result = {'ip': device['ip'], 'port': device['port'], 'filepath': '',
+                          'success': False, 'error': "采集已停止", 'stats': {}}
+            else:
+                result = await self._collect_device(device)
+        self._done += 1
+        if self.device_callback:
+            self.device_callback(result)
+        if self.progress_callback:
+            total = max(1, len(self.devices))
+            status = "成功" if result['success'] else f"失败 {result['error']}"
+            self.progress_callback(int(100 * self._done / total),
+                                   f"[{self._done}/{total}] {device['ip']}:{device['port']} {status}")
+        return result
+
+    async def _collect_device(self, device: Dict[str, Any]) -> Dict[str, Any]:
+        result = {'ip': device['ip'], 'port': device['port'], 'filepath': '',
+                  'success': False, 'error': '', 'stats': {}}
+        start = time.time()
+        completed = failed = 0
+        connection = self.create_connection(device)
+        connection.charset = SessionCharset(self.device_charset)
+        connection.max_output_size = self.max_output_kb * 1024
+        connection.memory_budget = max(1024, self.output_memory_kb) * 1024
+        if connection.protocol == 'ssh':
+            connection.executor = self._executor
+            connection.transport_profile = (
+                select_transport_profile(concurrent_sessions=min(self.max_concurrency, len(self.devices)))
+                if self.transport_profile == 'auto' else get_transport_profile(self.transport_profile))
+        buffer_manager = BufferManager(self.output_dir, self.mode, device['ip'], self.output_format)
+        buffer_manager.soft_limit = self.soft_output_kb * 1024
+        try:
+            if not await connection.connect():
+                result['error'] = connection.last_error or "连接失败"
+                return result
+            if connection.protocol == 'ssh':
+                await connection.prepare_terminal()
+
+            for cmd in self.commands:
+                if self._stopped:
+                    result['error'] = "采集已停止"
+                    break
+                is_large_output = ConnectionUtils.is_large_output_command(cmd, connection.vendor_profile)
+                timeout = self.large_command_timeout if is_large_output else self.command_timeout
+                await self._io(buffer_manager.begin_command, cmd)
+                if self.stream_output:
+                    stream = await self._io(CommandOutputStream, buffer_manager, cmd,
+                                            drop_blank_lines=connection.drop_blank_lines, charset=connection.charset)
+                    success, output = await connection.execute_command(cmd, timeout,
+                                                                       sink=_ExecutorSink(stream, self._io))
+                    accepted = await self._io(stream.close, output)
+                else:
+                    success, output = await connection.execute_command(cmd, timeout)
+                    spill = connection.take_spilled_output()
+                    if spill is not None:
+                        accepted = await self._io(stitch_spilled_output, buffer_manager, cmd, spill, output,
+                                                  connection.drop_blank_lines, connection.charset)
+                    else:
+                        formatted_output = ConnectionUtils.format_command_output(cmd, output, success)
+                        accepted = await self._io(buffer_manager.add_data, formatted_output)
+                await self._io(buffer_manager.end_command, success)
+                if accepted:
+                    completed += 1
+                else:
+                    failed += 1
+                if not connection.connected:
+                    result['error'] = "会话中途断开"
+                    break
+            result['success'] = not result['error']
+        except Exception as e:
+            result['error'] = f"运行错误: {str(e)}"
+            logger.error(f"设备 {device['ip']} 采集失败: {e}")
+        finally:
+            await connection.close()
+            # finalize 等待写入线程落盘并关闭文件，同样放到线程池
+            final_stats = await self._io(buffer_manager.finalize)
+            result['filepath'] = final_stats.get('filepath', '')
+            result['stats'] = {
+                'duration': round(time.time() - start, 2),
+                'total_commands': len(self.commands),
+                'completed_commands': completed,
+                'failed_commands': failed,
+                'total_bytes': final_stats['total_bytes'],
+                'speed_kb_s': final_stats['speed_kb_s'],
+                'command_sizes': final_stats['command_sizes'],
+                'oversize_commands': final_stats['oversize_commands'],
+            }
+        return result
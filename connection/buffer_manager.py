@@ -1,39 +1,76 @@
 import os
 import time
 from datetime import datetime
-from typing import List
+from typing import List, Optional, Callable, Dict, Any
 import logging
 
+from .file_writer import BackgroundFileWriter
+from .capture_store import CaptureEncoder, CAPTURE_SUFFIX, CODECS, is_capture_file
+
 logger = logging.getLogger(__name__)
 
 class BufferManager:
-    """缓冲区管理类"""
+    """
+    缓冲区管理类：每次运行只生成一个输出文件（首次使用时按模式/IP/时间戳确定路径并固定），
+    数据按批交给 BackgroundFileWriter 写入线程落盘，采集线程不做同步文件 I/O；
+    写入队列积压超过 max_queue_size 时 add_data 阻塞等待（背压）。
+    缓冲区只保存已编码的字节：add_data 对文本编码一次，add_bytes 直接接收流式路径的输出字节，
+    总量按实际写出的字节数统计，刷新时拼接为一个大块写出，不再重复编码。
+    output_format 为 gzip/zstd 时输出为带命令索引的压缩采集容器（capture_store），否则为纯文本；
+    容器模式下由 begin_command/end_command 划分命令边界（纯文本模式下二者不产生输出）。
+    """
     
-    def __init__(self, output_dir: str, mode: str, ip: str):
+    def __init__(self, output_dir: str, mode: str, ip: str, output_format: str = 'text'):
         self.output_dir = output_dir
         self.mode = mode
         self.ip = ip
+        self.output_format = output_format if output_format in CODECS else 'text'
         
         # 缓冲区配置
-        self.output_buffer: List[str] = []
+        self.output_buffer: List[bytes] = []  # 已编码的输出字节
         self.buffer_size = 0
-        self.max_buffer_size = 5 * 1024 * 1024  # 5MB
-        self.max_output_size = 50 * 1024 * 1024  # 50MB
+        self.max_buffer_size = 1024 * 1024  # 1MB：攒满一批再交给写入线程
+        self.max_queue_size = 16 * 1024 * 1024  # 写入线程队列上限（背压阈值）
+        self.max_output_size = 0  # 单次运行总输出硬上限（字节，0 不限制；数据已由写入线程落盘，内存占用与总量无关）
+        self.soft_limit = 48 * 1024 * 1024  # 单条命令输出软上限：超过时记录告警并在统计中列出，不截断
         
         # 统计信息
         self.total_bytes = 0
         self.start_time = time.time()
         self._last_filepath = ""  # 最后创建的文件路径
+        self._filepath = ""  # 本次采集的输出文件（首次使用时确定，之后的刷新均追加到该文件）
+        self.checkpoint_offset = 0  # 最近一次检查点时文件的字节长度（续采/回滚使用）
+        self._file_offset = 0  # 已交给写入线程的数据写完后文件的字节长度
+        self._writer: Optional[BackgroundFileWriter] = None
+        self._capture: Optional[CaptureEncoder] = None  # 容器模式的编码器（与写入线程同时创建）
+        self._checkpoint_total = 0  # 最近一次检查点时的 total_bytes
+        # 每条命令的输出字节数（begin_command/end_command 之间），finalize 时随统计返回
+        self.command_sizes: List[Dict[str, Any]] = []
+        self._command: Optional[str] = None
+        self._command_start = 0
+        self._checkpoint_commands = 0  # 最近一次检查点时已记录的命令数
         
         # 确保输出目录存在
         os.makedirs(output_dir, exist_ok=True)
     
     def add_data(self, data: str) -> bool:
-        """添加数据到缓冲区"""
-        data_size = len(data.encode('utf-8'))
+        """添加文本到缓冲区（只编码一次，之后按字节缓冲与写出）"""
+        if os.linesep != '\n':
+            # 与文本模式写文件一致：换行按平台换行符写出
+            data = data.replace('\n', os.linesep)
+        return self._append(data.encode('utf-8'))
+
+    def add_bytes(self, data: bytes) -> bool:
+        """添加已编码为 UTF-8 的输出字节到缓冲区（流式落盘路径，不经过 str）"""
+        if os.linesep != '\n':
+            data = data.replace(b'\n', os.linesep.encode('ascii'))
+        return self._append(data)
+
+    def _append(self, data: bytes) -> bool:
+        data_size = len(data)
         
-        # 检查总输出大小限制
-        if self.total_bytes + data_size > self.max_output_size:
+        # 检查总输出大小限制（配置了硬上限时）
+        if self.max_output_size and self.total_bytes + data_size > self.max_output_size:
             logger.warning(f"总输出大小超过{self.max_output_size//1024//1024}MB限制")
             return False
         
@@ -48,36 +85,167 @@ class BufferManager:
         return True
     
     def flush_buffer(self) -> bool:
-        """刷新缓冲区到文件，返回是否成功创建文件"""
+        """将缓冲区内容合并为一个数据块交给写入线程（不等待落盘），返回是否成功投递"""
         if not self.output_buffer:
             return False
-            
-        try:
-            timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
-            filename = f"{self.mode}-{self.ip}-{timestamp}.txt"
-            filepath = os.path.join(self.output_dir, filename)
-            
-            mode = 'a' if os.path.exists(filepath) else 'w'
-            with open(filepath, mode, encoding='utf-8', buffering=8192) as f:
-                for data in self.output_buffer:
-                    f.write(data)
-            
-            # 清空缓冲区
-            self.output_buffer.clear()
-            self.buffer_size = 0
-            
-            logger.debug(f"缓冲区已刷新到文件: {filepath}")
-            self._last_filepath = filepath  # 保存最后创建的文件路径
+
+        chunk = b''.join(self.output_buffer)
+        self.output_buffer.clear()
+        self.buffer_size = 0
+        self._ensure_writer()
+        if self._capture is not None:
+            # 容器模式：攒满一个分块才产出压缩记录
+            chunk = self._capture.feed(chunk)
+        return self._write(chunk)
+
+    def _write(self, chunk: bytes) -> bool:
+        if not chunk:
             return True
-            
-        except Exception as e:
-            logger.error(f"文件写入错误: {str(e)}")
+        if not self.writer.write(chunk):
+            logger.error(f"文件写入错误: {self.writer.error}")
             return False
+        self._file_offset += len(chunk)
+        self._last_filepath = self.filepath  # 保存最后创建的文件路径
+        return True
+
+    def begin_command(self, command: str):
+        """开始一条命令的输出（记录起始字节数；容器模式下写入命令开始记录）"""
+        self._command = command
+        self._command_start = self.total_bytes
+        if self.output_format == 'text':
+            return
+        self.flush_buffer()
+        self._ensure_writer()
+        self._write(self._capture.begin(command))
+
+    def end_command(self, success: Optional[bool] = None):
+        """结束当前命令的输出（记录该命令的输出字节数；容器模式下压缩剩余数据并写入耗时/字节数/SHA-256）"""
+        self._record_command_size(success)
+        if self.output_format == 'text':
+            return
+        self.flush_buffer()
+        self._ensure_writer()
+        self._write(self._capture.end(success))
     
+    def _record_command_size(self, success: Optional[bool]):
+        if self._command is None:
+            return
+        size = self.total_bytes - self._command_start
+        self.command_sizes.append({'command': self._command, 'bytes': size, 'success': success})
+        if self.soft_limit and size > self.soft_limit:
+            logger.warning(f"{self.ip} 命令 {self._command} 输出 {size / 1024 / 1024:.1f}MB，"
+                           f"超过软上限 {self.soft_limit // 1024 // 1024}MB（已完整保存）")
+        self._command = None
+
+    def oversize_commands(self) -> List[Dict[str, Any]]:
+        """输出超过软上限的命令"""
+        if not self.soft_limit:
+            return []
+        return [entry for entry in self.command_sizes if entry['bytes'] > self.soft_limit]
+
+    @property
+    def filepath(self) -> str:
+        """本次采集的输出文件路径（首次访问时按模式/IP/时间戳生成并固定）"""
+        if not self._filepath:
+            timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+            suffix = CAPTURE_SUFFIX if self.output_format != 'text' else '.txt'
+            self._filepath = os.path.join(self.output_dir, f"{self.mode}-{self.ip}-{timestamp}{suffix}")
+        return self._filepath
+
+    @property
+    def writer(self) -> BackgroundFileWriter:
+        """输出文件的写入线程（首次写入时创建，文件只打开一次）"""
+        return self._ensure_writer()
+
+    def _ensure_writer(self) -> BackgroundFileWriter:
+        if self._writer is None:
+            filepath = self.filepath
+            self._file_offset = os.path.getsize(filepath) if os.path.exists(filepath) else 0
+            self._writer = BackgroundFileWriter(filepath, self.max_queue_size)
+            if self.output_format != 'text' and self._capture is None:
+                self._capture = CaptureEncoder(self.output_format, self._file_offset)
+        return self._writer
+
+    def checkpoint(self, on_durable: Optional[Callable[[int], None]] = None) -> int:
+        """
+        刷新缓冲区并返回全部数据写完后输出文件的字节长度，作为已完成命令的检查点偏移。
+        on_durable(偏移) 在这些数据实际写入文件后由写入线程调用（续采日志据此记录，不会先于数据落盘）。
+        """
+        self.flush_buffer()
+        writer = self.writer
+        if self._capture is not None:
+            self._write(self._capture.flush())
+        self.checkpoint_offset = self._file_offset
+        self._checkpoint_total = self.total_bytes
+        self._checkpoint_commands = len(self.command_sizes)
+        if on_durable is not None:
+            offset = self.checkpoint_offset
+            writer.call_after(lambda: on_durable(offset))
+        return self.checkpoint_offset
+
+    def rollback(self):
+        """丢弃最近一次检查点之后的输出（未完成命令的残缺回显），文件截断回检查点偏移"""
+        self.output_buffer.clear()
+        self.buffer_size = 0
+        if self._writer is not None:
+            self._writer.truncate(self.checkpoint_offset)
+        else:
+            self._truncate(self.filepath, self.checkpoint_offset)
+        if self._capture is not None:
+            self._capture.truncate(self.checkpoint_offset)
+        self._file_offset = self.checkpoint_offset
+        self.total_bytes = self._checkpoint_total
+        del self.command_sizes[self._checkpoint_commands:]
+        self._command = None
+
+    def resume_from(self, filepath: str, offset: int):
+        """续采：沿用中断运行的输出文件，截断到检查点偏移后继续追加"""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        self._filepath = filepath
+        self._last_filepath = filepath
+        self.checkpoint_offset = offset
+        if filepath.endswith(CAPTURE_SUFFIX):
+            codec = self.output_format if self.output_format != 'text' else 'gzip'
+            if offset > 0 and is_capture_file(filepath):
+                # 沿用原容器：从检查点之前的记录重建命令索引，输出字节数按原始文本计
+                self._capture = CaptureEncoder.recover(filepath, offset, codec)
+            else:
+                self._capture = CaptureEncoder(codec, 0)
+            self.output_format = self._capture.codec
+            self._checkpoint_total = sum(entry['bytes'] for entry in self._capture.commands)
+        else:
+            self._capture = None
+            self.output_format = 'text'
+            self._checkpoint_total = offset
+        self.rollback()
+
+    @staticmethod
+    def _truncate(filepath: str, offset: int):
+        if not os.path.exists(filepath):
+            return
+        if os.path.getsize(filepath) > offset:
+            with open(filepath, 'r+b') as f:
+                f.truncate(offset)
+
+    def close(self):
+        """写出缓冲区剩余内容（容器模式下追加命令索引），等待写入线程落盘并关闭文件"""
+        self.flush_buffer()
+        if self._capture is not None:
+            self._write(self._capture.finish())
+            self._capture = None
+        if self._writer is not None:
+            self._writer.close()
+            stats = self._writer.stats
+            if stats['backpressure_waits']:
+                logger.info(f"{self.ip} 写盘背压 {stats['backpressure_waits']} 次，"
+                            f"共等待 {stats['backpressure_seconds']:.1f}s")
+
     def finalize(self) -> dict:
         """最终处理，返回统计信息和文件路径"""
         # 确保所有数据都写入文件
-        self.flush_buffer()
+        self.close()
         
         duration = time.time() - self.start_time
         speed = self.total_bytes / duration / 1024 if duration > 0 else 0
@@ -99,19 +267,14 @@ class BufferManager:
             'speed_kb_s': round(speed, 2),
             'total_bytes': self.total_bytes,
             'output_dir': self.output_dir,
-            'filepath': filepath
+            'filepath': filepath,
+            'command_sizes': list(self.command_sizes),
+            'oversize_commands': self.oversize_commands()
         }
     
     def _get_last_filepath(self) -> str:
-        """获取最后创建的文件路径"""
-        # 如果已经有保存的文件路径，直接返回
-        if hasattr(self, '_last_filepath') and self._last_filepath:
-            return self._last_filepath
-            
-        # 否则生成一个新的文件路径
-        timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
-        filename = f"{self.mode}-{self.ip}-{timestamp}.txt"
-        return os.path.join(self.output_dir, filename)
+        """获取本次运行的输出文件路径（尚未写入任何数据时同样返回固定路径）"""
+        return self._last_filepath or self.filepath
     
     def get_stats(self) -> dict:
         """获取当前统计信息"""
@@ -127,8 +290,8 @@ class BufferManager:
         }
     
     def __del__(self):
-        """析构时自动刷新缓冲区"""
+        """析构时自动刷新缓冲区并关闭写入线程"""
         try:
-            self.flush_buffer()
+            self.close()
         except:
-            pass
\ No newline at end of file
+            pass
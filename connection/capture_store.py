@@ -0,0 +1,287 @@
+import os
+import json
+import time
+import gzip
+import struct
+import hashlib
+import logging
+from typing import Dict, Any, List, Optional, Tuple, Union
+
+try:
+    import zstandard
+except ImportError:  # 可选依赖：未安装时 zstd 格式回退 gzip
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+CAPTURE_SUFFIX = '.cap'
+FILE_MAGIC = b'ICCAP001'
+TRAILER_MAGIC = b'ICCAPEND'
+# 记录头：b'R' + 类型(1 字节) + 元数据长度 + 负载长度
+_RECORD_HEADER = struct.Struct('<2sII')
+_TRAILER = struct.Struct('<8sQ')
+
+REC_BEGIN = b'RB'   # 命令开始：{'seq', 'command', 'started', 'codec'}
+REC_DATA = b'RD'    # 输出分块：{'seq', 'ulen'} + 压缩数据
+REC_END = b'RE'     # 命令结束：{'seq', 'bytes', 'sha256', 'duration', 'success'}
+REC_INDEX = b'RX'   # 索引（文件末尾，随后是 TRAILER）
+
+CODECS = ('gzip', 'zstd')
+
+
+def resolve_codec(codec: str) -> str:
+    """规范化压缩算法名；zstd 需要 zstandard 包，未安装时回退 gzip"""
+    codec = (codec or 'gzip').lower()
+    if codec == 'zstd' and zstandard is None:
+        logger.warning("未安装 zstandard，采集容器使用 gzip 压缩")
+        return 'gzip'
+    return codec if codec in CODECS else 'gzip'
+
+
+def _compress(codec: str, data: bytes) -> bytes:
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+
+def _decompress(codec: str, data: bytes, ulen: int) -> bytes:
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("读取 zstd 采集容器需要安装 zstandard")
+        return zstandard.ZstdDecompressor().decompress(data, max_output_size=ulen)
+    return gzip.decompress(data)
+
+
+def _record(kind: bytes, meta: Dict[str, Any], payload: bytes = b'') -> bytes:
+    meta_bytes = json.dumps(meta, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return _RECORD_HEADER.pack(kind, len(meta_bytes), len(payload)) + meta_bytes + payload
+
+
+def is_capture_file(path: str) -> bool:
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(FILE_MAGIC)) == FILE_MAGIC
+    except OSError:
+        return False
+
+
+class CaptureEncoder:
+    """
+    采集容器编码：每条命令的文本输出按 chunk_size 分块独立压缩成记录，并在内存中维护
+    每条命令的索引（各分块的文件偏移/压缩长度/原始长度、耗时、字节数、SHA-256）。
+    只产出字节，由调用方（BufferManager）按顺序写入文件；offset 为已产出字节写完后的文件长度。
+    finish 产出索引记录与尾部定位信息，读取时先读尾部再按索引直接定位单条命令的分块。
+    """
+
+    def __init__(self, codec: str = 'gzip', offset: int = 0, chunk_size: int = 1024 * 1024):
+        self.codec = resolve_codec(codec)
+        self.offset = offset
+        self.chunk_size = chunk_size
+        self.commands: List[Dict[str, Any]] = []
+        self._current: Optional[Dict[str, Any]] = None
+        self._pending = bytearray()
+        self._hash = None
+
+    def header(self) -> bytes:
+        """空文件的文件头"""
+        return self._emit(FILE_MAGIC) if self.offset == 0 else b''
+
+    def begin(self, command: str) -> bytes:
+        out = self.header()
+        if self._current is not None:
+            out += self.end(None)
+        self._current = {'seq': len(self.commands), 'command': command, 'offset': self.offset,
+                         'started': round(time.time(), 3), 'duration': None, 'success': None,
+                         'bytes': 0, 'sha256': '', 'chunks': []}
+        self._hash = hashlib.sha256()
+        self.commands.append(self._current)
+        meta = {k: self._current[k] for k in ('seq', 'command', 'started')}
+        meta['codec'] = self.codec
+        return out + self._emit(_record(REC_BEGIN, meta))
+
+    def feed(self, data: bytes) -> bytes:
+        """追加当前命令的输出，攒满一个分块时产出压缩记录"""
+        out = b''
+        if self._current is None:
+            # 命令边界之外的数据（如运行级提示）归入一个无名条目
+            out += self.begin('')
+        self._pending.extend(data)
+        self._hash.update(data)
+        self._current['bytes'] += len(data)
+        if len(self._pending) >= self.chunk_size:
+            out += self.flush()
+        return out
+
+    def flush(self) -> bytes:
+        """把当前命令尚未压缩的数据压成一个分块记录"""
+        if not self._pending or self._current is None:
+            return b''
+        raw = bytes(self._pending)
+        self._pending.clear()
+        payload = _compress(self.codec, raw)
+        record = _record(REC_DATA, {'seq': self._current['seq'], 'ulen': len(raw)}, payload)
+        payload_offset = self.offset + len(record) - len(payload)
+        self._current['chunks'].append([payload_offset, len(payload), len(raw)])
+        return self._emit(record)
+
+    def end(self, success: Optional[bool]) -> bytes:
+        if self._current is None:
+            return b''
+        out = self.flush()
+        current = self._current
+        current['duration'] = round(time.time() - current['started'], 3)
+        current['success'] = success
+        current['sha256'] = self._hash.hexdigest()
+        self._current = None
+        meta = {k: current[k] for k in ('seq', 'bytes', 'sha256', 'duration', 'success')}
+        return out + self._emit(_record(REC_END, meta))
+
+    def finish(self) -> bytes:
+        """结束容器：写出索引记录与尾部（之后不能再追加）"""
+        out = self.header() + self.end(None)
+        index_offset = self.offset
+        index = {'version': 1, 'codec': self.codec, 'commands': self.commands}
+        out += self._emit(_record(REC_INDEX, {'codec': self.codec}, json.dumps(index, ensure_ascii=False).encode('utf-8')))
+        return out + self._emit(_TRAILER.pack(TRAILER_MAGIC, index_offset))
+
+    def truncate(self, offset: int):
+        """回滚到 offset（命令边界）：丢弃其后的索引条目与未压缩数据"""
+        self.offset = offset
+        self._pending.clear()
+        self._current = None
+        self.commands = [c for c in self.commands if c['offset'] < offset]
+
+    @classmethod
+    def recover(cls, path: str, offset: int, codec: str = 'gzip') -> 'CaptureEncoder':
+        """续采：从已有容器的前 offset 字节重建索引，之后继续追加"""
+        reader = CaptureReader(path, limit=offset)
+        encoder = cls(reader.codec if reader.commands else codec, offset)
+        encoder.commands = reader.commands
+        return encoder
+
+    def _emit(self, data: bytes) -> bytes:
+        self.offset += len(data)
+        return data
+
+
+class CaptureReader:
+    """
+    采集容器读取：优先读取文件尾部的索引；容器未正常结束（采集中断）时顺序扫描记录重建索引。
+    read 按索引定位并只解压目标命令的分块；export_text 导出与文本输出完全一致的字节，供 Beyond Compare 比对。
+    """
+
+    def __init__(self, path: str, limit: Optional[int] = None):
+        self.path = path
+        self.codec = 'gzip'
+        self.commands: List[Dict[str, Any]] = []
+        self._by_command: Optional[Dict[str, int]] = None
+        size = os.path.getsize(path)
+        self._limit = size if limit is None else min(limit, size)
+        with open(path, 'rb') as f:
+            if f.read(len(FILE_MAGIC)) != FILE_MAGIC:
+                raise ValueError(f"不是采集容器文件: {path}")
+            # 限定长度（续采重建）或尾部索引缺失（采集中断）时顺序扫描
+            if limit is not None or not self._load_index(f, size):
+                self._scan(f)
+
+    def _load_index(self, f, size: int) -> bool:
+        if size < len(FILE_MAGIC) + _TRAILER.size:
+            return False
+        f.seek(size - _TRAILER.size)
+        magic, index_offset = _TRAILER.unpack(f.read(_TRAILER.size))
+        if magic != TRAILER_MAGIC:
+            return False
+        f.seek(index_offset)
+        kind, meta_len, payload_len = _RECORD_HEADER.unpack(f.read(_RECORD_HEADER.size))
+        if kind != REC_INDEX:
+            return False
+        f.seek(meta_len, os.SEEK_CUR)
+        index = json.loads(f.read(payload_len).decode('utf-8'))
+        self.codec = index.get('codec', 'gzip')
+        self.commands = index.get('commands', [])
+        return True
+
+    def _scan(self, f):
+        f.seek(len(FILE_MAGIC))
+        by_seq: Dict[int, Dict[str, Any]] = {}
+        position = len(FILE_MAGIC)
+        while position + _RECORD_HEADER.size <= self._limit:
+            record_offset = position
+            header = f.read(_RECORD_HEADER.size)
+            kind, meta_len, payload_len = _RECORD_HEADER.unpack(header)
+            end = position + _RECORD_HEADER.size + meta_len + payload_len
+            if kind not in (REC_BEGIN, REC_DATA, REC_END, REC_INDEX) or end > self._limit:
+                break  # 中断时写了一半的记录
+            meta = json.loads(f.read(meta_len).decode('utf-8'))
+            payload_offset = f.tell()
+            f.seek(payload_len, os.SEEK_CUR)
+            position = end
+            if kind == REC_INDEX:
+                break
+            if kind == REC_BEGIN:
+                self.codec = meta.get('codec', self.codec)
+                entry = {'seq': meta['seq'], 'command': meta['command'], 'offset': record_offset,
+                         'started': meta.get('started'),
+                         'duration': None, 'success': None, 'bytes': 0, 'sha256': '', 'chunks': []}
+                by_seq[meta['seq']] = entry
+                self.commands.append(entry)
+                continue
+            entry = by_seq.get(meta.get('seq'))
+            if entry is None:
+                continue
+            if kind == REC_DATA:
+                entry['chunks'].append([payload_offset, payload_len, meta['ulen']])
+                entry['bytes'] += meta['ulen']
+            else:
+                entry.update({k: meta.get(k) for k in ('bytes', 'sha256', 'duration', 'success')})
+
+    def find(self, command: str) -> Optional[int]:
+        """命令在容器中的序号（同一命令出现多次时取第一次）"""
+        if self._by_command is None:
+            self._by_command = {}
+            for i, entry in enumerate(self.commands):
+                self._by_command.setdefault(entry['command'], i)
+        return self._by_command.get(command)
+
+    def read_bytes(self, which: Union[int, str]) -> bytes:
+        """读取单条命令的输出块（与文本输出中该命令的字节完全一致），只解压该命令的分块"""
+        index = self.find(which) if isinstance(which, str) else which
+        if index is None:
+            raise KeyError(which)
+        entry = self.commands[index]
+        parts = []
+        with open(self.path, 'rb') as f:
+            for offset, clen, ulen in entry['chunks']:
+                f.seek(offset)
+                parts.append(_decompress(self.codec, f.read(clen), ulen))
+        return b''.join(parts)
+
+    def read(self, which: Union[int, str]) -> str:
+        return self.read_bytes(which).decode('utf-8', errors='replace')
+
+    def export_text(self, out_path: str) -> str:
+        """导出为原有纯文本布局（命令块依次拼接），返回导出文件路径"""
+        tmp_path = f"{out_path}.tmp"
+        with open(tmp_path, 'wb') as out:
+            for i in range(len(self.commands)):
+                out.write(self.read_bytes(i))
+        os.replace(tmp_path, out_path)
+        return out_path
+
+    @staticmethod
+    def text_path(path: str) -> str:
+        return (path[:-len(CAPTURE_SUFFIX)] if path.endswith(CAPTURE_SUFFIX) else path) + '.txt'
+
+    @classmethod
+    def as_text_file(cls, path: str) -> str:
+        """供比对/查看使用的纯文本文件：容器导出为同名 .txt（已导出且较新时直接复用），文本文件原样返回"""
+        if not is_capture_file(path):
+            return path
+        out_path = cls.text_path(path)
+        if os.path.exists(out_path) and os.path.getmtime(out_path) >= os.path.getmtime(path):
+            return out_path
+        return cls(path).export_text(out_path)
+
+    def summary(self) -> List[Tuple[str, int, Optional[float], Optional[bool]]]:
+        """各命令的 (命令, 字节数, 耗时, 是否成功)"""
+        return [(c['command'], c['bytes'], c.get('duration'), c.get('success')) for c in self.commands]
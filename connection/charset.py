@@ -0,0 +1,79 @@
+import codecs
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# 'gbk' 按 gb18030 解码（GBK 的超集，兼容华为/H3C 中文描述与个别扩展字符）
+_ALIASES = {'utf8': 'utf-8', 'utf-8': 'utf-8', 'gbk': 'gb18030', 'gb2312': 'gb18030', 'gb18030': 'gb18030'}
+
+
+def normalize_charset(name: str) -> str:
+    """规范化配置中的设备字符集：auto / utf-8 / gb18030，无法识别的按 auto 处理"""
+    name = (name or 'auto').strip().lower()
+    if name == 'auto':
+        return 'auto'
+    if name in _ALIASES:
+        return _ALIASES[name]
+    try:
+        return codecs.lookup(name).name
+    except LookupError:
+        logger.warning(f"未知的设备字符集 {name}，按自动识别处理")
+        return 'auto'
+
+
+class SessionCharset:
+    """
+    会话级字符集：每个设备会话只判定一次，之后所有数据块按同一编码处理。
+    - 在出现第一个非 ASCII 字符前视为未定（ASCII 在 UTF-8/GBK 中字节相同，无需判定）
+    - 首次出现非 ASCII 字节时做一次严格 UTF-8 校验（数据块末尾不完整的多字节序列不算错误），
+      合法则为 UTF-8，否则为 GBK（gb18030）；判定后不再逐块检测
+    - 配置为具体字符集时不做检测
+    输出文件统一为 UTF-8：UTF-8 会话的字节原样写出（不解码），GBK 会话转码一次，中文不再被丢弃。
+    """
+
+    def __init__(self, preferred: str = 'auto'):
+        preferred = normalize_charset(preferred)
+        self.encoding: Optional[str] = None if preferred == 'auto' else preferred
+        self.detected = self.encoding is not None
+
+    @property
+    def name(self) -> str:
+        """当前使用的编码（未判定时按 UTF-8，与 ASCII 兼容）"""
+        return self.encoding or 'utf-8'
+
+    @property
+    def passthrough(self) -> bool:
+        """输出字节可原样写入 UTF-8 输出文件（UTF-8 会话或尚未出现非 ASCII 字节）"""
+        return self.name == 'utf-8'
+
+    def observe(self, data: bytes):
+        """未判定时检查数据块；已判定后为空操作"""
+        if self.detected or not data or data.isascii():
+            return
+        try:
+            text = codecs.getincrementaldecoder('utf-8')().decode(data)
+        except UnicodeDecodeError:
+            self.encoding = 'gb18030'
+            self.detected = True
+            logger.info("设备输出不是合法 UTF-8，本会话按 GBK 解码")
+            return
+        if not text.isascii():
+            # 至少包含一个完整的多字节字符才下结论；只有截断的尾部时留到下一块
+            self.encoding = 'utf-8'
+            self.detected = True
+
+    def decode(self, data: bytes) -> str:
+        """完整数据（非流式）解码为文本；无法解码的字节以替换字符保留位置"""
+        self.observe(data)
+        return data.decode(self.name, errors='replace')
+
+    def to_output(self, data: bytes) -> bytes:
+        """
+        以完整行为单位的数据块转为输出文件字节（UTF-8）。调用方需保证数据块不拆分多字节字符
+        （换行符 0x0A/0x0D 不会出现在 UTF-8/GBK 多字节字符内部，按行切分即可保证）
+        """
+        self.observe(data)
+        if self.passthrough:
+            return data
+        return data.decode(self.name, errors='replace').encode('utf-8')
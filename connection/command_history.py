@@ -0,0 +1,138 @@
+import os
+import json
+import time
+import logging
+import threading
+from typing import Dict, Any, Optional, List
+
+logger = logging.getLogger(__name__)
+
+
+class CommandHistory:
+    """
+    命令执行历史（JSON 持久化）：按 设备（协议/IP/端口）+ 命令 记录最近若干次的执行耗时与输出字节数，用于
+    - 批量采集按预计耗时从长到短启动设备（最长作业优先，缩短整批完成时间）
+    - 多 exec 通道并发时先下发预计最慢的命令
+    - 按实测耗时分布推算单条命令超时，替代固定的 300/600 秒
+    - 历史输出较大的命令按大输出命令处理（不进流水线、占用大输出名额）
+    样本不足 MIN_SAMPLES 次的命令仍使用原有的固定超时与命令列表判定。
+    """
+
+    MAX_SAMPLES = 20            # 每条命令保留的最近样本数
+    MIN_SAMPLES = 3             # 推算超时所需的最少样本数
+    TIMEOUT_FACTOR = 3          # 超时 = 近期 P95 耗时 × 倍数 + 余量
+    TIMEOUT_MARGIN = 10
+    MIN_TIMEOUT = 30            # 推算超时下限（秒），避免短命令在设备偶发卡顿时被误判超时
+    LARGE_OUTPUT_BYTES = 1024 * 1024  # 历史平均输出超过该值视为大输出命令
+    SAVE_INTERVAL = 10          # 非强制保存的最小间隔（秒），批量采集时避免每台设备结束都重写文件
+
+    _instance: Optional['CommandHistory'] = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, path: str = 'command_history.json'):
+        self.path = path
+        self._history: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._dirty = False
+        self._last_save = 0.0
+
+    @classmethod
+    def instance(cls) -> 'CommandHistory':
+        """进程级共享命令历史"""
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    @staticmethod
+    def make_key(protocol: str, ip: str, port: int) -> str:
+        return f"{protocol}://{ip}:{int(port)}"
+
+    def record(self, key: str, cmd: str, seconds: float, nbytes: int):
+        """记录一次成功执行的耗时与输出字节数（仅更新内存，由 save 落盘）"""
+        with self._lock:
+            self._ensure_loaded()
+            entry = self._history.setdefault(key, {}).setdefault(cmd, {'seconds': [], 'bytes': []})
+            entry['seconds'] = (entry.get('seconds') or [])[-(self.MAX_SAMPLES - 1):] + [round(seconds, 3)]
+            entry['bytes'] = (entry.get('bytes') or [])[-(self.MAX_SAMPLES - 1):] + [int(nbytes)]
+            entry['updated_at'] = time.strftime('%Y-%m-%d %H:%M:%S')
+            self._dirty = True
+
+    def _entry(self, key: str, cmd: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._ensure_loaded()
+            entry = (self._history.get(key) or {}).get(cmd)
+            return {'seconds': list(entry.get('seconds') or []), 'bytes': list(entry.get('bytes') or [])} \
+                if entry else None
+
+    def expected_seconds(self, key: str, cmd: str) -> Optional[float]:
+        """预计耗时：近期样本的中位数（无历史时返回 None）"""
+        entry = self._entry(key, cmd)
+        if not entry or not entry['seconds']:
+            return None
+        samples = sorted(entry['seconds'])
+        return samples[len(samples) // 2]
+
+    def expected_bytes(self, key: str, cmd: str) -> Optional[float]:
+        """近期平均输出字节数（无历史时返回 None）"""
+        entry = self._entry(key, cmd)
+        if not entry or not entry['bytes']:
+            return None
+        return sum(entry['bytes']) / len(entry['bytes'])
+
+    def is_large_output(self, key: str, cmd: str) -> bool:
+        expected = self.expected_bytes(key, cmd)
+        return expected is not None and expected >= self.LARGE_OUTPUT_BYTES
+
+    def timeout_for(self, key: str, cmd: str) -> Optional[int]:
+        """按实测耗时分布推算的超时（近期 P95 × TIMEOUT_FACTOR + 余量）；样本不足时返回 None"""
+        entry = self._entry(key, cmd)
+        if not entry or len(entry['seconds']) < self.MIN_SAMPLES:
+            return None
+        samples = sorted(entry['seconds'])
+        p95 = samples[min(len(samples) - 1, int(round(0.95 * (len(samples) - 1))))]
+        return int(max(self.MIN_TIMEOUT, p95 * self.TIMEOUT_FACTOR + self.TIMEOUT_MARGIN))
+
+    def estimate_device(self, key: str, commands: List[str]) -> Optional[float]:
+        """
+        设备整批命令的预计耗时；部分命令无历史时按已知命令的平均耗时补齐，
+        全部命令均无历史时返回 None
+        """
+        known = [s for s in (self.expected_seconds(key, cmd) for cmd in commands) if s is not None]
+        if not known:
+            return None
+        return sum(known) + (len(commands) - len(known)) * (sum(known) / len(known))
+
+    def save(self, force: bool = False):
+        """有新记录时落盘；非强制保存在 SAVE_INTERVAL 内最多写一次"""
+        with self._lock:
+            if not self._dirty or not self.path:
+                return
+            if not force and time.time() - self._last_save < self.SAVE_INTERVAL:
+                return
+            tmp_path = f"{self.path}.tmp"
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(self._history, f, ensure_ascii=False, indent=1, sort_keys=True)
+                # 先写临时文件再替换，避免并发采集或中途退出留下半截 JSON
+                os.replace(tmp_path, self.path)
+                self._dirty = False
+                self._last_save = time.time()
+            except Exception as e:
+                logger.warning(f"保存命令执行历史失败: {e}")
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                self._history = {k: v for k, v in data.items() if isinstance(v, dict)}
+        except Exception as e:
+            logger.warning(f"读取命令执行历史失败，按固定超时执行: {e}")
+            self._history = {}
@@ -2,13 +2,23 @@ import time
 import logging
 import os
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 import re
 from PyQt5.QtCore import QThread, pyqtSignal
 
 from .ssh_connection import SSHConnection
 from .telnet_connection import TelnetConnection
 from .buffer_manager import BufferManager
+from .output_stream import CommandOutputStream, stitch_spilled_output
+from .charset import SessionCharset
+from .pipeline import is_read_only_command
+from .session_pool import SessionPool
+from .device_profile import DeviceProfileCache
+from .ssh_tuning import get_transport_profile, select_transport_profile
+from .jump_host import JumpHost
+from .run_journal import RunJournal
+from .rate_limiter import BandwidthScheduler
+from .command_history import CommandHistory
 from .utils import ConnectionUtils
 
 logger = logging.getLogger(__name__)
@@ -22,7 +32,14 @@ class HighPerformanceConnectionWorker(QThread):
     data_chunk_signal = pyqtSignal(str, int)
 
     def __init__(self, protocol: str, ip: str, port: int, username: str, 
-                 password: str, commands: List[str], mode: str, output_dir: str):
+                 password: str, commands: List[str], mode: str, output_dir: str,
+                 stream_output: bool = False, pipeline_commands: bool = False,
+                 exec_channels: int = 0, reuse_session: bool = False,
+                 use_device_profile: bool = True, transport_profile: str = 'auto',
+                 jump_host: Optional[JumpHost] = None, resume: bool = False,
+                 scheduler: Optional[BandwidthScheduler] = None, site: str = '',
+                 use_command_history: bool = True, output_format: str = 'text',
+                 device_charset: str = 'auto'):
         super().__init__()
         self.protocol = protocol
         self.ip = ip
@@ -37,6 +54,47 @@ class HighPerformanceConnectionWorker(QThread):
         # 性能参数
         self.command_timeout = 300
         self.large_command_timeout = 600
+        # 输出上限：单条命令软上限（超过时告警并在统计中列出，不截断；也用于推算大输出命令的超时）、
+        # 单条命令硬上限（0 不限制）、非流式读取的内存预算（超出部分溢出到临时分段，再拼接进输出文件）
+        self.soft_output_kb = 48 * 1024
+        self.max_output_kb = 0
+        self.output_memory_kb = 16 * 1024
+        # 流式落盘：命令输出边读边写入文件，单设备内存占用与输出大小无关
+        self.stream_output = stream_output
+        # 流水线：连续只读命令按批下发并按提示符切分回显，适合高时延管理链路（默认关闭）
+        self.pipeline_commands = pipeline_commands
+        self.pipeline_depth = 8
+        # SSH 多 exec 通道并发数（<=1 表示使用单一交互式通道），适用于 Linux 类 NOS/Junos/IOS-XR
+        self.exec_channels = exec_channels
+        # 会话复用：结束后会话归还 SessionPool，同一设备的下一次采集跳过连接阶段
+        self.reuse_session = reuse_session
+        # 设备画像缓存：复用上次探测到的提示符与有效的分页命令，缩短连接阶段
+        self.use_device_profile = use_device_profile
+        # SSH 传输画像：'auto' 按设备画像中的实测带宽/RTT 与本机并发度选择，或指定 compat/lan/wan/wan_fast
+        self.transport_profile = transport_profile
+        self.concurrent_sessions = 1  # 本机同时运行的会话数（批量采集时由调度器设置）
+        # 跳板机：目标设备经跳板机共享传输上的 direct-tcpip 通道连接（仅 SSH）
+        self.jump_host = jump_host
+        # 续采：运行日志记录每条命令完成时的输出文件偏移；开启后从上次中断处继续，
+        # 并在会话中途断开时自动重连（最多 max_reconnects 次），只重做断开时未完成的那条命令
+        self.resume = resume
+        self.max_reconnects = 2
+        self.journal = RunJournal.for_output_dir(output_dir)
+        self._journal_key = RunJournal.device_key(mode, protocol, ip, port)
+        self._next_index = 0  # 第一条未完成命令的下标
+        self._checkpoint_stats = (0, 0)  # 最近检查点时的 (完成数, 失败数)，回滚时恢复
+        self._interrupted = False  # 会话在命令执行中途断开
+        # 设备友好调度：设备/站点带宽预算与全局大输出命令并发上限（None 表示不限制）
+        self.scheduler = scheduler
+        self.site = site
+        # 命令执行历史：记录每条命令的耗时/输出字节，据此推算超时、识别大输出命令、安排多通道下发顺序
+        self.history = CommandHistory.instance() if use_command_history else None
+        self._history_key = CommandHistory.make_key(protocol, ip, port)
+        self._history_sample = None  # 最近一条命令待计入历史的 (命令, 耗时, 字节数)
+        # 输出格式：text 为纯文本；gzip/zstd 为带命令索引的压缩采集容器（.cap，比对前导出为文本）
+        self.output_format = output_format
+        # 设备字符集：auto 按会话首次出现的非 ASCII 输出判定 UTF-8/GBK，也可指定 utf-8/gbk
+        self.device_charset = device_charset
         
         # 连接对象
         self.connection = None
@@ -66,13 +124,21 @@ class HighPerformanceConnectionWorker(QThread):
         
         try:
             # 初始化缓冲区管理器
-            self.buffer_manager = BufferManager(self.output_dir, self.mode, self.ip)
+            self.buffer_manager = BufferManager(self.output_dir, self.mode, self.ip, self.output_format)
+            self.buffer_manager.soft_limit = self.soft_output_kb * 1024
+            self._begin_journal()
             
-            # 建立连接
-            if self.protocol == 'ssh':
-                self._run_ssh()
-            elif self.protocol == 'telnet':
-                self._run_telnet()
+            # 建立连接；续采模式下会话中途断开时重连并从第一条未完成命令继续
+            attempt = 0
+            while True:
+                self._interrupted = False
+                if self.protocol == 'ssh':
+                    self._run_ssh()
+                elif self.protocol == 'telnet':
+                    self._run_telnet()
+                if not self._reconnect_after_interrupt(attempt):
+                    break
+                attempt += 1
                 
         except Exception as e:
             self.error_signal.emit("runtime", f"运行错误: {str(e)}")
@@ -83,52 +149,60 @@ class HighPerformanceConnectionWorker(QThread):
     def _run_ssh(self):
         """运行SSH连接"""
         try:
-            self.connection = SSHConnection(self.ip, self.port, self.username, self.password)
-            self.progress_signal.emit(5, f"SSH连接中 {self.ip}:{self.port}...")
-            
-            if not self.connection.connect():
-                raise Exception("SSH连接失败")
-                
-            self.progress_signal.emit(10, "SSH连接成功")
-            self._prepare_ssh_terminal()
-            self._execute_commands()
+            self.connection = self._acquire_pooled_session()
+            if self.connection is not None:
+                # 复用会话池中的已登录会话：跳过握手、认证与提示符探测
+                self.progress_signal.emit(10, f"复用已有SSH会话 {self.ip}:{self.port}")
+                self._apply_output_limits()
+            else:
+                self.connection = self._load_device_profile(
+                    SSHConnection(self.ip, self.port, self.username, self.password))
+                self.connection.transport_profile = self._select_transport_profile()
+                self.connection.jump_host = self.jump_host
+                via = f"（经跳板机 {self.jump_host.label}）" if self.jump_host is not None else ""
+                self.progress_signal.emit(5, f"SSH连接中 {self.ip}:{self.port}{via}...")
+
+                if not self.connection.connect():
+                    raise Exception("SSH连接失败")
+
+                self.progress_signal.emit(10, "SSH连接成功")
+            self._attach_throttle()
+            # 多 exec 通道并发执行（续采时只执行剩余命令，走串行路径），设备不支持时回退交互式串行
+            if not (self.exec_channels > 1 and self._next_index == 0 and self._execute_multiplexed()):
+                if not self.connection.terminal_prepared:
+                    self._prepare_ssh_terminal()
+                self._execute_commands()
             
         except Exception as e:
             self.error_signal.emit("ssh", f"SSH错误: {str(e)}")
 
     def _prepare_ssh_terminal(self):
-        """SSH连接后预处理：关闭分页/扩展宽度，避免输出被分页截断"""
-        pre_commands = [
-            "terminal length 0",
-            "screen-length 0",
-            "screen-length disable",
-            "terminal width 512",
-            "set cli screen-length 0",
-        ]
-        # 发日志：开始预处理
-        # self.progress_signal.emit(12, "SSH预处理：设置无分页/宽度...")
-        for cmd in pre_commands:
-            try:
-                # 发送每条预处理命令并记录到操作日志
-                # self.progress_signal.emit(12, f"SSH预处理执行: {cmd}")
-                # 对SSH，execute_command(command, timeout)
-                self.connection.execute_command(cmd, timeout=10)
-            except Exception:
-                # 某些设备不支持命令，忽略错误，继续尝试下一条
-                continue
-        # 发日志：预处理完成
-        # self.progress_signal.emit(15, "SSH预处理完成")
-    
+        """SSH连接后预处理：识别厂商，按厂商画像关闭分页/扩展宽度，避免输出被分页截断"""
+        self.connection.identify_vendor()
+        self.connection.prepare_terminal()
+        self._save_device_profile()
+
     def _run_telnet(self):
         """运行Telnet连接"""
         try:
-            self.connection = TelnetConnection(self.ip, self.port, self.username, self.password)
+            self.connection = self._acquire_pooled_session()
+            if self.connection is not None:
+                self.progress_signal.emit(15, f"复用已有Telnet会话 {self.ip}:{self.port}")
+                self._apply_output_limits()
+                self._attach_throttle()
+                self._execute_commands()
+                return
+
+            self.connection = self._load_device_profile(
+                TelnetConnection(self.ip, self.port, self.username, self.password))
             self.progress_signal.emit(5, f"Telnet连接中 {self.ip}:{self.port}...")
             
             if not self.connection.connect():
                 raise Exception("Telnet连接失败")
                 
             self.progress_signal.emit(15, "Telnet连接成功")
+            self._save_device_profile()
+            self._attach_throttle()
             self._execute_commands()
             
         except Exception as e:
@@ -152,47 +226,354 @@ class HighPerformanceConnectionWorker(QThread):
         return cmd
 
     def _execute_commands(self):
-        """执行所有命令"""
-        for i, cmd in enumerate(self.commands):
+        """执行所有命令（开启流水线时，连续的只读小输出命令按批下发）；从第一条未完成命令开始，每完成一条记录检查点"""
+        i = self._next_index
+        serial_until = 0  # 流水线回退后，该下标之前的命令逐条串行执行
+        while i < len(self.commands):
             if not self.is_running:
                 break
-                
-            progress = 10 + int(80 * i / len(self.commands))
-            self.progress_signal.emit(progress, f"执行: {cmd[:50]}...")
-            
+
+            if self.pipeline_commands and i >= serial_until:
+                batch = self._next_pipeline_batch(i)
+                if len(batch) > 1:
+                    if self._execute_pipelined(i, batch):
+                        i += len(batch)
+                        self._checkpoint(i)
+                        continue
+                    if self._session_lost():
+                        # 流水线放弃后通道未能对齐，不能在同一会话上回退串行
+                        break
+                    logger.info(f"流水线切分有歧义，回退串行执行 {len(batch)} 条命令")
+                    serial_until = i + len(batch)
+
+            if not self._execute_one(i, self.commands[i]):
+                break
+            if self._session_lost():
+                break
+            self._record_history()
+            i += 1
+            self._checkpoint(i)
+
+    def _begin_journal(self):
+        """登记本次运行；续采模式下找到同一设备未完成的运行时沿用其输出文件并跳过已完成命令"""
+        digest = RunJournal.commands_digest(self.commands)
+        state = self.journal.pending(self._journal_key, digest) if self.resume else None
+        if state is None:
+            self.journal.begin(self._journal_key, self.buffer_manager.filepath, digest, len(self.commands))
+            return
+        self.buffer_manager.resume_from(state['file'], int(state.get('offset') or 0))
+        self._next_index = min(int(state.get('next_index') or 0), len(self.commands))
+        self._checkpoint_stats = (int(state.get('completed') or 0), int(state.get('failed') or 0))
+        self.stats['completed_commands'], self.stats['failed_commands'] = self._checkpoint_stats
+        self.progress_signal.emit(3, f"续采：已完成 {self._next_index}/{len(self.commands)} 条命令，"
+                                     f"从第 {self._next_index + 1} 条继续写入 {os.path.basename(state['file'])}")
+
+    def _checkpoint(self, next_index: int):
+        """前 next_index 条命令已完成：刷新输出并在运行日志中记录文件偏移"""
+        self._next_index = next_index
+        stats = self._checkpoint_stats = (self.stats['completed_commands'], self.stats['failed_commands'])
+        # 检查点记录由写入线程在该偏移之前的数据落到文件后追加，不会先于输出数据
+        self.buffer_manager.checkpoint(
+            lambda offset: self.journal.checkpoint(self._journal_key, next_index, offset, *stats))
+
+    def _session_lost(self) -> bool:
+        """命令执行后会话已断开：该命令输出可能残缺，不计入检查点"""
+        if self.connection is None or self.connection.is_alive():
+            return False
+        self._interrupted = True
+        # 残缺输出的命令计为失败（续采重连时回滚到检查点统计）
+        completed, failed = self._checkpoint_stats
+        self.stats['completed_commands'], self.stats['failed_commands'] = completed, failed + 1
+        logger.warning(f"{self.ip} 会话在第 {self._next_index + 1} 条命令执行中断开")
+        return True
+
+    def _reconnect_after_interrupt(self, attempt: int) -> bool:
+        """续采模式下会话中途断开：回滚未完成命令的输出，关闭旧会话，退避后重连"""
+        if not (self.resume and self._interrupted and self.is_running and attempt < self.max_reconnects):
+            return False
+        self.buffer_manager.rollback()
+        self.stats['completed_commands'], self.stats['failed_commands'] = self._checkpoint_stats
+        if self.connection:
+            self.connection.close()
+            self.connection = None
+        delay = min(10, 2 ** attempt)
+        progress = 10 + int(80 * self._next_index / len(self.commands))
+        self.progress_signal.emit(progress, f"会话中断，{delay}s 后重连并从第 {self._next_index + 1} 条命令续采"
+                                            f"（第 {attempt + 1}/{self.max_reconnects} 次）")
+        time.sleep(delay)
+        return True
+
+    def _next_pipeline_batch(self, start: int) -> List[str]:
+        """从 start 起取连续的只读、非大数据量命令，最多 pipeline_depth 条"""
+        batch = []
+        for cmd in self.commands[start:start + self.pipeline_depth]:
+            if not is_read_only_command(cmd) or self._is_large_output(cmd):
+                break
+            batch.append(cmd)
+        return batch
+
+    def _execute_pipelined(self, start: int, batch: List[str]) -> bool:
+        """流水线执行一批命令，成功则逐条格式化写入；返回 False 表示需回退串行"""
+        progress = 10 + int(80 * start / len(self.commands))
+        self.progress_signal.emit(progress, f"流水线执行: {len(batch)} 条命令 ({batch[0][:30]}...)")
+        try:
+            results = self.connection.execute_pipelined(batch, self.command_timeout)
+        except Exception as e:
+            logger.warning(f"流水线执行异常: {e}")
+            results = None
+        if results is None:
+            return False
+        for cmd, (success, output) in zip(batch, results):
+            formatted_output = ConnectionUtils.format_command_output(cmd, output, success)
+            self.buffer_manager.begin_command(cmd)
+            if self.buffer_manager.add_data(formatted_output):
+                self.stats['completed_commands'] += 1
+            else:
+                self.stats['failed_commands'] += 1
+            self.buffer_manager.end_command(success)
+        return True
+
+    def _execute_multiplexed(self) -> bool:
+        """在同一 SSH Transport 上并发多个 exec 通道执行全部命令，按原顺序写盘；返回 False 表示需回退"""
+        self.progress_signal.emit(12, f"多通道并发执行: {len(self.commands)} 条命令, 通道数 {self.exec_channels}")
+        large = [self._is_large_output(cmd) for cmd in self.commands]
+        timeouts = [self._command_timeout(cmd, is_large) for cmd, is_large in zip(self.commands, large)]
+        # 整批并发执行，含大输出命令时占用一个大输出名额
+        if any(large) and not self._acquire_large_output_slot():
+            return True
+        try:
+            results = self.connection.execute_parallel(self.commands, self.exec_channels, timeouts,
+                                                       order=self._longest_first_order())
+        finally:
+            if any(large) and self.scheduler is not None:
+                self.scheduler.release_large_output()
+        if results is None:
+            self.progress_signal.emit(12, "设备不支持多通道执行，回退逐条执行")
+            return False
+        samples = []
+        for index, (cmd, (success, output, elapsed, nbytes)) in enumerate(zip(self.commands, results)):
+            self.buffer_manager.begin_command(cmd)
+            if self._write_output(cmd, success, output, index):
+                self.stats['completed_commands'] += 1
+                if success and elapsed < timeouts[index]:
+                    samples.append((cmd, elapsed, nbytes))
+            else:
+                self.stats['failed_commands'] += 1
+            self.buffer_manager.end_command(success)
+        if self.history is not None and self.connection.is_alive():
+            # 与串行路径一致：只计入会话未断开时成功且未超时的命令
+            for sample in samples:
+                self.history.record(self._history_key, *sample)
+        self._checkpoint(len(self.commands))
+        self.progress_signal.emit(90, "多通道执行完成")
+        return True
+
+    def _is_large_output(self, cmd: str) -> bool:
+        """大数据量命令判定：通用列表 + 已识别厂商的大输出命令 + 历史输出较大的命令"""
+        if ConnectionUtils.is_large_output_command(cmd, getattr(self.connection, 'vendor_profile', None)):
+            return True
+        return self.history is not None and self.history.is_large_output(self._history_key, cmd)
+
+    def _command_timeout(self, cmd: str, is_large_output: bool) -> int:
+        """
+        命令超时：该设备该命令有足够历史样本时按实测耗时分布推算（CommandHistory.timeout_for，
+        不超过 large_command_timeout 的 4 倍）；否则大数据量命令按厂商典型吞吐推算读满输出上限所需时间
+        （留 2 倍余量），限定在 [command_timeout, large_command_timeout] 之间，厂商未识别时使用 large_command_timeout。
+        """
+        observed = self.history.timeout_for(self._history_key, cmd) if self.history is not None else None
+        if observed is not None:
+            timeout = min(observed, self.large_command_timeout * 4)
+        elif not is_large_output:
+            return self.command_timeout
+        else:
+            vendor_profile = getattr(self.connection, 'vendor_profile', None)
+            if vendor_profile is None or vendor_profile.name == 'generic':
+                timeout = self.large_command_timeout
+            else:
+                budget = int(2 * self.soft_output_kb / max(1, vendor_profile.output_kb_per_sec))
+                timeout = max(self.command_timeout, min(self.large_command_timeout, budget))
+        throttle = getattr(self.connection, 'throttle', None)
+        if throttle is not None and is_large_output:
+            # 带宽预算限速后读满输出软上限所需时间可能超过上限超时，按预算速率放宽
+            timeout = max(timeout, int(2 * self.soft_output_kb * 1024 / max(1.0, throttle.rate_bytes)))
+        return timeout
+
+    def _longest_first_order(self) -> Optional[List[int]]:
+        """多通道下发顺序：按历史预计耗时从长到短（无历史的命令保持原顺序排在已知命令之后）"""
+        if self.history is None:
+            return None
+        expected = [self.history.expected_seconds(self._history_key, cmd) for cmd in self.commands]
+        if not any(s is not None for s in expected):
+            return None
+        return sorted(range(len(self.commands)), key=lambda i: -(expected[i] if expected[i] is not None else -1))
+
+    def _execute_one(self, i: int, cmd: str) -> bool:
+        """串行执行单条命令；等待大输出名额期间采集被停止（命令未下发）时返回 False"""
+        progress = 10 + int(80 * i / len(self.commands))
+        self.progress_signal.emit(progress, f"执行: {cmd[:50]}...")
+        self._history_sample = None
+        success = False
+
+        try:
+            # 计算超时时间
+            is_large_output = self._is_large_output(cmd)
+            timeout = self._command_timeout(cmd, is_large_output)
+            if is_large_output and not self._acquire_large_output_slot(progress, cmd):
+                # 等待大输出名额期间采集被停止
+                return False
+
+            started = time.time()
+            bytes_before = self.buffer_manager.total_bytes
+            self.buffer_manager.begin_command(cmd)
             try:
-                # 计算超时时间
-                is_large_output = ConnectionUtils.is_large_output_command(cmd)
-                timeout = self.large_command_timeout if is_large_output else self.command_timeout
-                
-                # 执行命令
-                if isinstance(self.connection, SSHConnection):
-                    success, output = self.connection.execute_command(cmd, timeout)
-                elif isinstance(self.connection, TelnetConnection):
-                    success, output = self.connection.execute_command(cmd, timeout, is_large_output)
+                if self.stream_output:
+                    accepted, success = self._execute_streaming(cmd, timeout, is_large_output)
                 else:
-                    success, output = False, "连接类型不支持"
-                
-                # 格式化并保存输出
-                formatted_output = ConnectionUtils.format_command_output(cmd, output, success)
-                if self.buffer_manager.add_data(formatted_output):
-                    self.stats['completed_commands'] += 1
-                else:
-                    self.stats['failed_commands'] += 1
-                    
-            except Exception as e:
+                    # 执行命令
+                    if isinstance(self.connection, SSHConnection):
+                        success, output = self.connection.execute_command(cmd, timeout)
+                    elif isinstance(self.connection, TelnetConnection):
+                        success, output = self.connection.execute_command(cmd, timeout, is_large_output)
+                    else:
+                        success, output = False, "连接类型不支持"
+
+                    # 格式化并保存输出
+                    accepted = self._write_output(cmd, success, output)
+            finally:
+                if is_large_output and self.scheduler is not None:
+                    self.scheduler.release_large_output()
+
+            if accepted:
+                self.stats['completed_commands'] += 1
+                elapsed = time.time() - started
+                if success and elapsed < timeout:
+                    # 会话确认未断开后由 _execute_commands 计入命令历史（超时与残缺输出会拉偏耗时分布）
+                    self._history_sample = (cmd, elapsed, self.buffer_manager.total_bytes - bytes_before)
+            else:
                 self.stats['failed_commands'] += 1
-                error_output = ConnectionUtils.format_command_output(cmd, f"错误: {str(e)}", False)
-                self.buffer_manager.add_data(error_output)
-                logger.error(f"命令执行失败: {cmd}, 错误: {e}")
+
+        except Exception as e:
+            self.stats['failed_commands'] += 1
+            error_output = ConnectionUtils.format_command_output(cmd, f"错误: {str(e)}", False)
+            self.buffer_manager.add_data(error_output)
+            logger.error(f"命令执行失败: {cmd}, 错误: {e}")
+        self.buffer_manager.end_command(success)
+        return True
+
+    def _write_output(self, cmd: str, success: bool, output: str, index: int = 0) -> bool:
+        """
+        写入一条非流式执行的命令输出：超过内存预算、已溢出到临时分段的输出逐块拼接进输出文件，
+        其余按 format_command_output 格式化写入。返回输出是否被完整接受
+        """
+        spill = self.connection.take_spilled_output(index)
+        if spill is None:
+            return self.buffer_manager.add_data(ConnectionUtils.format_command_output(cmd, output, success))
+        return stitch_spilled_output(self.buffer_manager, cmd, spill, output,
+                                     isinstance(self.connection, TelnetConnection), self.connection.charset)
+
+    def _record_history(self):
+        """将上一条命令的耗时/输出字节计入命令历史"""
+        sample, self._history_sample = self._history_sample, None
+        if self.history is not None and sample is not None:
+            self.history.record(self._history_key, *sample)
+
+    def _execute_streaming(self, cmd: str, timeout: int, is_large_output: bool) -> Tuple[bool, bool]:
+        """
+        流式执行单条命令：输出经 CommandOutputStream 增量解码/归一化后直接写入 BufferManager，
+        返回 (输出是否被完整接受, 命令是否执行成功)
+        """
+        is_telnet = isinstance(self.connection, TelnetConnection)
+        stream = CommandOutputStream(self.buffer_manager, cmd, drop_blank_lines=is_telnet,
+                                     charset=self.connection.charset)
+        if isinstance(self.connection, SSHConnection):
+            success, output = self.connection.execute_command(cmd, timeout, sink=stream)
+        elif is_telnet:
+            success, output = self.connection.execute_command(cmd, timeout, is_large_output, sink=stream)
+        else:
+            success, output = False, "连接类型不支持"
+        # 成功时 output 仅为截断提示，失败时为错误信息，均作为本条输出的结尾
+        return stream.close(output), success
+
+    def _attach_throttle(self):
+        """按设备/站点带宽预算为当前会话设置读取限速（复用的会话也重新设置，不沿用上次的预算）"""
+        throttle = self.scheduler.throttle_for(self.ip, self.site) if self.scheduler is not None else None
+        if throttle is not None:
+            throttle.cancelled = lambda: not self.is_running
+        self.connection.throttle = throttle
+
+    def _acquire_large_output_slot(self, progress: int = 12, cmd: str = '') -> bool:
+        """取得全局大输出命令名额；需排队时提示进度，等待中采集被停止返回 False"""
+        if self.scheduler is None:
+            return True
+        def on_wait():
+            self.progress_signal.emit(progress, f"等待大输出命令名额（全局上限 {self.scheduler.large_output_slots}）: "
+                                                f"{cmd[:50] or '多通道批量执行'}")
+        return self.scheduler.acquire_large_output(lambda: not self.is_running, on_wait)
+
+    def _load_device_profile(self, connection):
+        """连接前加载设备画像（提示符/有效预处理命令）并设置会话字符集与输出上限"""
+        connection.charset = SessionCharset(self.device_charset)
+        self._apply_output_limits(connection)
+        if self.use_device_profile:
+            connection.profile = DeviceProfileCache.instance().get(self.protocol, self.ip, self.port)
+        return connection
+
+    def _apply_output_limits(self, connection=None):
+        """设置会话的单条命令硬上限与非流式读取内存预算（复用的会话同样按本次配置重新设置）"""
+        connection = connection or self.connection
+        connection.max_output_size = self.max_output_kb * 1024
+        connection.memory_budget = max(1024, self.output_memory_kb) * 1024
+
+    def _select_transport_profile(self):
+        """选择 SSH 传输画像：显式配置优先，'auto' 时按上次采集实测的链路带宽/RTT 与本机 CPU 负载选择"""
+        if self.transport_profile != 'auto':
+            return get_transport_profile(self.transport_profile)
+        profile = self.connection.profile or {}
+        return select_transport_profile(profile.get('link_kbps'), profile.get('rtt_ms'),
+                                        concurrent_sessions=self.concurrent_sessions,
+                                        measured_with=profile.get('transport_profile'))
+
+    def _save_device_profile(self):
+        """连接与预处理完成后写回本次学习到的设备画像"""
+        if not self.use_device_profile or not self.connection:
+            return
+        DeviceProfileCache.instance().update(self.protocol, self.ip, self.port,
+                                             self.connection.session_profile())
+
+    def _acquire_pooled_session(self):
+        """从会话池租用同一设备的已登录会话（未开启复用时返回 None）"""
+        if not self.reuse_session:
+            return None
+        return SessionPool.instance().acquire(self.protocol, self.ip, self.port, self.username)
 
     def _finalize(self):
         """最终处理"""
         if self.connection:
-            self.connection.close()
+            timing = getattr(self.connection, 'timing', None)
+            if timing is not None:
+                logger.info(f"{self.ip} 链路时序: {timing.describe()}")
+            throttle = getattr(self.connection, 'throttle', None)
+            if throttle is not None and throttle.throttled_seconds:
+                logger.info(f"{self.ip} 带宽预算限速累计 {throttle.throttled_seconds:.1f}s")
+            if self.connection.connected:
+                # 写回本次实测的链路带宽/RTT，下次连接据此选择传输画像
+                self._save_device_profile()
+            if self.reuse_session and self.is_running and getattr(self.connection, 'at_prompt', False):
+                # 最后一条命令在提示符处结束的会话归还会话池，供下一次（变更前/变更后）采集复用
+                SessionPool.instance().release(self.protocol, self.username, self.connection)
+            else:
+                if self.reuse_session and self.is_running:
+                    # 最后一条命令超时或失败，设备可能仍在输出，残余回显会混入下一次采集的首条命令
+                    logger.info(f"{self.ip} 最后一条命令未在提示符处结束，关闭会话不复用")
+                self.connection.close()
         
+        if self.history is not None:
+            self.history.save()
+
         if self.buffer_manager:
             final_stats = self.buffer_manager.finalize()
+            if not self._interrupted and self._next_index >= len(self.commands):
+                self.journal.finish(self._journal_key)
             
             # 合并统计信息
             stats_info = {
@@ -201,7 +582,9 @@ class HighPerformanceConnectionWorker(QThread):
                 'completed_commands': self.stats['completed_commands'],
                 'failed_commands': self.stats['failed_commands'],
                 'total_bytes': final_stats['total_bytes'],
-                'speed_kb_s': final_stats['speed_kb_s']
+                'speed_kb_s': final_stats['speed_kb_s'],
+                'command_sizes': final_stats['command_sizes'],
+                'oversize_commands': final_stats['oversize_commands']
             }
             
             # 使用完整的文件路径而不是仅文件名
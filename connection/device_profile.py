@@ -0,0 +1,156 @@
+import os
+import json
+import time
+import logging
+import threading
+from typing import Dict, Any, Optional, List, Callable, Tuple
+
+from .utils import ConnectionUtils
+
+logger = logging.getLogger(__name__)
+
+# 设备拒绝命令时的典型回显（小写匹配）：华为/H3C、Cisco、Juniper、Linux 类 NOS
+REJECTION_MARKERS = (
+    'unrecognized command',
+    'invalid input',
+    'incomplete command',
+    'unknown command',
+    'syntax error',
+    'wrong parameter',
+    'error:',
+    'command not found',
+    '% invalid',
+    '% ambiguous',
+)
+
+
+def is_command_rejected(output: str) -> bool:
+    """判断命令回显是否为设备的拒绝/语法错误提示"""
+    text = (output or '').lower()
+    return any(marker in text for marker in REJECTION_MARKERS)
+
+
+def run_terminal_setup(execute: Callable[[str], Tuple[bool, str]], candidates: List[str]) -> List[str]:
+    """
+    逐条执行终端预处理命令，返回设备实际接受的命令列表。
+    execute(cmd) 返回 (是否成功, 回显)；执行失败或回显为拒绝提示的命令视为不支持。
+    """
+    accepted = []
+    for cmd in candidates:
+        try:
+            ok, output = execute(cmd)
+        except Exception:
+            # 某些设备不支持命令，忽略错误，继续尝试下一条
+            continue
+        if ok and not is_command_rejected(output):
+            accepted.append(cmd)
+    return accepted
+
+
+def setup_terminal(execute: Callable[[str], Tuple[bool, str]], cached_commands: List[str],
+                   vendor_profile=None) -> List[str]:
+    """
+    终端预处理（关闭分页/加宽），按以下顺序选择候选命令，返回设备接受的命令：
+    1. 设备画像中记录的有效命令
+    2. 厂商画像的分页命令（厂商已识别且无需分页命令时直接返回）
+    3. 全部通用候选命令
+    """
+    if cached_commands:
+        accepted = run_terminal_setup(execute, cached_commands)
+        if accepted:
+            return accepted
+    if vendor_profile is not None and vendor_profile.name != 'generic':
+        if not vendor_profile.pager_commands:
+            return []
+        accepted = run_terminal_setup(execute, vendor_profile.pager_commands)
+        if accepted:
+            return accepted
+    return run_terminal_setup(execute, ConnectionUtils.TERMINAL_PREPARE_COMMANDS)
+
+
+class DeviceProfileCache:
+    """
+    设备会话画像缓存（JSON 持久化）：按 协议/IP/端口 记录
+    - prompt：探测到的提示符字面量
+    - vendor：识别出的厂商（vendor_profiles）
+    - terminal_commands：设备实际接受的分页/宽度命令
+    再次连接同一设备时直接使用缓存的提示符并只下发有效的预处理命令，省去提示符探测与无效命令的往返。
+    缓存提示符与设备实际不符时（如设备改名），连接层自动回退完整探测并刷新画像。
+    """
+
+    _instance: Optional['DeviceProfileCache'] = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, path: str = 'device_profiles.json'):
+        self.path = path
+        self._profiles: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    @classmethod
+    def instance(cls) -> 'DeviceProfileCache':
+        """进程级共享画像缓存"""
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    @staticmethod
+    def make_key(protocol: str, ip: str, port: int) -> str:
+        return f"{protocol}://{ip}:{int(port)}"
+
+    def get(self, protocol: str, ip: str, port: int) -> Optional[Dict[str, Any]]:
+        """读取设备画像（返回副本），不存在时返回 None"""
+        with self._lock:
+            self._ensure_loaded()
+            profile = self._profiles.get(self.make_key(protocol, ip, port))
+            return dict(profile) if profile else None
+
+    def update(self, protocol: str, ip: str, port: int, profile: Dict[str, Any]):
+        """合并更新设备画像并落盘；空值字段不覆盖已有记录"""
+        if not profile:
+            return
+        key = self.make_key(protocol, ip, port)
+        with self._lock:
+            self._ensure_loaded()
+            merged = dict(self._profiles.get(key) or {})
+            merged.update({k: v for k, v in profile.items() if v not in (None, '', [])})
+            if merged == self._profiles.get(key):
+                return
+            merged['updated_at'] = time.strftime('%Y-%m-%d %H:%M:%S')
+            self._profiles[key] = merged
+            self._save()
+
+    def invalidate(self, protocol: str, ip: str, port: int):
+        """删除设备画像（下次连接重新完整探测）"""
+        with self._lock:
+            self._ensure_loaded()
+            if self._profiles.pop(self.make_key(protocol, ip, port), None) is not None:
+                self._save()
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                self._profiles = {k: v for k, v in data.items() if isinstance(v, dict)}
+        except Exception as e:
+            logger.warning(f"读取设备画像缓存失败，将重新探测: {e}")
+            self._profiles = {}
+
+    def _save(self):
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._profiles, f, ensure_ascii=False, indent=2, sort_keys=True)
+            # 先写临时文件再替换，避免并发采集或中途退出留下半截 JSON
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.warning(f"保存设备画像缓存失败: {e}")
@@ -0,0 +1,155 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundFileWriter:
+    """
+    输出文件后台写入线程：
+    - 文件在首次写入时以追加方式打开一次，整个运行期间保持打开，结束时关闭
+    - 采集线程通过 write 投递已编码的数据块后立即返回，磁盘 I/O 在写入线程中完成，读 socket 不等磁盘
+    - 队列按字节数有界（max_queue_bytes）：磁盘慢于网络、积压超过上限时 write 阻塞，形成背压，内存占用有界
+    - call_after 投递的回调在其之前的数据全部写入（并 flush 到操作系统）后执行，用于记录续采检查点
+    写入出错后不再写盘，错误保存在 error 中，后续 write 返回 False。
+    """
+
+    def __init__(self, filepath: str, max_queue_bytes: int = 16 * 1024 * 1024):
+        self.filepath = filepath
+        self.max_queue_bytes = max(1, int(max_queue_bytes))
+        self.error: Optional[Exception] = None
+
+        self._queue = deque()
+        self._queued_bytes = 0
+        self._busy = False  # 写入线程正在处理一个已出队的条目
+        self._closed = False
+        self._cond = threading.Condition()
+        self._file = None
+        self._thread: Optional[threading.Thread] = None
+
+        self.stats = {'chunks': 0, 'bytes': 0, 'backpressure_waits': 0, 'backpressure_seconds': 0.0}
+
+    def write(self, data: bytes) -> bool:
+        """投递一个数据块；队列积压超过上限时阻塞等待写入线程追上"""
+        if not data:
+            return self.error is None
+        with self._cond:
+            if self.error is not None or self._closed:
+                return False
+            if self._queued_bytes + len(data) > self.max_queue_bytes and self._queued_bytes > 0:
+                start = time.time()
+                self.stats['backpressure_waits'] += 1
+                while (self._queued_bytes + len(data) > self.max_queue_bytes and self._queued_bytes > 0
+                       and self.error is None):
+                    self._cond.wait(0.5)
+                self.stats['backpressure_seconds'] += time.time() - start
+                if self.error is not None:
+                    return False
+            self._queue.append(data)
+            self._queued_bytes += len(data)
+            self._ensure_thread()
+            self._cond.notify_all()
+        return True
+
+    def call_after(self, callback: Callable[[], None]):
+        """在此前投递的数据全部写入后，由写入线程执行 callback（写入出错时不执行）"""
+        with self._cond:
+            if self._closed:
+                return
+            self._queue.append(callback)
+            self._ensure_thread()
+            self._cond.notify_all()
+
+    def drain(self):
+        """等待已投递的数据与回调全部处理完毕（文件内容已交给操作系统）"""
+        with self._cond:
+            while (self._queue or self._busy) and self._thread is not None and self._thread.is_alive():
+                self._cond.wait(0.5)
+
+    def truncate(self, offset: int):
+        """等待队列清空后将文件截断到 offset（续采回滚使用）"""
+        self.drain()
+        with self._cond:
+            self._close_file()
+            if os.path.exists(self.filepath) and os.path.getsize(self.filepath) > offset:
+                with open(self.filepath, 'r+b') as f:
+                    f.truncate(offset)
+
+    def close(self):
+        """写完剩余数据后关闭文件并结束写入线程（可重复调用）"""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+        with self._cond:
+            self._close_file()
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name=f"writer-{os.path.basename(self.filepath)}",
+                                            daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if not self._queue:
+                    return
+                # 一次取出当前全部积压，合并为一次系统调用
+                items = list(self._queue)
+                self._queue.clear()
+                self._busy = True
+            try:
+                self._process(items)
+            finally:
+                with self._cond:
+                    self._queued_bytes -= sum(len(item) for item in items if isinstance(item, bytes))
+                    self._busy = False
+                    self._cond.notify_all()
+
+    def _process(self, items):
+        pending = []
+        for item in items:
+            if isinstance(item, bytes):
+                pending.append(item)
+                continue
+            # 回调：先把之前的数据写出并 flush，保证回调看到的是已落到文件的内容
+            self._write_out(pending)
+            pending = []
+            if self.error is None:
+                try:
+                    item()
+                except Exception as e:
+                    logger.warning(f"写入线程回调执行失败: {e}")
+        self._write_out(pending)
+
+    def _write_out(self, chunks):
+        if not chunks or self.error is not None:
+            return
+        try:
+            if self._file is None:
+                self._file = open(self.filepath, 'ab')
+            self._file.write(b''.join(chunks))
+            self._file.flush()
+            self.stats['chunks'] += len(chunks)
+            self.stats['bytes'] += sum(len(chunk) for chunk in chunks)
+        except Exception as e:
+            self.error = e
+            logger.error(f"文件写入错误: {self.filepath}: {e}")
+
+    def _close_file(self):
+        if self._file is not None:
+            try:
+                self._file.close()
+            except Exception:
+                pass
+            self._file = None
@@ -0,0 +1,452 @@
+import os
+import csv
+import time
+import logging
+import configparser
+from collections import deque
+from typing import List, Dict, Optional, Tuple, Any
+from PyQt5.QtCore import QObject, QThread, pyqtSignal
+
+from .connection_worker import HighPerformanceConnectionWorker
+from .async_connection import AsyncCollectionRunner
+from .jump_host import JumpHost
+from .rate_limiter import BandwidthScheduler
+from .command_history import CommandHistory
+
+logger = logging.getLogger(__name__)
+
+
+class DeviceInventory:
+    """设备清单解析（CSV / INI），输出统一的设备字典列表"""
+
+    # CSV 列名别名（小写），兼容常见中英文表头
+    FIELD_ALIASES = {
+        'ip': 'ip', 'host': 'ip', 'address': 'ip', 'ip地址': 'ip',
+        'port': 'port', '端口': 'port',
+        'protocol': 'protocol', 'proto': 'protocol', '协议': 'protocol',
+        'username': 'username', 'user': 'username', '用户名': 'username',
+        'password': 'password', 'pass': 'password', '密码': 'password',
+        'jump_host': 'jump_host', 'jump': 'jump_host', 'bastion': 'jump_host', '跳板机': 'jump_host',
+        'site': 'site', '站点': 'site',
+    }
+
+    @staticmethod
+    def load(file_path: str) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """
+        加载设备清单，返回 (设备列表, 错误列表)。
+        - .ini/.cfg：每个 section 为一台设备（section 名为 IP 或 IP:端口），[DEFAULT] 提供公共凭据
+        - 其他后缀按 CSV 处理：表头需包含 ip，可选 port/protocol/username/password/jump_host/site
+        jump_host 为 主机[:端口]，仅 SSH 设备可经跳板机采集；site 为站点名（对应站点带宽预算）
+        """
+        if not os.path.exists(file_path):
+            return [], [f"找不到设备清单文件: {file_path}"]
+        ext = os.path.splitext(file_path)[1].lower()
+        try:
+            if ext in ('.ini', '.cfg'):
+                rows = DeviceInventory._read_ini(file_path)
+            else:
+                rows = DeviceInventory._read_csv(file_path)
+        except Exception as e:
+            return [], [f"解析设备清单失败: {str(e)}"]
+
+        devices: List[Dict[str, Any]] = []
+        errors: List[str] = []
+        seen = set()
+        for lineno, row in rows:
+            device, error = DeviceInventory._normalize(row)
+            if error:
+                errors.append(f"第{lineno}项: {error}")
+                continue
+            key = (device['protocol'], device['ip'], device['port'])
+            if key in seen:
+                errors.append(f"第{lineno}项: 重复设备 {device['ip']}:{device['port']}，已忽略")
+                continue
+            seen.add(key)
+            devices.append(device)
+        return devices, errors
+
+    @staticmethod
+    def _read_csv(file_path: str) -> List[Tuple[int, Dict[str, str]]]:
+        rows = []
+        # utf-8-sig 兼容 Excel 导出的带 BOM 文件
+        with open(file_path, 'r', encoding='utf-8-sig', newline='') as f:
+            reader = csv.DictReader(line for line in f if line.strip() and not line.lstrip().startswith('#'))
+            for index, raw in enumerate(reader, start=2):
+                row = {}
+                for k, v in raw.items():
+                    if k is None:
+                        continue
+                    field = DeviceInventory.FIELD_ALIASES.get(k.strip().lower())
+                    if field:
+                        row[field] = (v or '').strip()
+                rows.append((index, row))
+        return rows
+
+    @staticmethod
+    def _read_ini(file_path: str) -> List[Tuple[int, Dict[str, str]]]:
+        parser = configparser.ConfigParser(interpolation=None)
+        parser.read(file_path, encoding='utf-8-sig')
+        rows = []
+        for index, section in enumerate(parser.sections(), start=1):
+            row = {'ip': section.strip()}
+            for k, v in parser.items(section):
+                field = DeviceInventory.FIELD_ALIASES.get(k.strip().lower())
+                if field and field != 'ip':
+                    row[field] = (v or '').strip()
+            rows.append((index, row))
+        return rows
+
+    @staticmethod
+    def _normalize(row: Dict[str, str]) -> Tuple[Optional[Dict[str, Any]], str]:
+        """统一设备字段：支持 ip 列写成 IP:端口，缺省端口按协议取 22/23"""
+        ip = (row.get('ip') or '').strip()
+        if not ip:
+            return None, "缺少IP地址"
+        protocol = (row.get('protocol') or 'ssh').strip().lower()
+        if protocol not in ('ssh', 'telnet'):
+            return None, f"协议无效: {protocol}"
+
+        port_str = (row.get('port') or '').strip()
+        if ':' in ip:
+            ip, _, inline_port = ip.partition(':')
+            port_str = port_str or inline_port.strip()
+        try:
+            port = int(port_str) if port_str else (22 if protocol == 'ssh' else 23)
+        except ValueError:
+            return None, f"端口号无效: {port_str}"
+
+        jump_host = (row.get('jump_host') or '').strip()
+        if jump_host:
+            if protocol != 'ssh':
+                return None, f"跳板机仅支持SSH设备: {ip}"
+            try:
+                JumpHost.parse_address(jump_host)
+            except ValueError:
+                return None, f"跳板机地址无效: {jump_host}"
+
+        return {
+            'protocol': protocol,
+            'ip': ip.strip(),
+            'port': port,
+            'username': row.get('username') or '',
+            'password': row.get('password') or '',
+            'jump_host': jump_host,
+            'site': (row.get('site') or '').strip(),
+        }, ""
+
+
+class AsyncCollectionThread(QThread):
+    """在独立线程的事件循环中运行 AsyncCollectionRunner，每台设备的结果与汇总通过信号回到界面线程"""
+
+    device_result_signal = pyqtSignal(dict)
+    summary_signal = pyqtSignal(dict)
+
+    def __init__(self, runner: AsyncCollectionRunner, parent: Optional[QObject] = None):
+        super().__init__(parent)
+        self.runner = runner
+        runner.device_callback = self.device_result_signal.emit
+
+    def run(self):
+        try:
+            summary = self.runner.run()
+        except Exception as e:
+            logger.error(f"asyncio 采集运行失败: {e}")
+            summary = {}
+        self.summary_signal.emit(summary)
+
+    def stop(self):
+        self.runner.stop()
+
+
+class ParallelCollectionManager(QObject):
+    """
+    多设备并行采集调度器：基于 HighPerformanceConnectionWorker 的有界工作池。
+    - 同时运行的设备数不超过 max_concurrency，其余设备排队
+    - 按命令执行历史预计耗时从长到短启动设备（最长作业优先），避免大输出设备最后才开始拖长整批耗时
+    - 每台设备使用独立的 BufferManager 输出文件
+    - 汇总各设备统计信息，全部完成后通过 all_finished_signal 返回
+    async_sessions 为 True 时改由 AsyncCollectionRunner 在单个事件循环中驱动全部会话（不再每台设备一个工作线程）；
+    该后端不使用流水线、exec 通道与会话复用（这些优化被忽略）；跳板机、续采与带宽调度会改变采集行为，
+    启用了这些功能时仍使用线程工作池。
+    """
+
+    progress_signal = pyqtSignal(int, str)
+    device_finished_signal = pyqtSignal(str, str, bool, dict)  # ip, 文件路径, 是否成功, 设备统计
+    all_finished_signal = pyqtSignal(dict)
+
+    def __init__(self, devices: List[Dict[str, Any]], commands: List[str], mode: str,
+                 output_dir: str, max_concurrency: int = 16, parent: Optional[QObject] = None):
+        super().__init__(parent)
+        self.devices = list(devices)
+        self.commands = commands
+        self.mode = mode
+        self.output_dir = output_dir
+        self.max_concurrency = max(1, int(max_concurrency))
+        # 多设备并发时默认流式落盘，保证每台设备的内存占用有界
+        self.stream_output = True
+        # 只读命令流水线下发（高时延链路可开启）
+        self.pipeline_commands = False
+        # SSH 每台设备的并发 exec 通道数（0 表示关闭）
+        self.exec_channels = 0
+        # 会话复用：设备会话在运行结束后归还会话池
+        self.reuse_session = False
+        # SSH 传输画像（auto 按设备实测链路与本机并发度选择）
+        self.transport_profile = 'auto'
+        # 跳板机：清单未指定 jump_host 的 SSH 设备使用 default_jump_host（留空表示直连）；
+        # 跳板机凭据留空时使用设备自身凭据，每台跳板机的并发通道数不超过 jump_max_channels
+        self.default_jump_host = ''
+        self.jump_username = ''
+        self.jump_password = ''
+        self.jump_max_channels = 10
+        # 续采：跳过上次运行中已完成的命令并追加到原输出文件，会话中途断开时自动重连续采
+        self.resume = False
+        # 设备友好调度：设备/站点带宽预算与全局大输出命令并发上限（None 表示不限制）
+        self.scheduler: Optional[BandwidthScheduler] = None
+        # 命令执行历史：最长作业优先的启动顺序与按实测耗时推算的命令超时
+        self.use_command_history = True
+        # 输出格式：text 为纯文本；gzip/zstd 为带命令索引的压缩采集容器
+        self.output_format = 'text'
+        # 设备字符集：auto / utf-8 / gbk
+        self.device_charset = 'auto'
+        # 输出上限（KB）：单条命令软上限（只告警）、硬上限（0 不限制）、非流式读取的内存预算
+        self.soft_output_kb = 48 * 1024
+        self.max_output_kb = 0
+        self.output_memory_kb = 16 * 1024
+        # asyncio 会话后端：单事件循环驱动全部会话
+        self.async_sessions = False
+
+        self._pending = deque(self.devices)
+        self._running: Dict[str, HighPerformanceConnectionWorker] = {}
+        self._results: Dict[str, Dict[str, Any]] = {}
+        self._async_thread: Optional[AsyncCollectionThread] = None
+        self.is_running = False
+
+        self.stats = {
+            'total_devices': len(self.devices),
+            'succeeded_devices': 0,
+            'failed_devices': 0,
+            'total_commands': 0,
+            'completed_commands': 0,
+            'failed_commands': 0,
+            'total_bytes': 0,
+            'oversize_commands': [],  # 输出超过软上限的命令（含设备 IP）
+            'start_time': None,
+            'end_time': None,
+        }
+
+    @staticmethod
+    def _device_key(device: Dict[str, Any]) -> str:
+        return f"{device['ip']}:{device['port']}"
+
+    def start(self):
+        """启动调度，填满工作池"""
+        if self.is_running:
+            return
+        self.is_running = True
+        self.stats['start_time'] = time.time()
+        os.makedirs(self.output_dir, exist_ok=True)
+        logger.info(f"并行采集开始: 设备 {len(self.devices)} 台, 并发上限 {self.max_concurrency}")
+        if self.use_command_history:
+            self._pending = deque(self._longest_first(list(self._pending)))
+        if not self._pending:
+            self._finish()
+            return
+        if self.async_sessions:
+            unsupported = self._async_unsupported()
+            if not unsupported:
+                self._start_async()
+                return
+            logger.warning(f"asyncio 会话后端不支持 {'、'.join(unsupported)}，改用线程工作池")
+        self._fill_pool()
+
+    def _async_unsupported(self) -> List[str]:
+        """已启用、但 asyncio 后端不支持且会改变采集行为的功能"""
+        features = []
+        if self.default_jump_host or any(d.get('jump_host') for d in self.devices):
+            features.append('跳板机')
+        if self.resume:
+            features.append('续采')
+        if self.scheduler is not None and self.scheduler.enabled:
+            features.append('带宽调度')
+        return features
+
+    def _start_async(self):
+        runner = AsyncCollectionRunner(list(self._pending), self.commands, self.mode, self.output_dir,
+                                       max_concurrency=self.max_concurrency)
+        self._pending.clear()
+        runner.stream_output = self.stream_output
+        runner.transport_profile = self.transport_profile
+        runner.output_format = self.output_format
+        runner.device_charset = self.device_charset
+        runner.soft_output_kb = self.soft_output_kb
+        runner.max_output_kb = self.max_output_kb
+        runner.output_memory_kb = self.output_memory_kb
+        for device in runner.devices:
+            key = self._device_key(device)
+            self._results[key] = {'ip': device['ip'], 'port': device['port'], 'filepath': '',
+                                  'success': False, 'error': '', 'stats': {}}
+        ignored = [name for name, enabled in (('流水线下发', self.pipeline_commands), ('exec 通道', self.exec_channels > 0),
+                                              ('会话复用', self.reuse_session)) if enabled]
+        if ignored:
+            logger.info(f"asyncio 会话后端忽略 {'、'.join(ignored)}")
+        logger.info(f"使用 asyncio 会话后端: 设备 {len(runner.devices)} 台, 并发会话上限 {self.max_concurrency}")
+        self._async_thread = AsyncCollectionThread(runner, self)
+        self._async_thread.device_result_signal.connect(self._on_async_result)
+        self._async_thread.summary_signal.connect(self._on_async_finished)
+        self._async_thread.start()
+
+    def _on_async_result(self, result: dict):
+        key = f"{result['ip']}:{result['port']}"
+        self._results[key] = result
+        self._record_result(key, result)
+
+    def _on_async_finished(self, summary: dict):
+        thread, self._async_thread = self._async_thread, None
+        if thread is not None:
+            thread.wait()
+            thread.deleteLater()
+        self._finish()
+
+    def _fill_pool(self):
+        while self.is_running and self._pending and len(self._running) < self.max_concurrency:
+            self._launch(self._pending.popleft())
+
+    def _launch(self, device: Dict[str, Any]):
+        key = self._device_key(device)
+        worker = HighPerformanceConnectionWorker(
+            device['protocol'], device['ip'], device['port'],
+            device['username'], device['password'],
+            self.commands, self.mode, self.output_dir,
+            stream_output=self.stream_output,
+            pipeline_commands=self.pipeline_commands,
+            exec_channels=self.exec_channels,
+            reuse_session=self.reuse_session,
+            transport_profile=self.transport_profile,
+            jump_host=self._jump_host_for(device),
+            resume=self.resume,
+            scheduler=self.scheduler,
+            site=device.get('site', ''),
+            use_command_history=self.use_command_history,
+            output_format=self.output_format,
+            device_charset=self.device_charset
+        )
+        worker.concurrent_sessions = self.max_concurrency
+        worker.soft_output_kb = self.soft_output_kb
+        worker.max_output_kb = self.max_output_kb
+        worker.output_memory_kb = self.output_memory_kb
+        self._results[key] = {'ip': device['ip'], 'port': device['port'], 'filepath': '',
+                              'success': False, 'error': '', 'stats': {}}
+        worker.finished_signal.connect(
+            lambda filepath, success, mode, stats, k=key: self._on_device_result(k, filepath, success, stats))
+        worker.error_signal.connect(
+            lambda kind, message, k=key: self._on_device_error(k, kind, message))
+        # QThread.finished 在 run() 返回后发出，校验失败等未触发 finished_signal 的场景同样可以回收
+        worker.finished.connect(lambda k=key: self._on_worker_done(k))
+        self._running[key] = worker
+        worker.start()
+
+    def _longest_first(self, devices: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        按命令执行历史预计的整批耗时从长到短排序；无历史的设备按已知设备的平均预计耗时参与排序，
+        预计耗时相同（如全部无历史）时保持清单顺序
+        """
+        history = CommandHistory.instance()
+        estimates = [history.estimate_device(CommandHistory.make_key(d['protocol'], d['ip'], d['port']), self.commands)
+                     for d in devices]
+        known = [e for e in estimates if e is not None]
+        if not known:
+            return devices
+        default = sum(known) / len(known)
+        order = sorted(range(len(devices)),
+                       key=lambda i: -(estimates[i] if estimates[i] is not None else default))
+        longest = order[0]
+        logger.info(f"最长作业优先: {len(known)}/{len(devices)} 台设备有历史耗时，"
+                    f"预计最长 {devices[longest]['ip']} {estimates[longest] or default:.1f}s")
+        return [devices[i] for i in order]
+
+    def _jump_host_for(self, device: Dict[str, Any]) -> Optional[JumpHost]:
+        """设备使用的共享跳板机（同一跳板机的设备共用一个已认证传输）"""
+        if device['protocol'] != 'ssh':
+            return None
+        address = device.get('jump_host') or self.default_jump_host
+        if not address:
+            return None
+        host, port = JumpHost.parse_address(address)
+        return JumpHost.shared(host, port, self.jump_username or device['username'],
+                               self.jump_password or device['password'], self.jump_max_channels)
+
+    def _on_device_result(self, key: str, filepath: str, success: bool, stats: dict):
+        result = self._results.get(key)
+        if result is None:
+            return
+        result['filepath'] = filepath
+        result['stats'] = stats or {}
+        # 连接失败时工作线程仍会落盘并返回 True，这里以是否出现错误为准
+        result['success'] = bool(success) and not result['error']
+
+    def _on_device_error(self, key: str, kind: str, message: str):
+        result = self._results.get(key)
+        if result is None:
+            return
+        result['error'] = f"[{kind}] {message}"
+        result['success'] = False
+        logger.warning(f"设备 {key} 采集出错: {message}")
+
+    def _on_worker_done(self, key: str):
+        worker = self._running.pop(key, None)
+        if worker is not None:
+            worker.deleteLater()
+        self._record_result(key, self._results.get(key, {}))
+
+        if self.is_running and self._pending:
+            self._fill_pool()
+        elif not self._running:
+            self._finish()
+
+    def _record_result(self, key: str, result: Dict[str, Any]):
+        """累计一台设备的统计并通知界面"""
+        device_stats = result.get('stats') or {}
+        self.stats['total_commands'] += device_stats.get('total_commands', 0)
+        self.stats['completed_commands'] += device_stats.get('completed_commands', 0)
+        self.stats['failed_commands'] += device_stats.get('failed_commands', 0)
+        self.stats['total_bytes'] += device_stats.get('total_bytes', 0)
+        for entry in device_stats.get('oversize_commands') or []:
+            self.stats['oversize_commands'].append(dict(entry, ip=result.get('ip', key)))
+        if result.get('success'):
+            self.stats['succeeded_devices'] += 1
+        else:
+            self.stats['failed_devices'] += 1
+
+        done = self.stats['succeeded_devices'] + self.stats['failed_devices']
+        total = max(1, self.stats['total_devices'])
+        status = "成功" if result.get('success') else f"失败 {result.get('error', '')}".rstrip()
+        self.progress_signal.emit(int(100 * done / total), f"[{done}/{total}] {key} {status}")
+        self.device_finished_signal.emit(result.get('ip', key), result.get('filepath', ''),
+                                         bool(result.get('success')), device_stats)
+
+    def _finish(self):
+        self.is_running = False
+        self.stats['end_time'] = time.time()
+        duration = self.stats['end_time'] - (self.stats['start_time'] or self.stats['end_time'])
+        summary = dict(self.stats)
+        summary['duration'] = round(duration, 2)
+        summary['speed_kb_s'] = round(self.stats['total_bytes'] / duration / 1024, 2) if duration > 0 else 0
+        summary['devices'] = list(self._results.values())
+        logger.info(f"并行采集结束: 成功 {summary['succeeded_devices']} 台, 失败 {summary['failed_devices']} 台, 耗时 {summary['duration']}s")
+        if self.use_command_history:
+            CommandHistory.instance().save(force=True)
+        if self.scheduler is not None and self.scheduler.enabled:
+            logger.info(f"带宽调度: {self.scheduler.describe()}")
+        self.all_finished_signal.emit(summary)
+
+    def get_results(self) -> List[Dict[str, Any]]:
+        """获取各设备结果（ip、文件路径、是否成功、错误信息、统计）"""
+        return list(self._results.values())
+
+    def stop(self):
+        """停止调度：清空排队设备，并通知正在运行的工作线程停止"""
+        self._pending.clear()
+        for worker in list(self._running.values()):
+            worker.stop()
+        if self._async_thread is not None:
+            self._async_thread.stop()
@@ -0,0 +1,223 @@
+import time
+import logging
+import threading
+from typing import Dict, Tuple, Optional, Set
+
+import paramiko
+
+from .ssh_tuning import SSHTransportProfile, get_transport_profile
+from .session_pool import SessionPool
+
+logger = logging.getLogger(__name__)
+
+JumpKey = Tuple[str, int, str]
+
+
+class JumpHostError(Exception):
+    """跳板机相关错误，code 为机器可读错误码（与 SSHConnection.last_error_code 同一体系）"""
+
+    def __init__(self, code: str, message: str):
+        super().__init__(message)
+        self.code = code
+
+
+class JumpHost:
+    """
+    跳板机（堡垒机）共享传输：
+    - 对跳板机只握手、认证一次，所有目标设备通过同一 Transport 上的 direct-tcpip 通道建立各自的 SSH 会话
+    - 每台跳板机的并发通道数受 max_channels 限制，批量采集时超出的设备排队等待空闲通道，
+      不会对跳板机发起大量新登录或打满其转发能力
+    - 共享传输断开时，下一次打开通道自动重新登录
+    同一跳板机（主机/端口/用户名）在进程内共享一个实例，通过 JumpHost.shared 获取。
+    """
+
+    _shared: Dict[JumpKey, 'JumpHost'] = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, host: str, port: int, username: str, password: str, max_channels: int = 10,
+                 transport_profile: Optional[SSHTransportProfile] = None):
+        self.host = host
+        self.port = int(port)
+        self.username = username
+        self.password = password
+        self.max_channels = max(1, int(max_channels))
+        # 外层传输承载全部设备流量：缺省关闭压缩（内层会话自行决定）、加大窗口
+        self.transport_profile = transport_profile or get_transport_profile('wan_fast')
+
+        self.connect_timeout = 10
+        self.banner_timeout = 10
+        self.auth_timeout = 10
+        self.keepalive_interval = 30
+        # 通道数达到上限时的最长排队时间
+        self.slot_timeout = 600
+
+        self._client: Optional[paramiko.SSHClient] = None
+        self._connect_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_channels)
+        self._channels: Set[paramiko.Channel] = set()
+        self._channels_lock = threading.Lock()
+
+        self.stats = {
+            'logins': 0,
+            'channels_opened': 0,
+            'channels_failed': 0,
+            'peak_channels': 0,
+            'queued_seconds': 0.0,
+        }
+
+    @classmethod
+    def shared(cls, host: str, port: int, username: str, password: str, max_channels: int = 10) -> 'JumpHost':
+        """获取进程内共享的跳板机实例（按 主机/端口/用户名）"""
+        key = (host, int(port), username)
+        with cls._shared_lock:
+            jump = cls._shared.get(key)
+            if jump is None:
+                jump = cls(host, port, username, password, max_channels)
+                cls._shared[key] = jump
+            return jump
+
+    @classmethod
+    def close_all(cls):
+        """关闭全部共享跳板机传输（程序退出时调用）"""
+        with cls._shared_lock:
+            jumps = list(cls._shared.values())
+            cls._shared.clear()
+        for jump in jumps:
+            jump.close()
+
+    @staticmethod
+    def parse_address(address: str, default_port: int = 22) -> Tuple[str, int]:
+        """解析 主机[:端口]"""
+        host, _, port = (address or '').strip().partition(':')
+        return host.strip(), int(port) if port.strip() else default_port
+
+    @property
+    def label(self) -> str:
+        return f"{self.host}:{self.port}"
+
+    @property
+    def active_channels(self) -> int:
+        with self._channels_lock:
+            return len(self._channels)
+
+    def is_connected(self) -> bool:
+        transport = self._client.get_transport() if self._client else None
+        return bool(transport and transport.is_active())
+
+    def open_channel(self, target_ip: str, target_port: int, timeout: float = 10) -> paramiko.Channel:
+        """
+        在共享传输上打开到目标设备的 direct-tcpip 通道，作为目标 SSH 会话的 sock 使用。
+        通道数达到上限时排队等待；用完须调用 release_channel 归还名额。
+        """
+        start = time.time()
+        acquired = self._slots.acquire(blocking=False)
+        if not acquired:
+            # 会话池中经本跳板机的空闲会话也占用通道名额，先释放它们再排队
+            evicted = SessionPool.instance().evict(lambda conn: getattr(conn, 'jump_host', None) is self)
+            if evicted:
+                logger.info(f"跳板机 {self.label} 通道已满，关闭会话池中 {evicted} 个空闲会话")
+            acquired = self._slots.acquire(timeout=self.slot_timeout)
+        if not acquired:
+            raise JumpHostError("JUMP_CHANNEL_LIMIT",
+                                f"跳板机 {self.label} 通道数已达上限 {self.max_channels}，排队 {self.slot_timeout}s 仍无空闲通道")
+        waited = time.time() - start
+        if waited > 1:
+            logger.info(f"跳板机 {self.label} 通道排队 {waited:.1f}s 后获得名额: {target_ip}:{target_port}")
+        try:
+            transport = self._ensure_transport()
+            channel = transport.open_channel('direct-tcpip', (target_ip, int(target_port)), ('127.0.0.1', 0),
+                                             timeout=timeout)
+        except Exception as e:
+            self._slots.release()
+            with self._channels_lock:
+                self.stats['channels_failed'] += 1
+            raise self._channel_error(e, target_ip, target_port)
+
+        with self._channels_lock:
+            self._channels.add(channel)
+            self.stats['channels_opened'] += 1
+            self.stats['peak_channels'] = max(self.stats['peak_channels'], len(self._channels))
+            self.stats['queued_seconds'] += waited
+        return channel
+
+    def _channel_error(self, e: Exception, target_ip: str, target_port: int) -> JumpHostError:
+        if isinstance(e, JumpHostError):
+            return e
+        if isinstance(e, paramiko.ChannelException):
+            # 1: 管理策略禁止转发；其余（通常为 2）: 跳板机连不上目标
+            if e.code == 1:
+                return JumpHostError("JUMP_CHANNEL_REJECTED",
+                                     f"跳板机 {self.label} 拒绝转发到 {target_ip}:{target_port}（策略禁止）：{e.text}")
+            return JumpHostError("HOST_UNREACHABLE",
+                                 f"跳板机 {self.label} 无法连接目标 {target_ip}:{target_port}：{e.text}")
+        return JumpHostError("JUMP_HOST_FAILED",
+                             f"经跳板机 {self.label} 打开到 {target_ip}:{target_port} 的通道失败 "
+                             f"原始错误[{e.__class__.__name__}]：{e}")
+
+    def release_channel(self, channel: Optional[paramiko.Channel]):
+        """关闭通道并归还名额（重复调用无副作用）"""
+        if channel is None:
+            return
+        with self._channels_lock:
+            if channel not in self._channels:
+                return
+            self._channels.discard(channel)
+        try:
+            channel.close()
+        except Exception:
+            pass
+        self._slots.release()
+
+    def _ensure_transport(self) -> paramiko.Transport:
+        """返回活跃的共享传输；未连接或已断开时重新登录（并发调用只登录一次）"""
+        with self._connect_lock:
+            if self.is_connected():
+                return self._client.get_transport()
+            if self._client is not None:
+                logger.warning(f"跳板机 {self.label} 共享传输已断开，重新登录")
+                self._close_client()
+            client = paramiko.SSHClient()
+            client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+            profile = self.transport_profile
+            try:
+                client.connect(
+                    hostname=self.host,
+                    port=self.port,
+                    username=self.username,
+                    password=self.password,
+                    timeout=self.connect_timeout,
+                    banner_timeout=self.banner_timeout,
+                    auth_timeout=self.auth_timeout,
+                    compress=profile.compress,
+                    look_for_keys=False,
+                    allow_agent=False,
+                    transport_factory=profile.transport_factory()
+                )
+            except paramiko.AuthenticationException as e:
+                client.close()
+                raise JumpHostError("JUMP_HOST_AUTH_FAILED", f"跳板机 {self.label} 认证失败：{e}")
+            except Exception as e:
+                client.close()
+                raise JumpHostError("JUMP_HOST_UNREACHABLE",
+                                    f"无法连接跳板机 {self.label} 原始错误[{e.__class__.__name__}]：{e}")
+            transport = client.get_transport()
+            transport.set_keepalive(self.keepalive_interval)
+            self._client = client
+            self.stats['logins'] += 1
+            logger.info(f"跳板机 {self.label} 登录成功，通道上限 {self.max_channels}")
+            return transport
+
+    def _close_client(self):
+        # 旧传输上的通道随传输一起失效，名额由各会话关闭时经 release_channel 归还
+        try:
+            self._client.close()
+        except Exception:
+            pass
+        self._client = None
+
+    def close(self):
+        """关闭共享传输（其上的全部目标会话随之断开）"""
+        with self._connect_lock:
+            if self._client is not None:
+                self._close_client()
+                logger.info(f"跳板机 {self.label} 已断开: {self.stats}")
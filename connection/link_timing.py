@@ -0,0 +1,91 @@
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LinkTiming:
+    """
+    会话级链路时序估计，用于替代固定的静默探测窗口与残余等待：
+    - RTT：发送后到首字节到达的时延，按 TCP 的 SRTT/RTTVAR 方式平滑（RFC 6298）
+    - 回显节奏：输出过程中相邻数据块的间隔，取缓慢衰减的峰值，覆盖设备“边算边吐”的停顿
+    - 吞吐：大输出读取的有效吞吐（kbit/s，取会话内峰值），用于选择 SSH 传输画像
+    静默窗口 = max(SRTT + 4*RTTVAR, 1.5*节奏峰值)，限定在 [min_window, max_window]；
+    尚无样本时使用 default_window（与原固定值一致）。min_window 缺省等于 default_window：
+    探测回车会混入回显，低时延链路也不提前探测，收益来自自适应的收尾/残余等待；高时延或回显停顿长的链路窗口随之放宽。
+    """
+
+    ALPHA = 0.125
+    BETA = 0.25
+    GAP_DECAY = 0.95
+    # 计入吞吐样本的最小数据量：过短的输出主要反映 RTT 而非带宽
+    THROUGHPUT_MIN_BYTES = 512 * 1024
+
+    def __init__(self, default_window: float = 0.6, min_window: Optional[float] = None, max_window: float = 3.0):
+        self.default_window = default_window
+        self.min_window = default_window if min_window is None else min_window
+        self.max_window = max_window
+
+        self.srtt: Optional[float] = None
+        self.rttvar: Optional[float] = None
+        self.gap_peak = 0.0
+        self.samples = 0
+        self.throughput_kbps: Optional[float] = None
+
+    def add_rtt(self, sample: float):
+        """记录一次 RTT 样本（秒）"""
+        if sample <= 0:
+            return
+        if self.srtt is None:
+            self.srtt = sample
+            self.rttvar = sample / 2
+        else:
+            self.rttvar = (1 - self.BETA) * self.rttvar + self.BETA * abs(self.srtt - sample)
+            self.srtt = (1 - self.ALPHA) * self.srtt + self.ALPHA * sample
+        self.samples += 1
+
+    def add_gap(self, gap: float):
+        """记录一次输出过程中的数据块间隔（秒）；超过最大窗口的间隔视为异常不计入"""
+        if 0 < gap < self.max_window:
+            self.gap_peak = max(gap, self.gap_peak * self.GAP_DECAY)
+
+    def add_throughput(self, nbytes: int, seconds: float):
+        """记录一次大输出读取的有效吞吐（首字节到末字节），取会话内峰值"""
+        if nbytes < self.THROUGHPUT_MIN_BYTES or seconds <= 0:
+            return
+        kbps = nbytes * 8 / 1000 / seconds
+        self.throughput_kbps = max(kbps, self.throughput_kbps or 0.0)
+
+    @property
+    def idle_window(self) -> float:
+        """静默多久后认为设备可能在等待输入（才发探测回车）"""
+        if self.srtt is None:
+            return self.default_window
+        window = max(self.srtt + 4 * self.rttvar, 1.5 * self.gap_peak)
+        return min(self.max_window, max(self.min_window, window))
+
+    def quiet_window(self, default: float) -> float:
+        """一轮回显的收尾判定：收到数据后静默多久视为本轮结束（低时延链路可小于缺省值）"""
+        if self.srtt is None:
+            return default
+        return min(default, max(0.02, 2 * self.gap_peak, self.srtt / 2))
+
+    def probe_interval(self, probes_sent: int) -> float:
+        """连续探测无回应时按 2 的幂退避，避免在慢链路上反复注入回车"""
+        return min(self.max_window * 2, self.idle_window * (2 ** max(0, probes_sent)))
+
+    @property
+    def residue_wait(self) -> float:
+        """匹配到提示符后收取提示符行残余的等待时长（不超过原固定值 50ms）"""
+        if self.srtt is None:
+            return 0.05
+        return min(0.05, max(0.005, self.gap_peak, self.srtt / 4))
+
+    def describe(self) -> str:
+        if self.srtt is None:
+            return "RTT 未测量"
+        text = (f"SRTT {self.srtt * 1000:.1f}ms, RTTVAR {self.rttvar * 1000:.1f}ms, "
+                f"节奏峰值 {self.gap_peak * 1000:.1f}ms, 静默窗口 {self.idle_window * 1000:.0f}ms")
+        if self.throughput_kbps:
+            text += f", 吞吐 {self.throughput_kbps / 1000:.1f}Mbps"
+        return text
@@ -0,0 +1,160 @@
+import logging
+from typing import Optional
+
+from .charset import SessionCharset
+
+logger = logging.getLogger(__name__)
+
+
+class CommandOutputStream:
+    """
+    单条命令输出的流式落盘（sink）：
+    socket 字节 → 换行归一化/去命令回显（按字节处理） → 按会话字符集转为输出字节 → 分块写入 BufferManager。
+    产出格式与 ConnectionUtils.format_command_output 一致（命令行 + 回显 + 空行），
+    但全程只持有当前数据块与一小段待写字节，单条命令输出再大内存也保持有界。
+    换行/NUL 均为单字节 ASCII，不会出现在 UTF-8/GBK 多字节字符内部，因此无需先解码；
+    UTF-8 会话的输出字节原样写出，只有 GBK 会话在写出前转码一次。
+    """
+
+    def __init__(self, buffer_manager, command: str, drop_blank_lines: bool = False,
+                 charset: Optional[SessionCharset] = None, flush_size: int = 64 * 1024):
+        self.buffer_manager = buffer_manager
+        self.command = (command or "").strip()
+        # Telnet 输出移除空行，与 TelnetConnection 的非流式归一化一致
+        self.drop_blank_lines = drop_blank_lines
+        self.flush_size = flush_size
+        # 会话字符集（由连接对象持有，同一会话只判定一次）
+        self.charset = charset if charset is not None else SessionCharset()
+
+        self._command_bytes = None  # 命令回显的字节形式（首次比对时按会话字符集编码）
+        self._partial = b''         # 尚未遇到换行的行尾片段
+        self._pending_cr = False    # 上一块以 \r 结尾，需与下一块的 \n 合并判断
+        self._started = False       # 是否已越过前导空行与命令回显
+        self._first_line = True     # 回显首行前不加换行分隔
+        self._staged = []           # 待写入 BufferManager 的设备输出字节（均为完整行）
+        self._staged_size = 0
+        self._accepted = True       # BufferManager 是否仍接受数据（总量上限）
+        self._closed = False
+
+        self.bytes_in = 0
+
+        self._write_text(f"{self.command}\n")
+
+    def write(self, data: bytes):
+        """送入新到达的原始字节"""
+        if not data or self._closed:
+            return
+        self.bytes_in += len(data)
+        self._feed(data)
+
+    def close(self, trailer: str = "") -> bool:
+        """
+        结束本条命令：追加 trailer（如截断提示/错误信息），写出剩余内容与块分隔空行。
+        返回 BufferManager 是否完整接受了本条输出。
+        """
+        if self._closed:
+            return self._accepted
+        if self._pending_cr:
+            self._pending_cr = False
+            self._feed(b'\n')
+        if self._partial:
+            line, self._partial = self._partial, b''
+            self._emit_line(line)
+        self._flush()
+        if trailer:
+            # trailer 为本程序生成的文本，另起一行直接以 UTF-8 写出（不参与字符集判定）
+            lines = trailer.replace('\r\n', '\n').replace('\r', '\n').strip('\n').split('\n')
+            for line in lines:
+                if self.drop_blank_lines and line.strip() == '':
+                    continue
+                self._write_text(line if self._first_line else '\n' + line)
+                self._first_line = False
+        self._write_text("\n\n")
+        self._closed = True
+        return self._accepted
+
+    def _feed(self, data: bytes):
+        data = data.replace(b'\x00', b'')
+        if self._pending_cr:
+            data = b'\r' + data
+            self._pending_cr = False
+        if data.endswith(b'\r'):
+            # \r\n 可能被拆在两个数据块之间
+            self._pending_cr = True
+            data = data[:-1]
+        if self.drop_blank_lines:
+            # Telnet：\r\n 与单独的 \r 均视为换行
+            data = data.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+        else:
+            # SSH：\r+\n 归一为 \n，其余 \r 去除
+            data = data.replace(b'\r', b'')
+        if not data:
+            return
+
+        lines = data.split(b'\n')
+        lines[0] = self._partial + lines[0]
+        self._partial = lines.pop()
+        for line in lines:
+            self._emit_line(line)
+        if self._staged_size >= self.flush_size:
+            self._flush()
+
+    def _emit_line(self, line: bytes):
+        if not self._started:
+            # 丢弃前导空行与命令回显行（如 "<R1>display device"）
+            stripped = line.strip()
+            if not stripped:
+                return
+            self._started = True
+            command = self._echo_bytes()
+            if stripped == command or stripped.endswith(command):
+                return
+        if self.drop_blank_lines and not line.strip():
+            return
+        if self._first_line:
+            self._first_line = False
+            self._stage(line)
+        else:
+            self._stage(b'\n' + line)
+
+    def _echo_bytes(self) -> bytes:
+        if self._command_bytes is None:
+            self._command_bytes = self.command.encode(self.charset.name, errors='replace')
+        return self._command_bytes
+
+    def _stage(self, data: bytes):
+        self._staged.append(data)
+        self._staged_size += len(data)
+
+    def _flush(self):
+        if not self._staged:
+            return
+        chunk = b''.join(self._staged)
+        self._staged.clear()
+        self._staged_size = 0
+        self._add(self.charset.to_output(chunk))
+
+    def _write_text(self, text: str):
+        """写出本程序生成的文本（命令行、结尾提示、块分隔），此前暂存的设备输出先写出以保持顺序"""
+        self._flush()
+        self._add(text.encode('utf-8'))
+
+    def _add(self, data: bytes):
+        if self._accepted and data and not self.buffer_manager.add_bytes(data):
+            self._accepted = False
+            logger.warning(f"命令 {self.command} 流式输出超过总量上限，后续内容丢弃")
+
+
+def stitch_spilled_output(buffer_manager, command: str, spill, trailer: str = "",
+                          drop_blank_lines: bool = False, charset: Optional[SessionCharset] = None) -> bool:
+    """
+    将非流式读取中溢出到临时分段的命令输出（SpillBuffer）逐块拼接进输出文件，格式与 format_command_output 一致；
+    完成后删除临时分段。返回 BufferManager 是否完整接受了本条输出。
+    """
+    stream = CommandOutputStream(buffer_manager, command, drop_blank_lines=drop_blank_lines, charset=charset)
+    try:
+        for chunk in spill.chunks():
+            stream.write(chunk)
+    finally:
+        spill.close()
+    return stream.close(trailer)
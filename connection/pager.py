@@ -0,0 +1,58 @@
+import re
+import logging
+from typing import Tuple
+
+logger = logging.getLogger(__name__)
+
+# 行尾的分页提示：华为 "  ---- More ----"、Cisco " --More-- "、Juniper "---(more 45%)---"、
+# Linux more "--More--(45%)"、部分设备 "<--- More --->" 与 "Press any key to continue"
+PAGER_PROMPT = re.compile(
+    rb'(?i)(?:-{2,} ?\(?more(?: \d+%)?\)? ?-{2,}(?:\(\d+%\))?|<-+ ?more ?-+>|press any key to continue[^\r\n]*)[ \t]*$'
+)
+
+# 应答空格后设备用于擦除分页提示的控制序列：ESC[nD / 退格 / 回车，中间夹空格
+PAGER_ERASE = re.compile(rb'^(?:\x1b\[\d+D|\x08+|\r)[ ]*(?:\x1b\[\d+D|\x08+|\r)?')
+
+# 未完成的末行不超过该长度时暂存，以便跨数据块识别分页提示
+HOLD_LIMIT = 96
+
+
+class PagerFilter:
+    """
+    流式分页处理：
+    - 数据末行出现分页提示时返回需应答，由读取方立即发送空格，无需等待静默探测逐页翻页
+    - 从输出中去掉分页提示文本与翻页后的擦除控制序列，落盘内容与关闭分页时一致
+    未完成的末行（不含换行且较短）暂存到下一块再输出，命令结束时调用 flush 取回。
+    """
+
+    def __init__(self):
+        self._held = b''
+        self._answered = False
+        self.pages = 0
+
+    def feed(self, data: bytes) -> Tuple[bytes, bool]:
+        """送入原始字节，返回 (可输出的字节, 是否需要应答空格)"""
+        if not data:
+            return b'', False
+        if self._answered:
+            self._answered = False
+            data = PAGER_ERASE.sub(b'', data, count=1)
+        window = self._held + data if self._held else data
+        self._held = b''
+
+        line_start = window.rfind(b'\n') + 1
+        tail = window[line_start:]
+        if tail and len(tail) <= HOLD_LIMIT:
+            match = PAGER_PROMPT.search(tail)
+            if match:
+                self.pages += 1
+                self._answered = True
+                return window[:line_start] + tail[:match.start()].rstrip(b' '), True
+            self._held = tail
+            return window[:line_start], False
+        return window, False
+
+    def flush(self) -> bytes:
+        """取回暂存的末行（命令结束时调用）"""
+        held, self._held = self._held, b''
+        return held
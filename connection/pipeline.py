@@ -0,0 +1,103 @@
+import re
+import uuid
+import logging
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 可流水线下发的只读命令前缀（display/show 及常见缩写）
+READ_ONLY_PREFIXES = ('display ', 'dis ', 'show ', 'sh ')
+
+
+def is_read_only_command(command: str) -> bool:
+    """只读查询命令才允许流水线下发（误切分时可安全地串行重跑）"""
+    cmd = (command or "").strip().lower()
+    return cmd in ('display', 'show') or cmd.startswith(READ_ONLY_PREFIXES)
+
+
+class PipelineReadState:
+    """
+    流水线读取计数：统计回显流中提示符字面量出现的次数（跨数据块），
+    出现次数达到命令数且数据以提示符结尾时，整批命令执行完毕。
+    """
+
+    def __init__(self, prompt: bytes, expected: int):
+        self.prompt = prompt
+        self.expected = expected
+        self.seen = 0
+        self._carry = b''
+
+    def feed(self, data: bytes) -> int:
+        keep = len(self.prompt) - 1
+        window = self._carry + data
+        self.seen += window.count(self.prompt)
+        self._carry = window[-keep:] if keep > 0 else b''
+        return self.seen
+
+    @property
+    def complete(self) -> bool:
+        return self.seen >= self.expected
+
+
+
+def resync_marker() -> str:
+    """生成唯一的通道对齐标记行（设备按未知命令回显报错，不改变任何状态）"""
+    return f"icc-sync-{uuid.uuid4().hex[:12]}"
+
+
+class PipelineResync:
+    """
+    流水线中途放弃（停顿、超出内存预算）后的通道对齐判定。
+    放弃时设备上可能仍排队着本批剩余命令，调用方下发唯一标记行后把后续回显逐块送入 feed()：
+    设备按序处理输入，标记已回显、整批提示符（含标记行产生的 1 个）计数达到且数据以提示符结尾时，
+    旧批次的输出已全部读走。设备丢弃了预输入时计数达不到，此时以 settled（标记之后以提示符结尾）
+    加上调用方的静默判定作为对齐依据。
+    """
+
+    def __init__(self, state: PipelineReadState, marker: bytes, matcher):
+        self.state = state
+        self.state.expected += 1
+        self.marker = marker
+        self.matcher = matcher
+        self.marker_seen = False
+        self.settled = False
+        self._carry = b''
+
+    def feed(self, data: bytes) -> bool:
+        """送入对齐期间读到的数据（调用方直接丢弃），返回通道是否已对齐"""
+        self.state.feed(data)
+        if not self.marker_seen:
+            window = self._carry + data
+            self.marker_seen = self.marker in window
+            self._carry = window[-(len(self.marker) - 1):]
+        at_prompt = self.matcher.feed(data)
+        self.settled = self.marker_seen and at_prompt
+        return self.settled and self.state.complete
+
+def split_pipelined_output(commands: List[str], text: str, prompt: str) -> Optional[List[str]]:
+    """
+    按提示符边界把批量回显切分为逐条命令输出。
+    期望的回显形态：cmd1 回显 + 输出 + 提示符 cmd2 回显 + 输出 + 提示符 ... + 提示符。
+    每段保留与串行执行一致的形态（命令回显行 + 输出 + 末尾提示符），交给 format_command_output 处理。
+    出现以下情况视为切分有歧义，返回 None 由调用方回退串行：
+    - 行首提示符数量与命令数不一致（输出中含提示符样式文本、设备丢弃了预输入等）
+    - 某段的首个非空行不是对应命令的回显（预输入回显与输出交错）
+    """
+    if not commands or not prompt:
+        return None
+    boundaries = [m.start() for m in re.finditer(r'(?m)^' + re.escape(prompt), text)]
+    if len(boundaries) != len(commands):
+        logger.debug(f"流水线切分歧义：提示符 {len(boundaries)} 个，命令 {len(commands)} 条")
+        return None
+
+    segments = []
+    seg_start = 0
+    for cmd, pos in zip(commands, boundaries):
+        segment = text[seg_start:pos + len(prompt)]
+        seg_start = pos + len(prompt)
+        head = next((ln.strip() for ln in segment.split('\n') if ln.strip()), '')
+        if not head.endswith(cmd.strip()):
+            logger.debug(f"流水线切分歧义：命令 {cmd} 的回显未对齐（首行: {head[:80]}）")
+            return None
+        segments.append(segment)
+    return segments
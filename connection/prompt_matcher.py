@@ -0,0 +1,52 @@
+import re
+from typing import Optional, Pattern
+
+
+class StreamingPromptMatcher:
+    """
+    流式提示符匹配器（SSH/Telnet 读取共用）。
+
+    提示符正则均以 \\s*$ 结尾锚定在数据末尾，因此只需检查“最近到达的少量字节”：
+    每个数据块到达时仅保留末尾 window 字节作为携带窗口再做一次匹配，
+    不再维护 8KB 尾部 bytearray 并在每块上 bytes(tail) 复制+全量扫描。
+    """
+
+    def __init__(self, pattern: Optional[Pattern[bytes]] = None, window: int = 512):
+        self.pattern = pattern
+        # 窗口需覆盖“换行 + 提示符行 + 尾随空白”，512 字节足够常见设备
+        self.window = window
+        self._carry = b''
+
+    def set_pattern(self, pattern: Optional[Pattern[bytes]]):
+        """更换提示符正则（如探测到具体提示符后），同时清空携带窗口"""
+        self.pattern = pattern
+        self._carry = b''
+
+    def reset(self):
+        """开始读取新命令输出前调用"""
+        self._carry = b''
+
+    def feed(self, data: bytes) -> bool:
+        """送入新到达的数据块，返回数据末尾是否已出现提示符"""
+        if not data:
+            return False
+        window = self.window
+        if len(data) >= window:
+            # 大块数据只取末尾窗口，复制量恒定为 window 字节
+            self._carry = data[-window:]
+        else:
+            carry = self._carry + data
+            self._carry = carry[-window:] if len(carry) > window else carry
+        if self.pattern is None:
+            return False
+        return self.pattern.search(self._carry) is not None
+
+    @property
+    def tail(self) -> bytes:
+        """当前携带窗口（最近到达的 window 字节）"""
+        return self._carry
+
+
+def compile_prompt(prompt_bytes: bytes) -> Pattern[bytes]:
+    """根据探测到的提示符字面量构建末尾锚定的字节正则"""
+    return re.compile(re.escape(prompt_bytes) + rb'\s*$')
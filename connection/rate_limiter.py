@@ -0,0 +1,196 @@
+import time
+import logging
+import ipaddress
+import threading
+from typing import Dict, List, Optional, Callable, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    令牌桶（字节/秒）：读取方收到数据后按字节数扣减令牌，令牌为负时按欠额/速率计算需暂停的时长。
+    暂停期间不读 socket，TCP 接收窗口填满后设备侧发送随之放缓，从而限制设备输出速率与链路占用。
+    """
+
+    def __init__(self, rate_bytes: float, burst_bytes: Optional[float] = None):
+        self.rate = float(rate_bytes)
+        # 缺省允许 1 秒的突发（至少 64KB），小命令基本不受影响
+        self.burst = float(burst_bytes if burst_bytes is not None else max(self.rate, 64 * 1024))
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, nbytes: int) -> float:
+        """扣减 nbytes 个令牌，返回需要暂停的秒数（0 表示未超预算）"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= nbytes
+            return max(0.0, -self.tokens / self.rate)
+
+
+class DeviceThrottle:
+    """
+    单个会话的读取限速：同时扣减设备预算与所属站点/网段预算，按最紧的一个暂停。
+    连接对象在每次收到数据后调用 throttle(n)；cancelled 返回 True 时立即停止等待（如采集被停止）。
+    """
+
+    SLEEP_SLICE = 0.5
+
+    def __init__(self, buckets: List[Tuple[str, TokenBucket]], scheduler: 'BandwidthScheduler'):
+        self.buckets = buckets
+        self.scheduler = scheduler
+        self.cancelled: Callable[[], bool] = lambda: False
+        self.throttled_seconds = 0.0
+
+    @property
+    def rate_bytes(self) -> float:
+        """最紧预算的速率（字节/秒），用于推算大输出命令的超时"""
+        return min(bucket.rate for _, bucket in self.buckets)
+
+    def __call__(self, nbytes: int):
+        self.throttle(nbytes)
+
+    def throttle(self, nbytes: int):
+        if not nbytes or not self.buckets:
+            return
+        wait = 0.0
+        limiting = ''
+        for name, bucket in self.buckets:
+            need = bucket.consume(nbytes)
+            if need > wait:
+                wait, limiting = need, name
+        if wait <= 0:
+            return
+        self.throttled_seconds += wait
+        self.scheduler.record_throttle(limiting, wait)
+        deadline = time.monotonic() + wait
+        while not self.cancelled():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            time.sleep(min(self.SLEEP_SLICE, remaining))
+
+
+class BandwidthScheduler:
+    """
+    批量采集的设备友好调度层（位于 HighPerformanceConnectionWorker 之上，由调度器/界面创建并传给工作线程）：
+    - 每台设备一个字节/秒令牌桶（device_kbps），避免大输出命令打满设备控制平面 CPU
+    - 每个站点或网段一个共享令牌桶（site_budgets：站点名或 CIDR → kbps），同一带外链路上的设备合计不超预算
+    - 全局大输出命令并发上限（large_output_slots），大输出命令须取得名额才下发，小命令不受限
+    预算为 0 表示不限制。设备清单 site 列指定站点名；未指定时按 IP 匹配最长前缀的网段预算。
+    """
+
+    def __init__(self, device_kbps: int = 0, site_budgets: Optional[Dict[str, int]] = None,
+                 large_output_slots: int = 0):
+        self.device_kbps = max(0, int(device_kbps or 0))
+        self.site_budgets: Dict[str, int] = {}
+        self._networks: List[Tuple[ipaddress._BaseNetwork, str]] = []
+        for key, kbps in (site_budgets or {}).items():
+            if kbps <= 0:
+                continue
+            self.site_budgets[key] = kbps
+            try:
+                self._networks.append((ipaddress.ip_network(key, strict=False), key))
+            except ValueError:
+                pass  # 站点名
+        # 最长前缀优先
+        self._networks.sort(key=lambda item: item[0].prefixlen, reverse=True)
+
+        self.large_output_slots = max(0, int(large_output_slots or 0))
+        self._large_slots = threading.BoundedSemaphore(self.large_output_slots) if self.large_output_slots else None
+
+        self._device_buckets: Dict[str, TokenBucket] = {}
+        self._site_buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+        self.stats = {'throttled_seconds': {}, 'large_output_waits': 0, 'large_output_wait_seconds': 0.0}
+
+    @staticmethod
+    def parse_budgets(text: str) -> Dict[str, int]:
+        """解析 'dc1=20000, 10.1.0.0/16=5000' 形式的站点/网段预算（kbps）"""
+        budgets = {}
+        for item in (text or '').replace(';', ',').split(','):
+            key, sep, value = item.partition('=')
+            if not sep or not key.strip():
+                continue
+            try:
+                budgets[key.strip()] = int(float(value.strip()))
+            except ValueError:
+                logger.warning(f"忽略无效的站点带宽预算: {item.strip()}")
+        return budgets
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.device_kbps or self.site_budgets or self._large_slots)
+
+    def site_for(self, ip: str, site: str = '') -> str:
+        """设备所属的预算单元：清单中的站点名优先，否则为包含该 IP 的最长前缀网段；无预算时返回空串"""
+        if site and site in self.site_budgets:
+            return site
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            return ''
+        for network, key in self._networks:
+            if address.version == network.version and address in network:
+                return key
+        return ''
+
+    def throttle_for(self, ip: str, site: str = '') -> Optional[DeviceThrottle]:
+        """设备会话的读取限速器；设备与站点均无预算时返回 None（读取路径零开销）"""
+        buckets = []
+        with self._lock:
+            if self.device_kbps:
+                bucket = self._device_buckets.get(ip)
+                if bucket is None:
+                    bucket = self._device_buckets[ip] = TokenBucket(self.device_kbps * 1000 / 8)
+                buckets.append((f"设备 {ip}", bucket))
+            site_key = self.site_for(ip, site)
+            if site_key:
+                bucket = self._site_buckets.get(site_key)
+                if bucket is None:
+                    bucket = self._site_buckets[site_key] = TokenBucket(self.site_budgets[site_key] * 1000 / 8)
+                buckets.append((f"站点 {site_key}", bucket))
+        return DeviceThrottle(buckets, self) if buckets else None
+
+    def acquire_large_output(self, cancelled: Callable[[], bool] = lambda: False,
+                             on_wait: Optional[Callable[[], None]] = None) -> bool:
+        """
+        取得一个大输出命令名额（未设上限时直接返回 True）；名额已满需排队时先调用 on_wait，
+        等待期间 cancelled 为真时返回 False
+        """
+        if self._large_slots is None:
+            return True
+        if self._large_slots.acquire(blocking=False):
+            return True
+        if on_wait is not None:
+            on_wait()
+        start = time.monotonic()
+        while not cancelled():
+            if self._large_slots.acquire(timeout=0.5):
+                with self._lock:
+                    self.stats['large_output_waits'] += 1
+                    self.stats['large_output_wait_seconds'] += time.monotonic() - start
+                return True
+        return False
+
+    def release_large_output(self):
+        if self._large_slots is not None:
+            self._large_slots.release()
+
+    def record_throttle(self, name: str, seconds: float):
+        with self._lock:
+            throttled = self.stats['throttled_seconds']
+            throttled[name] = throttled.get(name, 0.0) + seconds
+
+    def describe(self) -> str:
+        with self._lock:
+            top = sorted(self.stats['throttled_seconds'].items(), key=lambda item: item[1], reverse=True)[:5]
+            waits = self.stats['large_output_waits']
+            wait_seconds = self.stats['large_output_wait_seconds']
+        parts = [f"{name} 限速 {seconds:.1f}s" for name, seconds in top]
+        if waits:
+            parts.append(f"大输出命令排队 {waits} 次共 {wait_seconds:.1f}s")
+        return "；".join(parts) or "未触发限速"
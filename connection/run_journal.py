@@ -0,0 +1,144 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from typing import Dict, Any, Optional, List
+
+logger = logging.getLogger(__name__)
+
+
+class RunJournal:
+    """
+    采集运行日志（JSON Lines，只追加）：按设备记录本次运行的输出文件与每条命令完成时的检查点
+    - begin：开始采集（输出文件、命令列表摘要、命令数）
+    - checkpoint：前 next_index 条命令已完成，输出文件字节长度为 offset
+    - finish：全部命令执行完毕
+    中途断线或程序退出时，最后一条记录停留在某个 checkpoint。续采模式下按设备找到未完成的运行，
+    将输出文件截断到检查点偏移，从第一条未完成命令继续追加，已完成命令不再重复执行。
+    每条记录写入后立即 fsync，进程崩溃最多丢失正在执行的那条命令。
+    """
+
+    FILENAME = 'run_journal.jsonl'
+
+    _instances: Dict[str, 'RunJournal'] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, path: str):
+        self.path = path
+        self._runs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._needs_newline = False  # 上次崩溃留下了不完整的末行
+
+    @classmethod
+    def for_output_dir(cls, output_dir: str) -> 'RunJournal':
+        """输出目录对应的共享运行日志（同一目录的并行工作线程写同一文件）"""
+        path = os.path.abspath(os.path.join(output_dir, cls.FILENAME))
+        with cls._instances_lock:
+            journal = cls._instances.get(path)
+            if journal is None:
+                journal = cls(path)
+                cls._instances[path] = journal
+            return journal
+
+    @staticmethod
+    def device_key(mode: str, protocol: str, ip: str, port: int) -> str:
+        return f"{mode}|{protocol}://{ip}:{int(port)}"
+
+    @staticmethod
+    def commands_digest(commands: List[str]) -> str:
+        """命令列表摘要：命令文件改动后不续采旧运行"""
+        return hashlib.sha1("\n".join(commands).encode('utf-8')).hexdigest()[:16]
+
+    def begin(self, key: str, filepath: str, digest: str, total: int):
+        self._append({'event': 'begin', 'device': key, 'file': filepath, 'digest': digest, 'total': total,
+                      'next_index': 0, 'offset': 0, 'completed': 0, 'failed': 0})
+
+    def checkpoint(self, key: str, next_index: int, offset: int, completed: int, failed: int):
+        self._append({'event': 'checkpoint', 'device': key, 'next_index': next_index, 'offset': offset,
+                      'completed': completed, 'failed': failed})
+
+    def finish(self, key: str):
+        self._append({'event': 'finish', 'device': key})
+
+    def pending(self, key: str, digest: str) -> Optional[Dict[str, Any]]:
+        """
+        设备最近一次未完成的运行（命令列表一致且输出文件仍在），返回
+        {'file', 'next_index', 'offset', 'completed', 'failed', 'total'}；没有可续采的运行时返回 None
+        """
+        with self._lock:
+            self._ensure_loaded()
+            run = self._runs.get(key)
+            run = dict(run) if run else None
+        if not run or run.get('finished') or run.get('digest') != digest:
+            return None
+        filepath = run.get('file') or ''
+        offset = int(run.get('offset') or 0)
+        size = os.path.getsize(filepath) if filepath and os.path.exists(filepath) else 0
+        if size < offset:
+            # 文件被改动或截断过，检查点不可信
+            logger.warning(f"续采放弃：{filepath} 长度 {size} 小于检查点偏移 {offset}")
+            return None
+        if offset > 0 or os.path.exists(filepath):
+            return run
+        return None
+
+    def _apply(self, record: Dict[str, Any]):
+        key = record.get('device')
+        event = record.get('event')
+        if not key:
+            return
+        if event == 'begin':
+            self._runs[key] = {k: v for k, v in record.items() if k not in ('event', 'device', 'ts')}
+            self._runs[key]['finished'] = False
+            return
+        run = self._runs.get(key)
+        if run is None:
+            return
+        if event == 'checkpoint':
+            for field in ('next_index', 'offset', 'completed', 'failed'):
+                run[field] = record.get(field, run.get(field))
+        elif event == 'finish':
+            run['finished'] = True
+
+    def _append(self, record: Dict[str, Any]):
+        record['ts'] = time.strftime('%Y-%m-%d %H:%M:%S')
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._ensure_loaded()
+            self._apply(record)
+            if self._needs_newline:
+                line = "\n" + line
+                self._needs_newline = False
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(line)
+                    f.flush()
+                    os.fsync(f.fileno())
+            except Exception as e:
+                logger.warning(f"写入运行日志失败: {e}")
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                line = ''
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # 崩溃时可能留下半行，忽略
+                        continue
+                    if isinstance(record, dict):
+                        self._apply(record)
+                self._needs_newline = bool(line) and not line.endswith('\n')
+        except Exception as e:
+            logger.warning(f"读取运行日志失败，本次不续采: {e}")
+            self._runs = {}
@@ -0,0 +1,146 @@
+import time
+import logging
+import threading
+from typing import Dict, Tuple, Optional, Any, Callable
+
+logger = logging.getLogger(__name__)
+
+PoolKey = Tuple[str, str, int, str]
+
+
+class SessionPool:
+    """
+    已登录会话池：按 (协议, IP, 端口, 用户名) 缓存空闲的 SSH/Telnet 会话。
+    - 工作线程结束时归还会话（release），下次采集同一设备直接租用（acquire），
+      跳过 TCP/SSH 握手、认证、提示符探测与终端预处理
+    - 后台保活线程定期对空闲会话发送空行并检查健康状态，失效或空闲超时的会话自动关闭
+    - 会话同一时刻只被一个工作线程持有：租出即从池中移除
+    """
+
+    _instance: Optional['SessionPool'] = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, idle_timeout: float = 900, keepalive_interval: float = 30):
+        self.idle_timeout = idle_timeout
+        self.keepalive_interval = keepalive_interval
+
+        self._idle: Dict[PoolKey, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._keepalive_thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def instance(cls) -> 'SessionPool':
+        """进程级共享会话池"""
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    @staticmethod
+    def make_key(protocol: str, ip: str, port: int, username: str) -> PoolKey:
+        return (protocol, ip, int(port), username)
+
+    def acquire(self, protocol: str, ip: str, port: int, username: str):
+        """租用空闲会话；无可用或已失效时返回 None"""
+        key = self.make_key(protocol, ip, port, username)
+        with self._lock:
+            entry = self._idle.pop(key, None)
+        if entry is None:
+            return None
+        conn = entry['connection']
+        if time.time() - entry['released_at'] > self.idle_timeout or not conn.is_alive():
+            self._close(conn)
+            return None
+        logger.info(f"复用会话: {protocol} {ip}:{port} ({username})")
+        return conn
+
+    def release(self, protocol: str, username: str, conn) -> bool:
+        """归还会话；会话已失效时直接关闭。返回是否入池"""
+        if conn is None or not conn.is_alive():
+            self._close(conn)
+            return False
+        key = self.make_key(protocol, conn.ip, conn.port, username)
+        with self._lock:
+            previous = self._idle.pop(key, None)
+            self._idle[key] = {'connection': conn, 'released_at': time.time()}
+        if previous is not None and previous['connection'] is not conn:
+            self._close(previous['connection'])
+        self._ensure_keepalive()
+        logger.info(f"会话已归还会话池: {protocol} {conn.ip}:{conn.port} ({username})")
+        return True
+
+    def discard(self, protocol: str, ip: str, port: int, username: str):
+        """丢弃并关闭指定设备的空闲会话"""
+        with self._lock:
+            entry = self._idle.pop(self.make_key(protocol, ip, port, username), None)
+        if entry is not None:
+            self._close(entry['connection'])
+
+    def evict(self, predicate: Callable[[Any], bool]) -> int:
+        """关闭满足条件的空闲会话（如占用跳板机通道名额的会话），返回关闭数量"""
+        with self._lock:
+            keys = [key for key, entry in self._idle.items() if predicate(entry['connection'])]
+            entries = [self._idle.pop(key) for key in keys]
+        for entry in entries:
+            self._close(entry['connection'])
+        return len(entries)
+
+    def close_all(self):
+        """关闭全部空闲会话并停止保活线程（程序退出时调用）"""
+        self._stop_event.set()
+        with self._lock:
+            entries = list(self._idle.values())
+            self._idle.clear()
+        for entry in entries:
+            self._close(entry['connection'])
+
+    def size(self) -> int:
+        with self._lock:
+            return len(self._idle)
+
+    def _ensure_keepalive(self):
+        if self._keepalive_thread and self._keepalive_thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._keepalive_thread = threading.Thread(target=self._keepalive_loop, name="session-pool-keepalive",
+                                                  daemon=True)
+        self._keepalive_thread.start()
+
+    def _keepalive_loop(self):
+        while not self._stop_event.wait(self.keepalive_interval):
+            with self._lock:
+                keys = list(self._idle.keys())
+            if not keys:
+                continue
+            for key in keys:
+                # 保活期间暂时取出会话，避免与 acquire 并发使用同一会话
+                with self._lock:
+                    entry = self._idle.pop(key, None)
+                if entry is None:
+                    continue
+                conn = entry['connection']
+                if time.time() - entry['released_at'] > self.idle_timeout:
+                    logger.info(f"会话空闲超时关闭: {key[0]} {key[1]}:{key[2]}")
+                    self._close(conn)
+                    continue
+                if not conn.keepalive():
+                    logger.info(f"会话保活失败，已移除: {key[0]} {key[1]}:{key[2]}")
+                    self._close(conn)
+                    continue
+                with self._lock:
+                    # 保活期间已有新会话归还时保留较新的那个
+                    superseded = key in self._idle
+                    if not superseded:
+                        self._idle[key] = entry
+                if superseded:
+                    self._close(conn)
+
+    @staticmethod
+    def _close(conn):
+        if conn is None:
+            return
+        try:
+            conn.close()
+        except Exception:
+            pass
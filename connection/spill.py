@@ -0,0 +1,95 @@
+import os
+import tempfile
+import logging
+from typing import Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+
+def truncation_note(limit_bytes: int) -> str:
+    """单条命令超过硬上限被截断时追加在输出末尾的提示"""
+    return f"\n[输出截断，超过{limit_bytes / MB:g}MB上限]"
+
+
+def over_limit(total: int, limit_bytes: int) -> bool:
+    """是否达到单条命令硬上限（0 表示不限制）"""
+    return bool(limit_bytes) and total >= limit_bytes
+
+
+class SpillBuffer:
+    """
+    单条命令输出的内存有界缓冲（非流式读取路径）：
+    - 不超过 memory_limit 时与 bytearray 相同，全部保存在内存中
+    - 超过后当前内容写成一个临时分段文件，此后每攒满 memory_limit 再写一个分段，内存中只保留最后一段
+    - 读取结束后由工作线程按 chunks() 顺序把各分段拼接进最终输出文件，再 close() 删除临时分段
+    接口与 bytearray 的 extend/len 兼容，连接层读取循环无需区分两种缓冲。
+    """
+
+    def __init__(self, memory_limit: int = 16 * MB, spill_dir: Optional[str] = None):
+        self.memory_limit = max(1, int(memory_limit))
+        self.spill_dir = spill_dir
+        self.segments: List[str] = []
+        self.size = 0
+        self._buf = bytearray()
+
+    def extend(self, data: bytes):
+        if not data:
+            return
+        self._buf.extend(data)
+        self.size += len(data)
+        if len(self._buf) >= self.memory_limit:
+            self._spill()
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def spilled(self) -> bool:
+        return bool(self.segments)
+
+    def getvalue(self) -> bytes:
+        """全部内容（仅用于未溢出的缓冲；已溢出时应使用 chunks 逐段读取）"""
+        if self.segments:
+            raise ValueError("输出已溢出到临时分段，请使用 chunks() 读取")
+        return bytes(self._buf)
+
+    def chunks(self, chunk_size: int = 1 * MB) -> Iterator[bytes]:
+        """按写入顺序逐块读出全部内容（先读临时分段，再读内存中的最后一段）"""
+        for path in self.segments:
+            with open(path, 'rb') as f:
+                while True:
+                    chunk = f.read(chunk_size)
+                    if not chunk:
+                        break
+                    yield chunk
+        for i in range(0, len(self._buf), chunk_size):
+            yield bytes(self._buf[i:i + chunk_size])
+
+    def close(self):
+        """删除临时分段并释放内存（可重复调用）"""
+        for path in self.segments:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self.segments = []
+        self._buf = bytearray()
+
+    def _spill(self):
+        if self.spill_dir:
+            os.makedirs(self.spill_dir, exist_ok=True)
+        fd, path = tempfile.mkstemp(prefix='spill-', suffix='.seg', dir=self.spill_dir)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(self._buf)
+        if not self.segments:
+            logger.info(f"命令输出超过内存预算 {self.memory_limit // MB}MB，溢出到临时分段")
+        self.segments.append(path)
+        self._buf = bytearray()
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
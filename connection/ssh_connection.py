@@ -2,8 +2,23 @@ import paramiko
 import time
 import logging
 import re
+import select
 import socket
-from typing import Optional, Tuple
+from collections import deque
+from typing import Optional, Tuple, List, Dict, Any
+
+from .utils import ConnectionUtils
+from .prompt_matcher import StreamingPromptMatcher, compile_prompt
+from .pipeline import PipelineReadState, PipelineResync, resync_marker, split_pipelined_output
+from .device_profile import setup_terminal
+from .vendor_profiles import resolve_vendor
+from .link_timing import LinkTiming
+from .pager import PagerFilter
+from .ssh_tuning import SSHTransportProfile, get_transport_profile
+from .jump_host import JumpHost, JumpHostError
+from .rate_limiter import DeviceThrottle
+from .charset import SessionCharset
+from .spill import SpillBuffer, truncation_note, over_limit
 
 logger = logging.getLogger(__name__)
 
@@ -19,6 +34,8 @@ class SSHConnection:
         self.ssh: Optional[paramiko.SSHClient] = None
         self.channel: Optional[paramiko.Channel] = None
         self.connected = False
+        # 上一条命令的读取是否在提示符处结束：超时/超上限/异常时设备可能仍在输出，会话不归还会话池
+        self.at_prompt = True
 
         self.last_error = ""
         self.last_error_code = ""  # 机器可读错误码：如 'NETWORK_TIMEOUT'、'AUTH_FAILED'
@@ -30,15 +47,44 @@ class SSHConnection:
 
         # 提示符模式（字节级高性能匹配）
         self.prompt_pattern_bytes: Optional[re.Pattern[bytes]] = None
+        self.prompt_bytes = b''  # 探测到的提示符字面量（流水线切分使用）
+        self.terminal_prepared = False  # 是否已执行过分页/宽度预处理（会话复用时跳过）
+
+        # 设备画像（DeviceProfileCache）：缓存的提示符与有效预处理命令，连接前由上层设置
+        self.profile: Optional[Dict[str, Any]] = None
+        self.terminal_commands: List[str] = []  # 本次会话中设备接受的预处理命令
+        self.banner = b''  # 登录后的 banner/初始回显（厂商识别使用）
+        self.vendor_profile = None  # 识别出的厂商画像（VendorProfile）
+
+        # 跳板机：设置后经其共享传输的 direct-tcpip 通道连接目标设备（不再单独登录跳板机）
+        self.jump_host: Optional[JumpHost] = None
+        self._jump_channel = None
+
+        # 传输画像（压缩/密码算法/窗口/读块大小），连接前由上层按链路选择
+        self.transport_profile: SSHTransportProfile = get_transport_profile(None)
 
         # 读写与限速参数
-        self.chunk_size = 16384
-        self.max_output_size = 48 * 1024 * 1024  # 48MB，给上层50MB留余量
-        self.idle_probe_window = 0.6  # 静默探测窗口
+        self.chunk_size = self.transport_profile.chunk_size
+        # 输出上限：单条命令硬上限（0 不限制）；非流式读取超过内存预算的部分溢出到临时分段（spill_dir，缺省系统临时目录）
+        self.max_output_size = 0
+        self.memory_budget = 16 * 1024 * 1024
+        self.spill_dir: Optional[str] = None
+        self._spills: Dict[int, SpillBuffer] = {}  # 已溢出的命令输出（命令下标 → 缓冲），由工作线程取走拼接
+        self.idle_probe_window = 0.6  # 静默探测窗口（尚未测得 RTT 时的缺省值）
+        self.timing = LinkTiming(default_window=self.idle_probe_window)
+        self.prompt_quiet_window = 0.15  # 提示符探测：收到数据后静默该时长即认为本轮回显结束
+        # 读取限速（BandwidthScheduler.throttle_for），每次收到数据后按字节数调用；None 表示不限速
+        self.throttle: Optional[DeviceThrottle] = None
+        # 会话字符集：首次出现非 ASCII 输出时判定 UTF-8/GBK，之后整个会话沿用
+        self.charset = SessionCharset()
 
     def connect(self) -> bool:
         """建立SSH连接并打开交互式shell"""
         try:
+            profile = self.transport_profile
+            self.chunk_size = profile.chunk_size
+            if self.jump_host is not None:
+                self._jump_channel = self.jump_host.open_channel(self.ip, self.port, timeout=self.connect_timeout)
             self.ssh = paramiko.SSHClient()
             self.ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
             self.ssh.connect(
@@ -49,24 +95,25 @@ class SSHConnection:
                 timeout=self.connect_timeout,
                 banner_timeout=self.banner_timeout,
                 auth_timeout=self.auth_timeout,
-                compress=True,
+                compress=profile.compress,
                 look_for_keys=False,
-                allow_agent=False
+                allow_agent=False,
+                transport_factory=profile.transport_factory(),
+                sock=self._jump_channel
             )
 
             # 打开交互式shell，确保有PTY，设置较宽宽度
             self.channel = self.ssh.invoke_shell(term='vt100', width=512, height=1000)
             self.channel.settimeout(2.0)  # 基础读超时，逐步轮询
 
-            # 读掉banner与初始回显
-            time.sleep(0.3)
-            self._drain_channel_nonblocking()
-
-            # 探测提示符
-            self._detect_prompt()
+            # 有设备画像时等待缓存的提示符出现即完成探测；否则读掉banner后完整探测
+            if not self._use_cached_prompt():
+                self._detect_prompt()
 
             self.connected = True
-            logger.info(f"SSH连接成功: {self.ip}:{self.port}")
+            via = f"，经跳板机 {self.jump_host.label}" if self.jump_host is not None else ""
+            logger.info(f"SSH连接成功: {self.ip}:{self.port}（传输画像 {profile.name}，"
+                        f"密码算法 {self._negotiated_cipher()}{via}）")
             return True
         except Exception as e:
             code, msg = self._classify_connect_error(e)
@@ -77,6 +124,11 @@ class SSHConnection:
             self._cleanup()
             return False
 
+    def _negotiated_cipher(self) -> str:
+        """协商得到的入方向密码算法（日志与基准使用）"""
+        transport = self.ssh.get_transport() if self.ssh else None
+        return getattr(transport, 'remote_cipher', '') or 'unknown'
+
     def _classify_connect_error(self, e: Exception) -> Tuple[str, str]:
         """
         将连接异常分类为清晰的错误码与人性化消息。
@@ -89,8 +141,12 @@ class SSHConnection:
         - HOSTKEY_MISMATCH
         - SSH_PROTOCOL_ERROR
         - CONNECTION_RESET
+        - JUMP_HOST_UNREACHABLE / JUMP_HOST_AUTH_FAILED / JUMP_CHANNEL_REJECTED / JUMP_CHANNEL_LIMIT
         - UNKNOWN
         """
+        if isinstance(e, JumpHostError):
+            return e.code, str(e)
+
         try:
             from paramiko.ssh_exception import (
                 AuthenticationException,
@@ -230,49 +286,163 @@ class SSHConnection:
         except Exception:
             pass
 
+    def _wait_readable(self, timeout: float) -> bool:
+        """
+        等待通道可读（有数据或已关闭），数据到达立即返回。
+        paramiko Channel 提供 fileno()，可直接交给 select 监听，替代 recv_ready+sleep 轮询。
+        """
+        channel = self.channel
+        if not channel:
+            return False
+        if channel.recv_ready() or channel.closed:
+            return True
+        try:
+            readable, _, _ = select.select([channel], [], [], max(timeout, 0))
+        except (ValueError, OSError):
+            # 通道已失效
+            return True
+        return bool(readable)
+
+    def _read_until_quiet(self, quiet: float, max_wait: float, timing: Optional[LinkTiming] = None) -> bytes:
+        """读取直到静默 quiet 秒（首个数据前最多等待 max_wait 秒）；传入 timing 时记录首字节时延"""
+        buf = bytearray()
+        if not self.channel:
+            return b''
+        start = time.time()
+        deadline = start + max_wait
+        try:
+            while True:
+                remaining = deadline - time.time()
+                wait = quiet if buf else remaining
+                if wait <= 0 or not self._wait_readable(min(wait, max(remaining, quiet))):
+                    break
+                data = self.channel.recv(self.chunk_size)
+                if not data:
+                    break
+                if timing is not None and not buf:
+                    timing.add_rtt(time.time() - start)
+                buf.extend(data)
+        except Exception:
+            pass
+        return bytes(buf)
+
+    @staticmethod
+    def _last_line(data: bytes) -> bytes:
+        lines = [ln.strip() for ln in data.splitlines() if ln.strip()]
+        return lines[-1] if lines else b''
+
+    def _use_cached_prompt(self) -> bool:
+        """
+        使用设备画像中缓存的提示符：读取登录回显直到其以缓存提示符结尾即返回（无需空行往返）。
+        缓存缺失或与实际不符时读完 banner 返回 False，由 _detect_prompt 完整探测。
+        """
+        cached = ((self.profile or {}).get('prompt') or '').encode('utf-8', 'ignore')
+        if not cached:
+            self.banner = self._read_until_quiet(self.prompt_quiet_window, max_wait=1.0)
+            return False
+        matcher = StreamingPromptMatcher(compile_prompt(cached))
+        deadline = time.time() + 1.0
+        try:
+            while self.channel and self._wait_readable(max(0.0, deadline - time.time())):
+                data = self.channel.recv(self.chunk_size)
+                if not data:
+                    break
+                self.banner = (self.banner + data)[-4096:]
+                if matcher.feed(data):
+                    self.prompt_bytes = cached
+                    self.prompt_pattern_bytes = matcher.pattern
+                    logger.debug(f"使用缓存提示符: {cached!r}")
+                    return True
+        except Exception:
+            pass
+        logger.info(f"{self.ip} 缓存提示符不匹配，重新探测")
+        return False
+
+    def identify_vendor(self):
+        """识别厂商（设备画像已记录时直接使用）；提示符字面量缺失时改用厂商提示符文法"""
+        self.vendor_profile = resolve_vendor(
+            (self.profile or {}).get('vendor'), self.banner, self.prompt_bytes,
+            run_command=lambda cmd: self.execute_command(cmd, timeout=30))
+        if not self.prompt_bytes:
+            self.prompt_pattern_bytes = self.vendor_profile.prompt_pattern()
+
+    def prepare_terminal(self):
+        """终端预处理：依次尝试画像记录的命令、厂商分页命令、通用候选命令"""
+        self.terminal_commands = setup_terminal(
+            lambda cmd: self.execute_command(cmd, timeout=10),
+            (self.profile or {}).get('terminal_commands') or [],
+            self.vendor_profile)
+        self.terminal_prepared = True
+
+    def session_profile(self) -> Dict[str, Any]:
+        """本次会话学习到的设备画像（写回 DeviceProfileCache）"""
+        vendor = self.vendor_profile.name if self.vendor_profile else ''
+        profile = {
+            'prompt': self.prompt_bytes.decode('utf-8', 'ignore'),
+            'vendor': vendor if vendor != 'generic' else '',
+            'terminal_commands': list(self.terminal_commands),
+        }
+        # 链路实测值：下次连接据此选择传输画像
+        if self.timing.srtt is not None:
+            profile['rtt_ms'] = round(self.timing.srtt * 1000, 1)
+        if self.timing.throughput_kbps:
+            profile['link_kbps'] = round(self.timing.throughput_kbps)
+            profile['transport_profile'] = self.transport_profile.name
+        return profile
+
     def _detect_prompt(self):
-        """发送空行并从尾部推断提示符，构建字节级正则"""
+        """
+        发送空行并从尾部推断提示符，构建字节级正则。
+        数据到达即处理；连续两次空行得到相同的末行即视为提示符稳定，立即返回（约 2 个 RTT），
+        不再固定等待 2 秒。
+        """
         if not self.channel:
             return
         try:
-            self.channel.send(b'\n')
-            time.sleep(0.3)
-            buf = bytearray()
+            prompt_bytes = b''
             end_time = time.time() + 2.0
             while time.time() < end_time:
-                if self.channel.recv_ready():
-                    buf.extend(self.channel.recv(self.chunk_size))
-                    time.sleep(0.02)
-                else:
-                    time.sleep(0.02)
-
-            lines = [ln.strip() for ln in bytes(buf).splitlines() if ln.strip()]
-            prompt_bytes = lines[-1] if lines else b''
+                self.channel.send(b'\n')
+                candidate = self._last_line(
+                    self._read_until_quiet(self.timing.quiet_window(self.prompt_quiet_window),
+                                           max_wait=end_time - time.time(), timing=self.timing))
+                if not candidate:
+                    continue
+                if candidate == prompt_bytes:
+                    break
+                prompt_bytes = candidate
+
+            self.prompt_bytes = prompt_bytes
             if prompt_bytes:
-                escaped = re.escape(prompt_bytes)
-                self.prompt_pattern_bytes = re.compile(escaped + rb'\s*$')
+                self.prompt_pattern_bytes = compile_prompt(prompt_bytes)
             else:
                 # 通用回退
-                self.prompt_pattern_bytes = re.compile(rb'[\r\n][\w\-\.:/@]+[#>$%]\s*$')
+                self.prompt_pattern_bytes = re.compile(ConnectionUtils.GENERIC_PROMPT_BYTES)
         except Exception as e:
             logger.warning(f"SSH提示符检测失败: {e}")
-            self.prompt_pattern_bytes = re.compile(rb'[\r\n][\w\-\.:/@]+[#>$%]\s*$')
+            self.prompt_pattern_bytes = re.compile(ConnectionUtils.GENERIC_PROMPT_BYTES)
 
-    def execute_command(self, command: str, timeout: int = 300) -> Tuple[bool, str]:
-        """执行单个命令（交互式）：发送命令+换行，读取直到提示符出现"""
+    def execute_command(self, command: str, timeout: int = 300, sink=None) -> Tuple[bool, str]:
+        """
+        执行单个命令（交互式）：发送命令+换行，读取直到提示符出现。
+        传入 sink（具备 write(bytes) 的流式落盘对象）时，输出直接写入 sink，返回文本仅含截断等附加信息。
+        未传 sink 且输出超过 memory_budget 时输出溢出到临时分段，返回文本仅含附加信息，输出由 take_spilled_output 取走。
+        """
         if not self.connected or not self.ssh or not self.channel:
             return False, "SSH连接未建立"
 
+        self._discard_spills()
         try:
             # 清空残留
             self._drain_channel_nonblocking()
 
             # 发送命令（确保独立一行）
             to_send = ((command or "").strip() + "\n").encode("utf-8", "ignore")
+            self.at_prompt = False
             self.channel.send(to_send)
 
             # 读取直到提示符
-            output = self._read_until_prompt(timeout=timeout)
+            output = self._read_until_prompt(timeout=timeout, sink=sink)
             return True, output
         except Exception as e:
             et = e.__class__.__name__
@@ -293,76 +463,349 @@ class SSHConnection:
 
             return False, f"{hint} 原始错误[{et}]：{msg}"
 
-    def _read_until_prompt(self, timeout: int = 300) -> str:
-        """读取通道输出直到匹配提示符或达到超时/上限"""
+    def _read_until_prompt(self, timeout: int = 300, sink=None) -> str:
+        """读取通道输出直到匹配提示符或达到超时/上限；有 sink 时边读边写，不在内存中累积"""
         if not self.channel:
             return "通道不可用"
 
-        buf = bytearray()
-        tail = bytearray()
-        tail_keep = 8192
+        buf = SpillBuffer(self.memory_budget, self.spill_dir)
+        append = sink.write if sink is not None else buf.extend
+        matcher = StreamingPromptMatcher(self.prompt_pattern_bytes)
+        # 分页未能关闭时（预处理命令被拒绝）在流中直接应答空格翻页，并去掉分页提示
+        pager = PagerFilter()
 
         total = 0
         start = time.time()
         last_data_ts = time.time()
+        first_data_ts = None
+        throttled_before = self.throttle.throttled_seconds if self.throttle is not None else 0.0
+        # 静默探测时刻由会话实测的 RTT/回显节奏决定
+        probes = 0
+        probe_after = self.timing.idle_window
 
         try:
             while time.time() - start < timeout:
-                if self.channel.recv_ready():
+                now = time.time()
+                # 等待可读：最长等到静默探测时刻或总超时，数据到达即唤醒
+                wait = min(probe_after - (now - last_data_ts), timeout - (now - start))
+                if self._wait_readable(wait):
                     data = self.channel.recv(self.chunk_size)
                     if not data:
-                        time.sleep(0.02)
-                        continue
-                    buf.extend(data)
-                    tail.extend(data)
-                    if len(tail) > tail_keep:
-                        del tail[:len(tail) - tail_keep]
-
+                        # 通道已关闭（EOF）
+                        break
+                    now = time.time()
+                    if total == 0:
+                        # 首字节时延（含命令回显）作为 RTT 样本
+                        self.timing.add_rtt(now - start)
+                        first_data_ts = now
+                    else:
+                        self.timing.add_gap(now - last_data_ts)
+                    clean, paged = pager.feed(data)
+                    if paged:
+                        self.channel.send(b' ')
+                    append(clean)
                     total += len(data)
-                    last_data_ts = time.time()
+                    last_data_ts = now
+                    if self.throttle is not None:
+                        # 限速暂停不计入回显节奏（下一块数据的间隔从暂停结束算起）
+                        self.throttle(len(data))
+                        last_data_ts = time.time()
+                    probes = 0
+                    probe_after = self.timing.idle_window
 
-                    if total >= self.max_output_size:
-                        # 超限直接停止，避免占用过大内存
+                    if over_limit(total, self.max_output_size):
+                        # 达到配置的单条命令硬上限，停止读取
                         break
 
-                    if self.prompt_pattern_bytes and self.prompt_pattern_bytes.search(bytes(tail)):
-                        # 轻微等待收集提示符行残余
-                        time.sleep(0.05)
+                    if matcher.feed(data):
+                        self.at_prompt = True
+                        # 提示符已在尾部，仅收取已到达的残余，不再额外等待
                         try:
                             while self.channel.recv_ready():
                                 residue = self.channel.recv(self.chunk_size)
                                 if not residue:
                                     break
-                                buf.extend(residue)
-                                tail.extend(residue)
-                                if len(tail) > tail_keep:
-                                    del tail[:len(tail) - tail_keep]
+                                append(pager.feed(residue)[0])
                         except Exception:
                             pass
                         break
-                else:
-                    # 静默探测：轻回车一次拉取提示符
-                    if time.time() - last_data_ts >= self.idle_probe_window:
-                        try:
-                            self.channel.send(b'\r')
-                        except Exception:
-                            pass
-                        time.sleep(0.08)
-                        # 继续下一轮读取
-                        last_data_ts = time.time()
-                    else:
-                        time.sleep(0.02)
+                elif time.time() - last_data_ts >= probe_after:
+                    # 静默探测：轻回车一次拉取提示符；连续无回应时按倍数退避
+                    try:
+                        self.channel.send(b'\r')
+                    except Exception:
+                        pass
+                    probes += 1
+                    probe_after = self.timing.probe_interval(probes)
+                    last_data_ts = time.time()
 
-            text = bytes(buf).decode('utf-8', errors='ignore')
+            append(pager.flush())
+            if pager.pages:
+                logger.info(f"{self.ip} 分页未关闭，已在流中自动翻页 {pager.pages} 次")
+            elif first_data_ts is not None and (self.throttle is None
+                                                or self.throttle.throttled_seconds == throttled_before):
+                # 翻页往返与限速暂停会拉低吞吐，仅在无分页、未限速的读取中记录
+                self.timing.add_throughput(total, last_data_ts - first_data_ts)
+            note = truncation_note(self.max_output_size) if over_limit(total, self.max_output_size) else ""
+            if sink is not None:
+                return note
+            if buf.spilled:
+                # 超过内存预算：输出留在临时分段中，由工作线程逐块拼接进输出文件
+                self._spills[0] = buf
+                return note
+
+            text = self.charset.decode(buf.getvalue())
             # 规范化换行
             text = text.replace('\x00', '')
             text = re.sub(r'\r+\n', '\n', text).replace('\r', '')
-            if total >= self.max_output_size:
-                text += "\n[输出截断，超过48MB限制]"
-            return text
+            return text + note
         except Exception as e:
             return f"读取错误: {str(e)}"
 
+    def execute_pipelined(self, commands: List[str], timeout: int = 300) -> Optional[List[Tuple[bool, str]]]:
+        """
+        流水线执行一批只读命令：连续下发后按提示符边界切分回显。
+        需已探测到提示符字面量；切分有歧义、超时或设备丢弃预输入时返回 None，由调用方回退串行。
+        """
+        if not self.connected or not self.channel or not self.prompt_bytes or not commands:
+            return None
+        try:
+            self._drain_channel_nonblocking()
+            payload = "".join((cmd or "").strip() + "\n" for cmd in commands)
+            self.at_prompt = False
+            self.channel.send(payload.encode("utf-8", "ignore"))
+
+            state = PipelineReadState(self.prompt_bytes, len(commands))
+            raw = self._read_pipelined(state, timeout)
+            if raw is None:
+                self.at_prompt = self._resync_pipeline(state, timeout)
+                return None
+            self.at_prompt = True
+            text = self.charset.decode(raw).replace('\x00', '')
+            text = re.sub(r'\r+\n', '\n', text).replace('\r', '')
+            prompt = self.prompt_bytes.decode('utf-8', errors='ignore')
+            segments = split_pipelined_output(commands, text, prompt)
+            if segments is None:
+                return None
+            return [(True, segment) for segment in segments]
+        except Exception as e:
+            logger.warning(f"SSH流水线执行失败，回退串行: {e}")
+            return None
+
+    def _read_pipelined(self, state: PipelineReadState, timeout: int) -> Optional[bytes]:
+        """
+        读取直到提示符出现 state.expected 次且数据以提示符结尾。
+        流水线期间不做静默探测（注入回车会多出提示符），静默超过 pipeline_stall_window 视为设备未执行预输入。
+        """
+        buf = bytearray()
+        matcher = StreamingPromptMatcher(self.prompt_pattern_bytes)
+        start = time.time()
+        last_data_ts = start
+        stall_window = max(self.timing.idle_window * 5, 3.0)
+        while time.time() - start < timeout:
+            if not self._wait_readable(min(stall_window, timeout - (time.time() - start))):
+                if time.time() - last_data_ts >= stall_window:
+                    return None
+                continue
+            data = self.channel.recv(self.chunk_size)
+            if not data:
+                return None
+            if self.throttle is not None:
+                self.throttle(len(data))
+            buf.extend(data)
+            last_data_ts = time.time()
+            if len(buf) >= self.memory_budget:
+                # 流水线只用于小输出命令，整批超过内存预算时回退串行
+                return None
+            state.feed(data)
+            if matcher.feed(data) and state.complete:
+                return bytes(buf)
+        return None
+
+    def _resync_pipeline(self, state: PipelineReadState, timeout: int) -> bool:
+        """
+        流水线中途放弃后对齐通道：下发唯一标记行，读取并丢弃回显直到标记之后出现提示符，
+        避免设备上排队的剩余命令输出错配给串行回退的命令。超时或失败时将会话标记为断开，由调用方按会话中断处理。
+        """
+        marker = resync_marker()
+        resync = PipelineResync(state, marker.encode('ascii'), StreamingPromptMatcher(self.prompt_pattern_bytes))
+        stall_window = max(self.timing.idle_window * 5, 3.0)
+        deadline = time.time() + timeout
+        last_data_ts = time.time()
+        try:
+            self.channel.send((marker + "\n").encode('ascii'))
+            while time.time() < deadline:
+                if not self._wait_readable(min(stall_window, max(deadline - time.time(), 0))):
+                    if resync.settled and time.time() - last_data_ts >= stall_window:
+                        # 设备丢弃了部分预输入：标记已处理且其后静默，通道已对齐
+                        return True
+                    continue
+                data = self.channel.recv(self.chunk_size)
+                if not data:
+                    break
+                if self.throttle is not None:
+                    self.throttle(len(data))
+                last_data_ts = time.time()
+                if resync.feed(data):
+                    return True
+        except Exception as e:
+            logger.debug(f"SSH流水线通道对齐异常: {e}")
+        logger.warning("SSH流水线放弃后通道未能对齐，按会话中断处理")
+        self.connected = False
+        return False
+
+    def execute_parallel(self, commands: List[str], max_channels: int = 4,
+                         timeouts: Optional[List[int]] = None,
+                         order: Optional[List[int]] = None) -> Optional[List[Tuple[bool, str, float, int]]]:
+        """
+        在同一已认证 Transport 上并发打开最多 max_channels 个 exec 通道执行命令，
+        单线程 select 统一读取各通道，结果按输入顺序返回（与串行执行写盘顺序一致）。
+        每条结果为 (是否成功, 输出, 耗时秒数, 输出字节数)，耗时自通道打开到命令退出，供调用方计入命令历史。
+        order 为下发顺序（命令下标，如按预计耗时从长到短），缺省按输入顺序下发。
+        exec 通道无 PTY，不存在回显与分页。设备不支持 exec（打开/执行被拒、通道立即关闭且无输出）时
+        返回 None，由调用方回退交互式串行执行。
+        """
+        transport = self.ssh.get_transport() if self.ssh else None
+        if not self.connected or transport is None or not transport.is_active() or not commands:
+            return None
+
+        self._discard_spills()
+        timeouts = timeouts or [300] * len(commands)
+        results: List[Optional[Tuple[bool, str, float, int]]] = [None] * len(commands)
+        pending = deque((index, commands[index]) for index in (order or range(len(commands))))
+        active = {}
+        limit = max(1, int(max_channels))
+        any_output = False
+
+        def close_all():
+            for chan in list(active):
+                try:
+                    chan.close()
+                except Exception:
+                    pass
+            active.clear()
+
+        try:
+            while pending or active:
+                # 补足并发通道
+                while pending and len(active) < limit:
+                    index, cmd = pending.popleft()
+                    try:
+                        chan = transport.open_session(timeout=self.connect_timeout)
+                        chan.exec_command((cmd or "").strip())
+                    except Exception as e:
+                        if not active and not any_output:
+                            logger.info(f"设备不支持exec通道，回退交互式执行: {e}")
+                            close_all()
+                            return None
+                        if active:
+                            # 达到服务端会话数上限（如 MaxSessions），按当前并发数收敛后重试
+                            pending.appendleft((index, cmd))
+                            limit = len(active)
+                            break
+                        results[index] = (False, f"exec通道执行失败 原始错误[{e.__class__.__name__}]：{e}", 0.0, 0)
+                        continue
+                    started = time.time()
+                    active[chan] = {'index': index, 'buf': SpillBuffer(self.memory_budget, self.spill_dir), 'total': 0,
+                                    'started': started, 'deadline': started + timeouts[index]}
+
+                if not active:
+                    continue
+                try:
+                    select.select(list(active), [], [], 0.5)
+                except (ValueError, OSError):
+                    pass
+
+                now = time.time()
+                for chan, st in list(active.items()):
+                    while chan.recv_ready() or chan.recv_stderr_ready():
+                        data = chan.recv(self.chunk_size) if chan.recv_ready() else chan.recv_stderr(self.chunk_size)
+                        if not data:
+                            break
+                        if self.throttle is not None:
+                            self.throttle(len(data))
+                        if not over_limit(st['total'], self.max_output_size):
+                            st['buf'].extend(data)
+                        st['total'] += len(data)
+                    finished = chan.exit_status_ready() and not chan.recv_ready() and not chan.recv_stderr_ready()
+                    timed_out = now >= st['deadline']
+                    if not finished and not timed_out:
+                        continue
+
+                    del active[chan]
+                    if finished and st['total'] == 0 and chan.recv_exit_status() == -1 and not any_output:
+                        # 通道被设备直接关闭且无任何输出：视为不支持exec
+                        logger.info("exec通道无输出即关闭，回退交互式执行")
+                        try:
+                            chan.close()
+                        except Exception:
+                            pass
+                        close_all()
+                        return None
+                    any_output = any_output or st['total'] > 0
+                    try:
+                        chan.close()
+                    except Exception:
+                        pass
+
+                    note = truncation_note(self.max_output_size) if over_limit(st['total'], self.max_output_size) else ""
+                    if st['buf'].spilled:
+                        self._spills[st['index']] = st['buf']
+                        text = note
+                    else:
+                        text = self.charset.decode(st['buf'].getvalue()).replace('\x00', '')
+                        text = re.sub(r'\r+\n', '\n', text).replace('\r', '') + note
+                    elapsed = now - st['started']
+                    if timed_out and not finished:
+                        results[st['index']] = (False, text + "\n[命令执行超时]", elapsed, st['total'])
+                    else:
+                        results[st['index']] = (True, text, elapsed, st['total'])
+        except Exception as e:
+            logger.warning(f"exec通道并发执行异常: {e}")
+            close_all()
+            if not any_output:
+                return None
+            for i, r in enumerate(results):
+                if r is None:
+                    results[i] = (False, f"exec通道执行中断 原始错误[{e.__class__.__name__}]：{e}", 0.0, 0)
+
+        return [r if r is not None else (False, "exec通道未返回结果", 0.0, 0) for r in results]
+
+    def take_spilled_output(self, index: int = 0) -> Optional[SpillBuffer]:
+        """
+        取走超过内存预算、已溢出到临时分段的命令输出（execute_command 为 0，execute_parallel 为命令下标）；
+        未溢出时返回 None（输出已在返回的文本中）。调用方拼接完成后负责 close()
+        """
+        return self._spills.pop(index, None)
+
+    def _discard_spills(self):
+        for spill in self._spills.values():
+            spill.close()
+        self._spills.clear()
+
+    def is_alive(self) -> bool:
+        """会话健康检查：Transport 活跃且交互通道未关闭"""
+        if not self.connected or not self.ssh or not self.channel:
+            return False
+        try:
+            transport = self.ssh.get_transport()
+            return bool(transport and transport.is_active()
+                        and not self.channel.closed and not self.channel.eof_received)
+        except Exception:
+            return False
+
+    def keepalive(self) -> bool:
+        """空闲保活：发送空行并收取提示符回显，既刷新设备 CLI 空闲计时也验证会话可用"""
+        if not self.is_alive():
+            return False
+        try:
+            self._drain_channel_nonblocking()
+            self.channel.send(b'\n')
+            reply = self._read_until_quiet(self.timing.quiet_window(self.prompt_quiet_window), max_wait=5.0)
+            return bool(reply) and self.is_alive()
+        except Exception:
+            return False
+
     def _cleanup(self):
         try:
             if self.channel:
@@ -379,9 +822,14 @@ class SSHConnection:
             pass
         finally:
             self.ssh = None
+        if self.jump_host is not None:
+            # 归还跳板机通道名额（通道随目标会话关闭，重复归还无副作用）
+            self.jump_host.release_channel(self._jump_channel)
+            self._jump_channel = None
 
     def close(self):
         """关闭SSH连接"""
+        self._discard_spills()
         self._cleanup()
         self.connected = False
         logger.info(f"SSH连接已关闭: {self.ip}:{self.port}")
@@ -0,0 +1,135 @@
+import os
+import logging
+from typing import Dict, Optional, Sequence, Tuple
+
+import paramiko
+
+logger = logging.getLogger(__name__)
+
+# 密码算法偏好：AEAD 优先（需 paramiko 支持），其次 CTR；仅保留当前 paramiko 可用的算法，其余按原顺序追加
+FAST_CIPHERS = (
+    'aes128-gcm@openssh.com',
+    'aes256-gcm@openssh.com',
+    'chacha20-poly1305@openssh.com',
+    'aes128-ctr',
+    'aes256-ctr',
+)
+
+
+class SSHTransportProfile:
+    """
+    SSH 传输层参数组合：
+    - ciphers：密码算法偏好顺序（空表示 paramiko 缺省顺序）
+    - compress：是否启用 zlib 压缩（慢链路收益大，快链路上纯 Python zlib 成为 CPU 瓶颈）
+    - window_size / max_packet_size：通道接收窗口与最大包长（高 BDP 链路需要更大窗口）
+    - chunk_size：单次 recv 读取量
+    """
+
+    def __init__(self, name: str, ciphers: Sequence[str] = (), compress: bool = False,
+                 window_size: int = 2 * 1024 * 1024, max_packet_size: int = 32768,
+                 chunk_size: int = 16384, description: str = ''):
+        self.name = name
+        self.ciphers = tuple(ciphers)
+        self.compress = compress
+        self.window_size = window_size
+        self.max_packet_size = max_packet_size
+        self.chunk_size = chunk_size
+        self.description = description
+
+    def transport_factory(self):
+        """供 SSHClient.connect(transport_factory=...) 使用：按本画像创建 Transport 并设置密码算法偏好"""
+        def factory(sock, **kwargs):
+            transport = paramiko.Transport(sock, default_window_size=self.window_size,
+                                           default_max_packet_size=self.max_packet_size, **kwargs)
+            if self.ciphers:
+                apply_cipher_preference(transport, self.ciphers)
+            return transport
+        return factory
+
+    def asyncssh_compression_algs(self):
+        """
+        asyncssh 的 compression_algs 参数：开启压缩时取 asyncssh 缺省列表（zlib@openssh.com 优先），
+        关闭时只允许 none（asyncssh 把 None 视为显式的“无算法”，同样只协商 none，不能用来表示缺省）
+        """
+        return 'default' if self.compress else ['none']
+
+    def __repr__(self) -> str:
+        return (f"SSHTransportProfile({self.name}, compress={self.compress}, "
+                f"window={self.window_size}, packet={self.max_packet_size}, chunk={self.chunk_size})")
+
+
+TRANSPORT_PROFILES: Dict[str, SSHTransportProfile] = {
+    # 与原实现一致：压缩开启、paramiko 缺省算法与窗口
+    'compat': SSHTransportProfile(
+        'compat', compress=True, chunk_size=16384,
+        description='兼容（压缩开启，缺省算法与窗口）',
+    ),
+    # 低时延快链路/多会话并发：关闭压缩，快速密码算法，大读块
+    'lan': SSHTransportProfile(
+        'lan', ciphers=FAST_CIPHERS, compress=False, window_size=4 * 1024 * 1024,
+        chunk_size=65536, description='局域网（关闭压缩，AES-GCM/CTR 优先）',
+    ),
+    # 高时延链路：大窗口避免窗口耗尽停顿；带宽低时压缩收益大于 CPU 开销
+    'wan': SSHTransportProfile(
+        'wan', ciphers=FAST_CIPHERS, compress=True, window_size=16 * 1024 * 1024,
+        chunk_size=32768, description='广域网（压缩开启，16MB 窗口）',
+    ),
+    # 高时延但带宽充足：大窗口且不压缩
+    'wan_fast': SSHTransportProfile(
+        'wan_fast', ciphers=FAST_CIPHERS, compress=False, window_size=16 * 1024 * 1024,
+        chunk_size=65536, description='高时延高带宽（关闭压缩，16MB 窗口）',
+    ),
+}
+
+DEFAULT_TRANSPORT_PROFILE = 'compat'
+
+# 选择阈值：低于该带宽时压缩收益明显（设备配置文本压缩比通常 5~10 倍）
+SLOW_LINK_KBPS = 20000
+# 高于该 RTT 时 2MB 缺省窗口成为瓶颈（2MB / 50ms ≈ 320Mbps 以下不受限，但会话多时窗口频繁耗尽）
+HIGH_RTT_MS = 50
+# 压缩画像下实测的是解压后的有效吞吐，按该倍数折算回线路带宽后再比较，避免在 wan/lan 之间来回切换
+COMPRESSION_GAIN = 4
+# 每核并发会话数超过该值时视为 CPU 受限，快链路上不压缩
+CPU_BOUND_SESSIONS_PER_CORE = 2
+
+
+def apply_cipher_preference(transport, preferred: Sequence[str]) -> Tuple[str, ...]:
+    """将 preferred 中当前 paramiko 支持的算法排在前面，其余保持原顺序；返回生效的顺序"""
+    options = transport.get_security_options()
+    available = tuple(options.ciphers)
+    ordered = tuple(c for c in preferred if c in available)
+    ordered += tuple(c for c in available if c not in ordered)
+    try:
+        options.ciphers = ordered
+    except ValueError as e:
+        logger.debug(f"设置密码算法偏好失败，使用缺省顺序: {e}")
+        return available
+    return ordered
+
+
+def get_transport_profile(name: Optional[str]) -> SSHTransportProfile:
+    """按名称获取传输画像，未知名称返回缺省画像"""
+    return TRANSPORT_PROFILES.get((name or '').lower(), TRANSPORT_PROFILES[DEFAULT_TRANSPORT_PROFILE])
+
+
+def select_transport_profile(link_kbps: Optional[float] = None, rtt_ms: Optional[float] = None,
+                             concurrent_sessions: int = 1, cpu_count: Optional[int] = None,
+                             measured_with: Optional[str] = None) -> SSHTransportProfile:
+    """
+    按链路与本机 CPU 选择传输画像（link_kbps/rtt_ms 来自设备画像中上次采集的实测值，
+    measured_with 为实测时使用的画像名）：
+    - 无实测值：CPU 受限（每核会话数多）时选 lan，否则保持 compat
+    - 带宽低：wan（压缩 + 大窗口）
+    - 带宽充足：RTT 高选 wan_fast，否则 lan
+    """
+    cpus = cpu_count or os.cpu_count() or 1
+    cpu_bound = concurrent_sessions / cpus > CPU_BOUND_SESSIONS_PER_CORE
+    if link_kbps is None and rtt_ms is None:
+        return TRANSPORT_PROFILES['lan' if cpu_bound else DEFAULT_TRANSPORT_PROFILE]
+    if link_kbps is not None and get_transport_profile(measured_with).compress:
+        link_kbps = link_kbps / COMPRESSION_GAIN
+    if link_kbps is not None and link_kbps < SLOW_LINK_KBPS:
+        return TRANSPORT_PROFILES['wan']
+    if rtt_ms is not None and rtt_ms >= HIGH_RTT_MS:
+        return TRANSPORT_PROFILES['wan_fast']
+    return TRANSPORT_PROFILES['lan']
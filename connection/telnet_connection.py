@@ -1,11 +1,21 @@
-import telnetlib
 import time
 import logging
 import re
 import socket
-from typing import Optional, Tuple, List, Pattern
+from typing import Optional, Tuple, List, Pattern, Dict, Any
 from datetime import datetime
 
+from .prompt_matcher import StreamingPromptMatcher, compile_prompt
+from .pipeline import PipelineReadState, PipelineResync, resync_marker, split_pipelined_output
+from .device_profile import setup_terminal
+from .vendor_profiles import resolve_vendor
+from .link_timing import LinkTiming
+from .pager import PagerFilter
+from .telnet_protocol import TelnetSocket, TelnetLoginMachine
+from .rate_limiter import DeviceThrottle
+from .charset import SessionCharset
+from .spill import SpillBuffer, truncation_note, over_limit
+
 logger = logging.getLogger(__name__)
 
 class TelnetConnection:
@@ -16,12 +26,29 @@ class TelnetConnection:
         self.port = port
         self.username = username
         self.password = password
-        self.tn: Optional[telnetlib.Telnet] = None
+        self.tn: Optional[TelnetSocket] = None
         self.connected = False
+        # 上一条命令的读取是否在提示符处结束：超时/超上限/异常时设备可能仍在输出，会话不归还会话池
+        self.at_prompt = True
 
         # 既保留字符串模式以兼容原有逻辑，也新增字节级提示符模式用于高性能匹配
         self.prompt_pattern: Optional[Pattern] = None           # str 正则（兼容）
         self.prompt_pattern_bytes: Optional[Pattern] = None      # bytes 正则（高性能）
+        self.prompt_bytes = b''                                  # 提示符字面量（流水线切分使用）
+
+        # 设备画像（DeviceProfileCache）：缓存的提示符与有效预处理命令，连接前由上层设置
+        self.profile: Optional[Dict[str, Any]] = None
+        self.terminal_commands: List[str] = []                   # 本次会话中设备接受的预处理命令
+        self.banner = b''                                        # 登录成功时的回显尾部（校验缓存提示符/厂商识别）
+        self.vendor_profile = None                               # 识别出的厂商画像（VendorProfile）
+        self.timing = LinkTiming(default_window=0.6)             # 会话链路时序（静默探测/残余等待自适应）
+        self.throttle: Optional[DeviceThrottle] = None           # 读取限速（BandwidthScheduler.throttle_for），None 不限速
+        self.charset = SessionCharset()                          # 会话字符集（UTF-8/GBK，整个会话只判定一次）
+        # 输出上限：单条命令硬上限（0 不限制）；非流式读取超过内存预算的部分溢出到临时分段（spill_dir，缺省系统临时目录）
+        self.max_output_size = 0
+        self.memory_budget = 16 * 1024 * 1024
+        self.spill_dir: Optional[str] = None
+        self._spill: Optional[SpillBuffer] = None                # 已溢出的命令输出，由工作线程取走拼接
 
         # 连接参数
         self.connect_timeout = 10
@@ -29,6 +56,9 @@ class TelnetConnection:
         self.read_timeout = 2.0
         self.command_timeout = 300
         self.large_command_timeout = 600
+        # NAWS 通告的终端窗口：512 列、高度 0（不限），支持的设备据此不再分页
+        self.naws_width = 512
+        self.naws_height = 0
         
         # 登录模式匹配
         self.login_patterns = [
@@ -49,20 +79,20 @@ class TelnetConnection:
             try:
                 logger.info(f"尝试Telnet连接 {self.ip}:{self.port} (尝试 {retry_count + 1}/{self.max_retries})")
                 
-                # 创建Telnet连接
-                self.tn = telnetlib.Telnet(
-                    self.ip, 
-                    port=self.port, 
-                    timeout=self.connect_timeout
-                )
+                # 创建Telnet连接（非阻塞 selectors 引擎，IAC 协商与 NAWS 由协议层处理）
+                self.tn = TelnetSocket(self.ip, self.port, timeout=self.connect_timeout,
+                                       width=self.naws_width, height=self.naws_height)
+                self.tn.connect()
                 
                 # 执行登录流程
                 if self._perform_login():
                     self.connected = True
-                    # 检测并设置终端参数
+                    # 检测命令提示符模式（设备画像中有缓存且与登录回显一致时直接使用）
+                    if not self._use_cached_prompt():
+                        self._detect_prompt_pattern()
+                    # 识别厂商，按厂商画像设置终端参数（逐条读到提示符，记录设备接受的命令）
+                    self.identify_vendor()
                     self._setup_terminal()
-                    # 检测命令提示符模式
-                    self._detect_prompt_pattern()
                     
                     logger.info(f"Telnet连接成功: {self.ip}:{self.port}")
                     return True
@@ -91,175 +121,135 @@ class TelnetConnection:
         return False
     
     def _perform_login(self) -> bool:
-        """执行完整的登录流程"""
+        """
+        执行完整的登录流程：登录状态机只扫描新到达的字节，
+        每个阶段按各自时限等待（用户名/密码提示 10s，登录结果 15s），数据到达即推进，无固定休眠。
+        """
         if not self.tn:
             logger.error("Telnet对象未初始化，无法执行登录")
             return False
+        login = TelnetLoginMachine(self.username, self.password, self.login_patterns,
+                                   self.password_patterns, self.prompt_patterns, self.error_patterns)
+        stage_timeouts = {login.WAIT_USERNAME: 10, login.WAIT_PASSWORD: 10, login.VERIFY: 15}
+        state = login.state
+        deadline = time.time() + stage_timeouts[state]
         try:
-            # 读取欢迎信息并等待登录提示
-            login_prompt = self._wait_for_patterns(self.login_patterns, timeout=10)
-            if not login_prompt:
-                logger.error(f"未找到登录提示（等待 10s 超时）。目标 {self.ip}:{self.port} 可能不是Telnet服务或端口错误")
-                return False
-                
-            # 发送用户名
-            self.tn.write(self.username.encode('ascii') + b'\n')
-            time.sleep(0.3)
-            
-            # 等待密码提示
-            password_prompt = self._wait_for_patterns(self.password_patterns, timeout=10)
-            if not password_prompt:
-                logger.error(f"未找到密码提示（等待 10s 超时）。请检查登录流程与设备提示是否符合预期，目标 {self.ip}:{self.port}")
-                return False
-                
-            # 发送密码
-            self.tn.write(self.password.encode('ascii') + b'\n')
-            time.sleep(0.6)
-            
-            # 验证登录是否成功
-            return self._verify_login()
-            
+            while login.state not in (login.DONE, login.FAILED):
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    self._log_login_timeout(login.state)
+                    return False
+                reply = login.feed(self.tn.read(min(remaining, 0.5)))
+                if reply:
+                    self.tn.write(reply)
+                if login.state != state and login.state in stage_timeouts:
+                    state = login.state
+                    deadline = time.time() + stage_timeouts[state]
+        except EOFError:
+            logger.error(f"登录过程中连接被对端关闭。目标 {self.ip}:{self.port}")
+            return False
         except Exception as e:
             logger.error(f"登录过程出错: {e}")
             return False
-    
-    def _wait_for_patterns(self, patterns: List[bytes], timeout: int = 10) -> Optional[bytes]:
-        """等待匹配指定的模式（字节级）"""
-        if not self.tn:
-            return None
-        try:
-            data = b''
-            start_time = time.time()
-            
-            while time.time() - start_time < timeout:
-                try:
-                    chunk = self.tn.read_very_eager()
-                    if chunk:
-                        data += chunk
-                        for pattern in patterns:
-                            if pattern in data:
-                                return pattern
-                    else:
-                        time.sleep(0.05)
-                except (socket.timeout, EOFError):
-                    continue
-            return None
-        except Exception as e:
-            logger.warning(f"等待模式时出错: {e}")
-            return None
-    
-    def _verify_login(self) -> bool:
-        """验证登录是否成功（字节级）"""
-        tn = self.tn
-        if not tn:
-            logger.error("Telnet对象未初始化，无法验证登录")
+
+        if login.state == login.FAILED:
+            logger.error("登录认证失败")
             return False
-        try:
-            start_time = time.time()
-            login_data = b''
-            
-            while time.time() - start_time < 15:
-                try:
-                    chunk = tn.read_very_eager()
-                    if chunk:
-                        login_data += chunk
-                        # 错误信息判定（小写以覆盖）
-                        if any(error in login_data.lower() for error in self.error_patterns):
-                            logger.error("登录认证失败")
-                            return False
-                        # 提示符存在判定
-                        if any(prompt in login_data for prompt in self.prompt_patterns):
-                            return True
-                    else:
-                        time.sleep(0.05)
-                except (socket.timeout, EOFError):
-                    continue
-            
-            # 最终检查一次
-            try:
-                final_check = tn.read_very_eager()
-                login_data += final_check
-            except:
-                pass
-            
-            if any(prompt in login_data for prompt in self.prompt_patterns):
-                return True
-                
+        self.banner = bytes(login.banner)
+        return True
+
+    def _log_login_timeout(self, state: str):
+        if state == TelnetLoginMachine.WAIT_USERNAME:
+            logger.error(f"未找到登录提示（等待 10s 超时）。目标 {self.ip}:{self.port} 可能不是Telnet服务或端口错误")
+        elif state == TelnetLoginMachine.WAIT_PASSWORD:
+            logger.error(f"未找到密码提示（等待 10s 超时）。请检查登录流程与设备提示是否符合预期，目标 {self.ip}:{self.port}")
+        else:
             logger.error("登录超时，未找到命令提示符")
-            return False
-        except Exception as e:
-            logger.error(f"登录验证失败: {e}")
-            return False
-    
+
     def _setup_terminal(self):
-        """设置终端参数（禁用分页/增宽）"""
+        """设置终端参数（禁用分页/增宽）：依次尝试画像记录的命令、厂商分页命令、通用候选命令"""
         if not self.tn:
             return
-        terminal_commands = [
-            "terminal length 0",
-            "screen-length 0",
-            "screen-length disable",
-            "terminal width 512",
-            "set cli screen-length 0"
-        ]
-        
-        for cmd in terminal_commands:
-            try:
-                self.tn.write(cmd.encode('ascii') + b'\n')
-                time.sleep(0.15)
-                # 快速清理响应避免干扰
-                try:
-                    self.tn.read_very_eager()
-                except:
-                    pass
-            except Exception as e:
-                logger.debug(f"执行终端命令 {cmd} 出错: {e}")
-                continue
-        
+
+        self.terminal_commands = setup_terminal(
+            lambda cmd: self.execute_command(cmd, timeout=10),
+            (self.profile or {}).get('terminal_commands') or [],
+            self.vendor_profile)
+
         # 清空缓冲区
         try:
-            self.tn.read_very_eager()
+            self.tn.read_available()
         except:
             pass
-    
+
+    def _use_cached_prompt(self) -> bool:
+        """登录回显以设备画像中缓存的提示符结尾时直接使用，跳过空行探测"""
+        cached = ((self.profile or {}).get('prompt') or '').encode('utf-8', 'ignore')
+        if not cached or not self.banner.rstrip().endswith(cached):
+            return False
+        self._apply_prompt(cached)
+        logger.debug(f"使用缓存提示符: {cached!r}")
+        return True
+
+    def _apply_prompt(self, prompt_bytes: bytes):
+        """按提示符字面量构建 str/bytes 双正则"""
+        self.prompt_bytes = prompt_bytes
+        self.prompt_pattern_bytes = compile_prompt(prompt_bytes)
+        prompt_str = prompt_bytes.decode('utf-8', errors='ignore')
+        if prompt_str:
+            self.prompt_pattern = re.compile(re.escape(prompt_str) + r'\s*$')
+        else:
+            self.prompt_pattern = re.compile(r'[\r\n][\w\-\.:/@]+[#>$%]\s*$')
+
+    def identify_vendor(self):
+        """识别厂商（设备画像已记录时直接使用）；提示符字面量缺失时改用厂商提示符文法"""
+        self.vendor_profile = resolve_vendor(
+            (self.profile or {}).get('vendor'), self.banner, self.prompt_bytes,
+            run_command=lambda cmd: self.execute_command(cmd, timeout=30))
+        if not self.prompt_bytes:
+            self.prompt_pattern_bytes = self.vendor_profile.prompt_pattern()
+
+    def session_profile(self) -> Dict[str, Any]:
+        """本次会话学习到的设备画像（写回 DeviceProfileCache）"""
+        vendor = self.vendor_profile.name if self.vendor_profile else ''
+        return {
+            'prompt': self.prompt_bytes.decode('utf-8', 'ignore'),
+            'vendor': vendor if vendor != 'generic' else '',
+            'terminal_commands': list(self.terminal_commands),
+        }
+
     def _detect_prompt_pattern(self):
         """检测命令提示符模式（构建 str/bytes 双正则）"""
         if not self.tn:
             return
         try:
-            # 发送空命令获取提示符
+            # 发送空命令获取提示符；收到回显后静默一个收尾窗口即结束（不再固定等待 2.3 秒）
             self.tn.write(b'\n')
-            time.sleep(0.3)
-            
-            # 聚合读取更多响应，增强稳定性
-            buf = b''
-            end_time = time.time() + 2.0
+            sent_at = time.time()
+            buf = bytearray()
+            end_time = sent_at + 2.0
+            quiet = self.timing.quiet_window(0.15)
+            last_data_ts = None
             while time.time() < end_time:
+                if last_data_ts is not None and time.time() - last_data_ts >= quiet:
+                    break
                 try:
-                    chunk = self.tn.read_very_eager()
-                    if chunk:
-                        buf += chunk
-                        time.sleep(0.02)
-                    else:
-                        time.sleep(0.02)
+                    chunk = self.tn.read(0.02)
                 except (socket.timeout, EOFError):
                     break
+                if chunk:
+                    if last_data_ts is None:
+                        self.timing.add_rtt(time.time() - sent_at)
+                        quiet = self.timing.quiet_window(0.15)
+                    buf.extend(chunk)
+                    last_data_ts = time.time()
             
             # 取最后一条非空行作为提示符候选（字节级）
             lines = [ln.strip() for ln in buf.splitlines() if ln.strip()]
             prompt_bytes = lines[-1] if lines else b''
+            self.prompt_bytes = prompt_bytes
             if prompt_bytes:
-                escaped_b = re.escape(prompt_bytes)
-                self.prompt_pattern_bytes = re.compile(escaped_b + rb'\s*$')
-                # 同步构建字符串正则（兼容性）
-                try:
-                    prompt_str = prompt_bytes.decode('utf-8', errors='ignore')
-                except Exception:
-                    prompt_str = ''
-                if prompt_str:
-                    self.prompt_pattern = re.compile(re.escape(prompt_str) + r'\s*$')
-                else:
-                    self.prompt_pattern = re.compile(r'[\r\n][\w\-\.:/@]+[#>$%]\s*$')
+                self._apply_prompt(prompt_bytes)
             else:
                 # 回退：通用提示符模式
                 self.prompt_pattern_bytes = re.compile(rb'[\r\n][\w\-\.:/@]+[#>$%]\s*$')
@@ -270,134 +260,130 @@ class TelnetConnection:
             self.prompt_pattern_bytes = re.compile(rb'[\r\n][\w\-\.:/@]+[#>$%]\s*$')
             self.prompt_pattern = re.compile(r'[\r\n][\w\-\.:/@]+[#>$%]\s*$')
     
-    def execute_command(self, command: str, timeout: int = 300, is_large_output: bool = False) -> Tuple[bool, str]:
-        """执行Telnet命令 - 优化版，支持大规模回显"""
+    def execute_command(self, command: str, timeout: int = 300, is_large_output: bool = False,
+                        sink=None) -> Tuple[bool, str]:
+        """执行Telnet命令 - 优化版，支持大规模回显；传入 sink 时输出流式写入 sink"""
         if not self.connected or not self.tn:
             return False, "Telnet连接未建立"
             
+        self._discard_spill()
         try:
             # 清空输入缓冲区
             try:
-                self.tn.read_very_eager()
-            except:
+                self.tn.read_available()
+            except EOFError:
+                raise
+            except Exception:
                 pass
             
             # 发送命令
             full_command = command.encode('ascii') + b'\n'
+            self.at_prompt = False
             self.tn.write(full_command)
             
             # 读取输出
-            output = self._read_output(timeout, is_large_output)
+            output = self._read_output(timeout, is_large_output, sink=sink)
             return True, output
         except Exception as e:
             logger.error(f"命令执行错误: {e}")
             return False, f"命令执行错误: {str(e)}"
     
-    def _read_output(self, timeout: int, is_large: bool = False) -> str:
-        """读取命令输出（高吞吐、低开销、超大回显）"""
+    def _read_output(self, timeout: int, is_large: bool = False, sink=None) -> str:
+        """读取命令输出（高吞吐、低开销、超大回显）；有 sink 时边读边写，不在内存中累积"""
         if not self.tn:
             return "Telnet连接未建立"
-        import select
 
-        buf = bytearray()
+        buf = SpillBuffer(self.memory_budget, self.spill_dir)
+        append = sink.write if sink is not None else buf.extend
         total_size = 0
         start = time.time()
-        # 提升单次命令输出上限到48MB（为BufferManager 50MB总上限留余量）
-        max_size = 48 * 1024 * 1024
 
-        # 静默窗口：在该时长内无数据则做轻量探测
-        idle_window = 0.6 if not is_large else 1.2
+        # 静默窗口：由会话实测的 RTT/回显节奏决定（大输出命令加倍），在该时长内无数据才做轻量探测
+        scale = 2 if is_large else 1
+        probes = 0
+        probe_after = self.timing.idle_window * scale
         last_data_ts = time.time()
 
-        # 用于提示符匹配的尾部滑动窗口（字节级）
-        tail = bytearray()
-        tail_keep = 8192  # 仅在尾部匹配提示符，避免整段扫描
+        # 流式提示符匹配：只检查新到达数据 + 少量携带字节
+        matcher = StreamingPromptMatcher(self.prompt_pattern_bytes)
+        # 分页未能关闭时在流中直接应答空格翻页，并去掉分页提示
+        pager = PagerFilter()
 
         try:
-            fileno = None
-            try:
-                fileno = self.tn.fileno()
-            except Exception:
-                fileno = None
-
             while time.time() - start < timeout:
-                ready = []
-                if fileno is not None:
-                    try:
-                        # 更短的select间隔，提升响应度
-                        ready, _, _ = select.select([fileno], [], [], 0.1)
-                    except Exception:
-                        # 某些环境不支持，对齐回退为轮询
-                        ready = []
-
-                data = b''
-                if ready or fileno is None:
-                    # 优先使用更温和的 read_some
-                    try:
-                        data = self.tn.read_some()
-                    except Exception:
-                        try:
-                            data = self.tn.read_very_eager()
-                        except Exception:
-                            data = b''
+                # 等待可读：最长等到静默探测时刻或总超时，数据到达即唤醒
+                now = time.time()
+                wait = min(probe_after - (now - last_data_ts), timeout - (now - start))
+                try:
+                    data = self.tn.read(max(wait, 0.001))
+                except EOFError:
+                    # 对端关闭连接
+                    self.connected = False
+                    break
 
                 if data:
-                    last_data_ts = time.time()
-                    buf.extend(data)
+                    now = time.time()
+                    if total_size == 0:
+                        # 首字节时延（含命令回显）作为 RTT 样本
+                        self.timing.add_rtt(now - start)
+                    else:
+                        self.timing.add_gap(now - last_data_ts)
+                    last_data_ts = now
+                    if self.throttle is not None:
+                        # 限速暂停不计入回显节奏（下一块数据的间隔从暂停结束算起）
+                        self.throttle(len(data))
+                        last_data_ts = time.time()
+                    probes = 0
+                    probe_after = self.timing.idle_window * scale
+                    clean, paged = pager.feed(data)
+                    if paged:
+                        self.tn.write(b' ')
+                    append(clean)
                     total_size += len(data)
 
-                    # 维护尾部窗口用于提示符匹配
-                    tail.extend(data)
-                    if len(tail) > tail_keep:
-                        del tail[:len(tail) - tail_keep]
-
-                    # 输出上限控制
-                    if total_size >= max_size:
-                        # 超限则直接停止读取
+                    # 达到配置的单条命令硬上限则停止读取（默认不限制，超出内存预算的部分溢出到临时分段）
+                    if over_limit(total_size, self.max_output_size):
                         break
 
                     # 字节级提示符检测（尾部窗口）
-                    if self.prompt_pattern_bytes and self.prompt_pattern_bytes.search(bytes(tail)):
-                        # 等待极短时间收集提示符行残余
-                        time.sleep(0.05)
+                    if matcher.feed(data):
+                        self.at_prompt = True
+                        # 收集提示符行残余：等待时长按会话回显节奏自适应（不超过 50ms）
                         try:
-                            residue = self.tn.read_very_eager()
+                            residue = self.tn.read(self.timing.residue_wait)
                             if residue:
-                                buf.extend(residue)
-                                tail.extend(residue)
-                                if len(tail) > tail_keep:
-                                    del tail[:len(tail) - tail_keep]
+                                append(pager.feed(residue)[0])
                         except Exception:
                             pass
                         break
                 else:
-                    # 无数据，基于静默窗口进行轻量探测
-                    if time.time() - last_data_ts >= idle_window:
+                    # 无数据，基于静默窗口进行轻量探测；连续无回应时按倍数退避
+                    if time.time() - last_data_ts >= probe_after:
                         try:
-                            # 轻量回车，不高频注入
+                            # 轻量回车，不高频注入；回应由主循环读取
                             self.tn.write(b'\r')
-                            time.sleep(0.08)
-                            probe = self.tn.read_very_eager()
-                            if probe:
-                                buf.extend(probe)
-                                total_size += len(probe)
-                                tail.extend(probe)
-                                if len(tail) > tail_keep:
-                                    del tail[:len(tail) - tail_keep]
-                                if self.prompt_pattern_bytes and self.prompt_pattern_bytes.search(bytes(tail)):
-                                    break
                         except Exception:
                             # 探测失败继续等待直到超时
                             pass
+                        probes += 1
+                        probe_after = self.timing.probe_interval(probes) * scale
                         # 重置静默计时，避免连续探测
                         last_data_ts = time.time()
-                    else:
-                        time.sleep(0.02)
+
+            append(pager.flush())
+            if pager.pages:
+                logger.info(f"{self.ip} 分页未关闭，已在流中自动翻页 {pager.pages} 次")
+            note = truncation_note(self.max_output_size) if over_limit(total_size, self.max_output_size) else ""
+            if sink is not None:
+                # 流式模式下空行归一化由 sink 完成
+                return note
+            if buf.spilled:
+                # 超过内存预算：输出留在临时分段中，由工作线程逐块拼接进输出文件（空行归一化同流式模式）
+                self._spill = buf
+                return note
 
             # 统一解码输出
-            text = buf.decode('utf-8', errors='ignore')
-            if total_size >= max_size:
-                text += "\n[输出截断，超过48MB限制]"
+            text = self.charset.decode(buf.getvalue()) + note
             # 归一化：移除空行，使 Telnet 与 SSH 输出一致（每行之间无空行）
             try:
                 lines = text.splitlines()
@@ -411,6 +397,108 @@ class TelnetConnection:
         except Exception as e:
             return f"读取错误: {str(e)}"
     
+    def execute_pipelined(self, commands: List[str], timeout: int = 300) -> Optional[List[Tuple[bool, str]]]:
+        """流水线执行一批只读命令，按提示符边界切分；有歧义返回 None 由调用方回退串行"""
+        if not self.connected or not self.tn or not self.prompt_bytes or not commands:
+            return None
+        try:
+            try:
+                self.tn.read_available()
+            except EOFError:
+                return None
+            payload = b"".join(cmd.strip().encode('ascii') + b'\n' for cmd in commands)
+            self.at_prompt = False
+            self.tn.write(payload)
+
+            state = PipelineReadState(self.prompt_bytes, len(commands))
+            raw = self._read_pipelined(state, timeout)
+            if raw is None:
+                self.at_prompt = self._resync_pipeline(state, timeout)
+                return None
+            self.at_prompt = True
+            text = self.charset.decode(raw).replace('\x00', '')
+            text = text.replace('\r\n', '\n').replace('\r', '\n')
+            prompt = self.prompt_bytes.decode('utf-8', errors='ignore')
+            segments = split_pipelined_output(commands, text, prompt)
+            if segments is None:
+                return None
+            results = []
+            for segment in segments:
+                # 与 _read_output 一致：移除空行
+                non_empty = [ln for ln in segment.split('\n') if ln.strip() != '']
+                results.append((True, "\n".join(non_empty) if non_empty else segment))
+            return results
+        except Exception as e:
+            logger.warning(f"Telnet流水线执行失败，回退串行: {e}")
+            return None
+
+    def _read_pipelined(self, state: PipelineReadState, timeout: int) -> Optional[bytes]:
+        """读取直到提示符出现 state.expected 次且以提示符结尾；流水线期间不注入探测回车"""
+        buf = bytearray()
+        matcher = StreamingPromptMatcher(self.prompt_pattern_bytes)
+        start = time.time()
+        last_data_ts = start
+        stall_window = max(self.timing.idle_window * 5, 3.0)
+        while time.time() - start < timeout:
+            try:
+                data = self.tn.read(0.1)
+            except EOFError:
+                return None
+            if not data:
+                if time.time() - last_data_ts >= stall_window:
+                    return None
+                continue
+            if self.throttle is not None:
+                self.throttle(len(data))
+            buf.extend(data)
+            last_data_ts = time.time()
+            if len(buf) >= self.memory_budget:
+                # 流水线只用于小输出命令，整批超过内存预算时回退串行
+                return None
+            state.feed(data)
+            if matcher.feed(data) and state.complete:
+                return bytes(buf)
+        return None
+
+    def _resync_pipeline(self, state: PipelineReadState, timeout: int) -> bool:
+        """流水线中途放弃后下发唯一标记行并丢弃回显直到标记之后出现提示符；未能对齐时将会话标记为断开"""
+        marker = resync_marker()
+        resync = PipelineResync(state, marker.encode('ascii'), StreamingPromptMatcher(self.prompt_pattern_bytes))
+        stall_window = max(self.timing.idle_window * 5, 3.0)
+        deadline = time.time() + timeout
+        last_data_ts = time.time()
+        try:
+            self.tn.write(marker.encode('ascii') + b'\n')
+            while time.time() < deadline:
+                data = self.tn.read(0.1)
+                if not data:
+                    if resync.settled and time.time() - last_data_ts >= stall_window:
+                        # 设备丢弃了部分预输入：标记已处理且其后静默，通道已对齐
+                        return True
+                    continue
+                if self.throttle is not None:
+                    self.throttle(len(data))
+                last_data_ts = time.time()
+                if resync.feed(data):
+                    return True
+        except EOFError:
+            pass
+        except Exception as e:
+            logger.debug(f"Telnet流水线通道对齐异常: {e}")
+        logger.warning("Telnet流水线放弃后通道未能对齐，按会话中断处理")
+        self.connected = False
+        return False
+
+    def take_spilled_output(self, index: int = 0) -> Optional[SpillBuffer]:
+        """取走超过内存预算、已溢出到临时分段的命令输出；未溢出时返回 None。调用方拼接完成后负责 close()"""
+        spill, self._spill = self._spill, None
+        return spill
+
+    def _discard_spill(self):
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
+
     def _is_command_complete(self) -> bool:
         """检查命令是否完成（保守判断，作为回退）"""
         tn = self.tn
@@ -420,7 +508,7 @@ class TelnetConnection:
             # 不主动注入字符，只尝试读取残留
             residual = b''
             try:
-                residual = tn.read_very_eager()
+                residual = tn.read_available()
             except Exception:
                 residual = b''
             if residual:
@@ -438,6 +526,29 @@ class TelnetConnection:
             # 出错时不影响主流程
             return False
     
+    def is_alive(self) -> bool:
+        """会话健康检查：套接字未关闭且未收到 EOF（窥探而不读取，已到达的回显留给下一条命令读取）"""
+        if not self.connected or not self.tn:
+            return False
+        try:
+            return self.tn.peek_alive()
+        except Exception:
+            return False
+
+    def keepalive(self) -> bool:
+        """空闲保活：发送空行并收取提示符回显"""
+        if not self.is_alive():
+            return False
+        try:
+            self.tn.write(b'\n')
+            end_time = time.time() + 5.0
+            while time.time() < end_time:
+                if self.tn.read(end_time - time.time()):
+                    return True
+            return False
+        except Exception:
+            return False
+
     def _cleanup_connection(self):
         """清理连接资源"""
         try:
@@ -451,6 +562,7 @@ class TelnetConnection:
     
     def close(self):
         """关闭Telnet连接"""
+        self._discard_spill()
         self._cleanup_connection()
         logger.info(f"Telnet连接已关闭: {self.ip}:{self.port}")
     
@@ -0,0 +1,363 @@
+import socket
+import logging
+import selectors
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Telnet 协议字节（RFC 854）
+IAC, DONT, DO, WONT, WILL, SB, SE = 255, 254, 253, 252, 251, 250, 240
+# 选项：ECHO(1)、SGA(3)、TTYPE(24)、NAWS(31)
+OPT_ECHO, OPT_SGA, OPT_TTYPE, OPT_NAWS = 1, 3, 24, 31
+TTYPE_IS, TTYPE_SEND = 0, 1
+
+IAC_BYTE = bytes([IAC])
+
+# 协议解析状态
+_DATA, _IAC, _OPT, _SUB, _SUB_IAC = range(5)
+
+
+class TelnetProtocolParser:
+    """
+    无 I/O 的 Telnet 协议解析器：剥离 IAC 命令与子协商，返回纯数据与需回写的协商应答。
+    - 数据段用 bytes.find 定位 IAC，整段拷贝，不逐字节处理
+    - 本端支持 SGA/NAWS/TTYPE，接受对端 ECHO/SGA，其余选项拒绝；已处于目标状态时不重复应答（避免协商环路）
+    - NAWS 通告终端宽高（默认 512 列、高度 0 即不限），配合设备侧按窗口大小关闭分页
+    """
+
+    LOCAL_OPTIONS = (OPT_SGA, OPT_NAWS, OPT_TTYPE)
+    REMOTE_OPTIONS = (OPT_ECHO, OPT_SGA)
+
+    def __init__(self, width: int = 512, height: int = 0, terminal_type: bytes = b'VT100'):
+        self.width = width
+        self.height = height
+        self.terminal_type = terminal_type
+
+        self._state = _DATA
+        self._cmd = 0
+        self._sb = bytearray()
+        self._local = set()       # 本端已启用的选项（已发送/确认 WILL）
+        self._remote = set()      # 对端已启用的选项（已发送/确认 DO）
+        self._offered = set()     # 本端主动提出、尚待确认的选项
+        self._refused = set()     # 已拒绝过的 (命令, 选项)，不重复应答
+
+    @property
+    def in_data(self) -> bool:
+        """是否处于纯数据状态（不在 IAC 序列或子协商中）"""
+        return self._state == _DATA
+
+    def initial_offers(self) -> bytes:
+        """连接建立后主动提出的选项：WILL NAWS"""
+        self._offered.add(OPT_NAWS)
+        return bytes([IAC, WILL, OPT_NAWS])
+
+    def feed(self, data) -> Tuple[bytes, bytes]:
+        """送入原始字节，返回 (数据字节, 协商应答字节)"""
+        if self._state == _DATA and data.find(IAC_BYTE) < 0:
+            return bytes(data), b''
+        out = bytearray()
+        replies = bytearray()
+        i, n = 0, len(data)
+        while i < n:
+            state = self._state
+            if state == _DATA:
+                j = data.find(IAC_BYTE, i)
+                if j < 0:
+                    out += data[i:]
+                    break
+                out += data[i:j]
+                i = j + 1
+                self._state = _IAC
+                continue
+            b = data[i]
+            i += 1
+            if state == _IAC:
+                if b == IAC:
+                    out.append(IAC)
+                    self._state = _DATA
+                elif b in (DO, DONT, WILL, WONT):
+                    self._cmd = b
+                    self._state = _OPT
+                elif b == SB:
+                    self._sb.clear()
+                    self._state = _SUB
+                else:
+                    # NOP/GA/AYT 等单字节命令直接忽略
+                    self._state = _DATA
+            elif state == _OPT:
+                replies += self._negotiate(self._cmd, b)
+                self._state = _DATA
+            elif state == _SUB:
+                if b == IAC:
+                    self._state = _SUB_IAC
+                else:
+                    self._sb.append(b)
+            else:  # _SUB_IAC
+                if b == SE:
+                    replies += self._subnegotiate(bytes(self._sb))
+                    self._state = _DATA
+                else:
+                    if b == IAC:
+                        self._sb.append(IAC)
+                    self._state = _SUB
+        return bytes(out), bytes(replies)
+
+    def naws(self) -> bytes:
+        """窗口大小子协商（值中的 0xFF 需转义）"""
+        payload = bytes([self.width >> 8 & 0xFF, self.width & 0xFF, self.height >> 8 & 0xFF, self.height & 0xFF])
+        return bytes([IAC, SB, OPT_NAWS]) + payload.replace(IAC_BYTE, IAC_BYTE * 2) + bytes([IAC, SE])
+
+    def _negotiate(self, cmd: int, opt: int) -> bytes:
+        if cmd == DO:
+            if opt in self.LOCAL_OPTIONS:
+                if opt in self._local:
+                    return b''
+                self._local.add(opt)
+                # 本端主动提出的选项收到 DO 即为确认，无需再回 WILL
+                reply = b'' if opt in self._offered else bytes([IAC, WILL, opt])
+                self._offered.discard(opt)
+                return reply + (self.naws() if opt == OPT_NAWS else b'')
+            return self._refuse(WONT, opt)
+        if cmd == DONT:
+            self._offered.discard(opt)
+            if opt in self._local:
+                self._local.discard(opt)
+                return bytes([IAC, WONT, opt])
+            return b''
+        if cmd == WILL:
+            if opt in self.REMOTE_OPTIONS:
+                if opt in self._remote:
+                    return b''
+                self._remote.add(opt)
+                return bytes([IAC, DO, opt])
+            return self._refuse(DONT, opt)
+        # WONT
+        if opt in self._remote:
+            self._remote.discard(opt)
+            return bytes([IAC, DONT, opt])
+        return b''
+
+    def _refuse(self, reply_cmd: int, opt: int) -> bytes:
+        if (reply_cmd, opt) in self._refused:
+            return b''
+        self._refused.add((reply_cmd, opt))
+        return bytes([IAC, reply_cmd, opt])
+
+    def _subnegotiate(self, payload: bytes) -> bytes:
+        if len(payload) >= 2 and payload[0] == OPT_TTYPE and payload[1] == TTYPE_SEND:
+            return bytes([IAC, SB, OPT_TTYPE, TTYPE_IS]) + self.terminal_type + bytes([IAC, SE])
+        return b''
+
+    @staticmethod
+    def escape(data: bytes) -> bytes:
+        """发送数据中的 0xFF 需转义为 IAC IAC"""
+        return data.replace(IAC_BYTE, IAC_BYTE * 2) if IAC_BYTE in data else data
+
+
+class TelnetSocket:
+    """
+    基于 selectors 的非阻塞 Telnet 连接（替代已在 Python 3.13 移除的 telnetlib）：
+    - recv_into 复用预分配缓冲区，单次读取尽量取空内核缓冲
+    - 协议解析交给 TelnetProtocolParser，协商应答随读随写
+    - 对端关闭时 read 抛出 EOFError（与 telnetlib 语义一致）
+    """
+
+    def __init__(self, host: str, port: int, timeout: float = 10, width: int = 512, height: int = 0,
+                 terminal_type: bytes = b'VT100', buffer_size: int = 65536):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.parser = TelnetProtocolParser(width, height, terminal_type)
+
+        self.sock: Optional[socket.socket] = None
+        self._selector: Optional[selectors.BaseSelector] = None
+        self._buf = bytearray(buffer_size)
+        self._view = memoryview(self._buf)
+        self._eof = False
+
+    def connect(self):
+        """建立 TCP 连接并发出初始选项"""
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        try:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except OSError:
+            pass
+        sock.setblocking(False)
+        self.sock = sock
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(sock, selectors.EVENT_READ)
+        self._send_raw(self.parser.initial_offers())
+
+    @property
+    def closed(self) -> bool:
+        return self.sock is None or self._eof
+
+    def fileno(self) -> int:
+        if self.sock is None:
+            raise EOFError("Telnet连接未建立")
+        return self.sock.fileno()
+
+    def wait_readable(self, timeout: float) -> bool:
+        """等待可读（数据到达即唤醒）；连接已关闭时立即返回 True，由 read 抛出 EOFError"""
+        if self.closed or self._selector is None:
+            return True
+        return bool(self._selector.select(max(0.0, timeout)))
+
+    def read(self, timeout: float = 0.0) -> bytes:
+        """
+        读取已到达的数据（最多等待 timeout 秒），返回剥离协议字节后的数据。
+        超时或只收到协商字节时返回 b''。
+        """
+        if self.closed:
+            raise EOFError("Telnet连接已关闭")
+        if timeout > 0 and not self.wait_readable(timeout):
+            return b''
+        chunks: List[bytes] = []
+        while True:
+            try:
+                n = self.sock.recv_into(self._view)
+            except (BlockingIOError, InterruptedError):
+                break
+            except ConnectionResetError:
+                n = 0
+            if n == 0:
+                self._eof = True
+                if chunks:
+                    break
+                raise EOFError("Telnet连接已关闭")
+            if self.parser.in_data and self._buf.find(IAC_BYTE, 0, n) < 0:
+                # 快速路径：本块不含协议字节，直接从缓冲区切出数据（仅一次拷贝）
+                data, replies = bytes(self._view[:n]), b''
+            else:
+                data, replies = self.parser.feed(bytes(self._view[:n]))
+            if replies:
+                self._send_raw(replies)
+            if data:
+                chunks.append(data)
+            if n < len(self._buf):
+                # 内核缓冲已取空
+                break
+        return b''.join(chunks) if len(chunks) != 1 else chunks[0]
+
+    def read_available(self) -> bytes:
+        """非阻塞读取当前已到达的全部数据"""
+        return self.read(0.0)
+
+    def peek_alive(self) -> bool:
+        """
+        探测连接是否仍然打开且不消费数据：MSG_PEEK 读取 1 字节，
+        对端关闭时返回空串，无数据时抛出 BlockingIOError（连接正常），已到达的数据留给后续 read
+        """
+        if self.closed:
+            return False
+        try:
+            if self.sock.recv(1, socket.MSG_PEEK) == b'':
+                self._eof = True
+                return False
+        except (BlockingIOError, InterruptedError):
+            pass
+        except OSError:
+            self._eof = True
+            return False
+        return True
+
+    def write(self, data: bytes):
+        """发送数据（转义 IAC）"""
+        self._send_raw(TelnetProtocolParser.escape(data))
+
+    def _send_raw(self, data: bytes):
+        if not data:
+            return
+        if self.sock is None:
+            raise EOFError("Telnet连接未建立")
+        view = memoryview(data)
+        while view:
+            try:
+                sent = self.sock.send(view)
+                view = view[sent:]
+            except (BlockingIOError, InterruptedError):
+                selectors_wait = selectors.DefaultSelector()
+                try:
+                    selectors_wait.register(self.sock, selectors.EVENT_WRITE)
+                    if not selectors_wait.select(self.timeout):
+                        raise socket.timeout("Telnet发送超时")
+                finally:
+                    selectors_wait.close()
+
+    def close(self):
+        sock, self.sock = self.sock, None
+        if self._selector is not None:
+            try:
+                self._selector.close()
+            except Exception:
+                pass
+            self._selector = None
+        if sock is not None:
+            try:
+                sock.close()
+            except Exception:
+                pass
+
+
+class TelnetLoginMachine:
+    """
+    Telnet 登录状态机：每次只扫描新到达的字节（加上一小段跨块携带），不累加整段回显。
+    状态：等待用户名提示 → 等待密码提示 → 校验登录结果 → 完成/失败。
+    兼容只要求密码、不出现用户名提示的设备（如 Cisco line password）。
+    """
+
+    WAIT_USERNAME, WAIT_PASSWORD, VERIFY, DONE, FAILED = 'username', 'password', 'verify', 'done', 'failed'
+
+    def __init__(self, username: str, password: str, login_patterns: List[bytes], password_patterns: List[bytes],
+                 prompt_patterns: List[bytes], error_patterns: List[bytes], banner_limit: int = 4096):
+        self.username = username
+        self.password = password
+        self.login_patterns = login_patterns
+        self.password_patterns = password_patterns
+        self.prompt_patterns = prompt_patterns
+        self.error_patterns = [p.lower() for p in error_patterns]
+        self.state = self.WAIT_USERNAME
+        self.banner = bytearray()
+        self.banner_limit = banner_limit
+
+        keep = max(len(p) for p in login_patterns + password_patterns + prompt_patterns + error_patterns)
+        self._keep = keep - 1
+        self._carry = b''
+
+    def feed(self, data: bytes) -> Optional[bytes]:
+        """送入新字节，返回需要发送的内容（用户名/密码），无需发送时返回 None"""
+        if not data or self.state in (self.DONE, self.FAILED):
+            return None
+        self.banner += data
+        if len(self.banner) > self.banner_limit:
+            del self.banner[:len(self.banner) - self.banner_limit]
+
+        window = self._carry + data
+        self._carry = window[-self._keep:] if self._keep > 0 else b''
+
+        if self.state == self.WAIT_USERNAME:
+            if any(p in window for p in self.login_patterns):
+                self._transition(self.WAIT_PASSWORD)
+                return self.username.encode('ascii') + b'\n'
+            if any(p in window for p in self.password_patterns):
+                # 仅密码认证（如 Cisco line password）
+                self._transition(self.VERIFY)
+                return self.password.encode('ascii') + b'\n'
+            return None
+        if self.state == self.WAIT_PASSWORD:
+            if any(p in window for p in self.password_patterns):
+                self._transition(self.VERIFY)
+                return self.password.encode('ascii') + b'\n'
+            return None
+        # VERIFY：错误信息判定（小写以覆盖），再判定提示符
+        lowered = window.lower()
+        if any(error in lowered for error in self.error_patterns):
+            self.state = self.FAILED
+        elif any(prompt in window for prompt in self.prompt_patterns):
+            self.state = self.DONE
+        return None
+
+    def _transition(self, state: str):
+        self.state = state
+        # 新状态只看发送之后到达的数据
+        self._carry = b''
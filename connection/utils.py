@@ -7,26 +7,41 @@ logger = logging.getLogger(__name__)
 
 class ConnectionUtils:
     """连接工具类"""
+
+    # 登录后的终端预处理命令：关闭分页/扩展宽度（覆盖 Cisco/华为/H3C/Juniper 常见写法）
+    TERMINAL_PREPARE_COMMANDS = [
+        "terminal length 0",
+        "screen-length 0",
+        "screen-length disable",
+        "terminal width 512",
+        "set cli screen-length 0",
+    ]
+
+    # 未能探测到具体提示符时使用的通用提示符（字节级）
+    GENERIC_PROMPT_BYTES = rb'[\r\n][\w\-\.:/@]+[#>$%]\s*$'
+    
+    # 通用大数据量命令（厂商画像在此基础上补充各自的命令）
+    LARGE_OUTPUT_COMMANDS = [
+        'display current-configuration',
+        'show running-config', 
+        'show configuration',
+        'display diagnostic-information',
+        'show tech-support',
+        'display interface',
+        'show interface',
+        'display ip interface',
+        'show ip interface',
+        'display version',
+        'show version'
+    ]
     
     @staticmethod
-    def is_large_output_command(command: str) -> bool:
-        """判断是否为大数据量命令"""
-        large_patterns = [
-            'display current-configuration',
-            'show running-config', 
-            'show configuration',
-            'display diagnostic-information',
-            'show tech-support',
-            'display interface',
-            'show interface',
-            'display ip interface',
-            'show ip interface',
-            'display version',
-            'show version'
-        ]
-        
+    def is_large_output_command(command: str, vendor_profile=None) -> bool:
+        """判断是否为大数据量命令；传入厂商画像时同时匹配该厂商的大输出命令"""
+        if vendor_profile is not None and vendor_profile.is_large_output_command(command):
+            return True
         cmd_lower = command.lower()
-        return any(pattern in cmd_lower for pattern in large_patterns)
+        return any(pattern in cmd_lower for pattern in ConnectionUtils.LARGE_OUTPUT_COMMANDS)
     
     @staticmethod
     def has_command_prompt(output: str) -> bool:
@@ -0,0 +1,177 @@
+import re
+import logging
+from typing import Dict, List, Optional, Callable, Tuple, Pattern
+
+from .utils import ConnectionUtils
+
+logger = logging.getLogger(__name__)
+
+
+class VendorProfile:
+    """
+    厂商方言画像：
+    - pager_commands：该厂商关闭分页/加宽的命令（只下发这些，不再逐条试错）
+    - prompt_grammar：提示符文法（字节正则），提示符字面量探测失败时替代通用提示符
+    - large_output_commands：大数据量命令前缀（决定超时与读取策略）
+    - output_kb_per_sec：该类设备 CLI 回显的典型吞吐（KB/s，千字节每秒；区别于链路测速的 kbit/s），用于推算大输出命令的读取时限
+    - fingerprints：banner/提示符/版本信息中的特征正则
+    """
+
+    def __init__(self, name: str, pager_commands: List[str], prompt_grammar: bytes,
+                 large_output_commands: List[str], output_kb_per_sec: int,
+                 fingerprints: List[bytes], version_command: str = ''):
+        self.name = name
+        self.pager_commands = list(pager_commands)
+        self.prompt_grammar = prompt_grammar
+        self.large_output_commands = [c.lower() for c in large_output_commands]
+        self.output_kb_per_sec = output_kb_per_sec
+        self.fingerprints = [re.compile(fp, re.IGNORECASE) for fp in fingerprints]
+        self.version_command = version_command
+        self._prompt_re = re.compile(prompt_grammar)
+
+    def prompt_pattern(self) -> Pattern[bytes]:
+        return self._prompt_re
+
+    def matches_prompt(self, prompt: bytes) -> bool:
+        """提示符字面量是否符合该厂商的提示符文法"""
+        return bool(prompt) and self._prompt_re.search(b'\n' + prompt.strip()) is not None
+
+    def fingerprint_score(self, text: bytes) -> int:
+        return sum(1 for fp in self.fingerprints if fp.search(text or b''))
+
+    def is_large_output_command(self, command: str) -> bool:
+        cmd_lower = (command or '').strip().lower()
+        return any(cmd_lower.startswith(p) for p in self.large_output_commands)
+
+
+VRP_PROMPT = rb'[\r\n][<\[][\w\-\.:/@~]+[>\]]\s*$'
+
+VENDOR_PROFILES: Dict[str, VendorProfile] = {
+    'huawei': VendorProfile(
+        'huawei',
+        pager_commands=['screen-length 0 temporary', 'screen-width 512'],
+        prompt_grammar=VRP_PROMPT,
+        large_output_commands=[
+            'display current-configuration', 'display diagnostic-information', 'display interface',
+            'display ip interface', 'display version', 'display ip routing-table', 'display logbuffer',
+            'display elabel', 'display saved-configuration',
+        ],
+        output_kb_per_sec=300,
+        fingerprints=[rb'huawei', rb'\bVRP\b', rb'Versatile Routing Platform'],
+        version_command='display version',
+    ),
+    'h3c': VendorProfile(
+        'h3c',
+        pager_commands=['screen-length disable'],
+        prompt_grammar=VRP_PROMPT,
+        large_output_commands=[
+            'display current-configuration', 'display diagnostic-information', 'display interface',
+            'display ip interface', 'display version', 'display ip routing-table', 'display logbuffer',
+            'display saved-configuration',
+        ],
+        output_kb_per_sec=300,
+        fingerprints=[rb'\bH3C\b', rb'Comware'],
+        version_command='display version',
+    ),
+    'cisco': VendorProfile(
+        'cisco',
+        pager_commands=['terminal length 0', 'terminal width 512'],
+        prompt_grammar=rb'[\r\n][\w\-\.:/@]+(\([\w\-\.:/]+\))?[#>]\s*$',
+        large_output_commands=[
+            'show running-config', 'show startup-config', 'show tech-support', 'show interface',
+            'show ip interface', 'show version', 'show ip route', 'show logging', 'show inventory',
+        ],
+        output_kb_per_sec=500,
+        fingerprints=[rb'cisco', rb'\bIOS(-X[ER])?\b', rb'NX-OS', rb'Nexus'],
+        version_command='show version',
+    ),
+    'juniper': VendorProfile(
+        'juniper',
+        pager_commands=['set cli screen-length 0', 'set cli screen-width 0'],
+        prompt_grammar=rb'[\r\n]([\w\-\.]+@)[\w\-\.:]+[>#%]\s*$',
+        large_output_commands=[
+            'show configuration', 'show interfaces', 'show route', 'show log', 'show version',
+            'request support information', 'show chassis hardware',
+        ],
+        output_kb_per_sec=1000,
+        fingerprints=[rb'junos', rb'juniper'],
+        version_command='show version',
+    ),
+    'linux': VendorProfile(
+        'linux',
+        pager_commands=[],
+        prompt_grammar=rb'[\r\n][\w\-\.]+@[\w\-\.]+:[^\r\n]*[$#]\s*$',
+        large_output_commands=['show runningconfiguration', 'show interfaces', 'ip route', 'cat ', 'journalctl'],
+        output_kb_per_sec=2000,
+        fingerprints=[rb'\blinux\b', rb'debian', rb'ubuntu', rb'sonic', rb'cumulus'],
+        version_command='uname -a',
+    ),
+}
+
+# 无法识别厂商时的通用画像：逐条尝试全部预处理命令，通用提示符文法
+GENERIC_PROFILE = VendorProfile(
+    'generic',
+    pager_commands=ConnectionUtils.TERMINAL_PREPARE_COMMANDS,
+    prompt_grammar=ConnectionUtils.GENERIC_PROMPT_BYTES,
+    large_output_commands=ConnectionUtils.LARGE_OUTPUT_COMMANDS,
+    output_kb_per_sec=300,
+    fingerprints=[],
+)
+
+
+def get_vendor_profile(name: Optional[str]) -> VendorProfile:
+    """按名称取厂商画像，未知名称返回通用画像"""
+    return VENDOR_PROFILES.get((name or '').lower(), GENERIC_PROFILE)
+
+
+def _best_by_fingerprint(text: bytes, candidates: List[VendorProfile]) -> Optional[VendorProfile]:
+    scored = [(p.fingerprint_score(text), p) for p in candidates]
+    scored = [item for item in scored if item[0] > 0]
+    if not scored:
+        return None
+    scored.sort(key=lambda item: item[0], reverse=True)
+    if len(scored) > 1 and scored[0][0] == scored[1][0]:
+        return None
+    return scored[0][1]
+
+
+def detect_vendor(banner: bytes, prompt: bytes,
+                  run_command: Optional[Callable[[str], Tuple[bool, str]]] = None) -> VendorProfile:
+    """
+    厂商识别：
+    1. banner + 提示符中的特征字（如 "Huawei Versatile Routing Platform"、"JUNOS"）
+    2. 按提示符文法筛选候选（<R1> → 华为/H3C，user@host> → Juniper，R1# → Cisco 类）
+    3. 候选仍不唯一且共用同一版本命令时，执行一次版本命令（如 display version）并按特征字判定
+    均无法判定时返回通用画像。
+    """
+    profiles = list(VENDOR_PROFILES.values())
+    found = _best_by_fingerprint((banner or b'') + b'\n' + (prompt or b''), profiles)
+    if found:
+        return found
+
+    candidates = [p for p in profiles if p.matches_prompt(prompt)]
+    if len(candidates) == 1:
+        return candidates[0]
+    version_commands = {p.version_command for p in candidates if p.version_command}
+    if run_command and len(version_commands) == 1:
+        command = version_commands.pop()
+        try:
+            ok, output = run_command(command)
+        except Exception as e:
+            logger.debug(f"版本命令 {command} 执行失败: {e}")
+            ok, output = False, ''
+        if ok:
+            found = _best_by_fingerprint(output.encode('utf-8', 'ignore'), candidates)
+            if found:
+                return found
+    return GENERIC_PROFILE
+
+
+def resolve_vendor(cached_name: Optional[str], banner: bytes, prompt: bytes,
+                   run_command: Optional[Callable[[str], Tuple[bool, str]]] = None) -> VendorProfile:
+    """设备画像中已记录厂商时直接使用，否则执行识别"""
+    if cached_name in VENDOR_PROFILES:
+        return VENDOR_PROFILES[cached_name]
+    profile = detect_vendor(banner, prompt, run_command)
+    logger.info(f"厂商识别结果: {profile.name}")
+    return profile
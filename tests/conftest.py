@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 在仓库根目录之外执行 pytest 时也能导入 connection / compare
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,93 @@
+"""采集容器：CaptureEncoder → CaptureReader 往返，以及尾部缺失/截断时的顺序扫描"""
+import hashlib
+
+import pytest
+
+from connection.capture_store import CaptureEncoder, CaptureReader, is_capture_file
+
+OUTPUTS = [
+    ('display version', b"display version\nHuawei VRP V800R021\n<R1>\n\n"),
+    ('display interface brief', b"display interface brief\n" + b"GE0/0/1 up up 0.01% 0.02% 0 0\n" * 500 + b"<R1>\n\n"),
+    ('display version', b"display version\nHuawei VRP V800R021\n<R1>\n\n"),
+]
+
+
+def encode(path, outputs, finish=True, codec='gzip', chunk_size=4096):
+    encoder = CaptureEncoder(codec, 0, chunk_size=chunk_size)
+    data = b''
+    for command, output in outputs:
+        data += encoder.begin(command)
+        for i in range(0, len(output), 1000):
+            data += encoder.feed(output[i:i + 1000])
+        data += encoder.end(True)
+    if finish:
+        data += encoder.finish()
+    with open(path, 'wb') as f:
+        f.write(data)
+    return encoder
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / 'run.cap')
+    encode(path, OUTPUTS)
+    assert is_capture_file(path)
+
+    reader = CaptureReader(path)
+    assert [c['command'] for c in reader.commands] == [c for c, _ in OUTPUTS]
+    for i, (_, output) in enumerate(OUTPUTS):
+        assert reader.read_bytes(i) == output
+        assert reader.commands[i]['bytes'] == len(output)
+        assert reader.commands[i]['sha256'] == hashlib.sha256(output).hexdigest()
+    # 大输出按 chunk_size 分成多个压缩块
+    assert len(reader.commands[1]['chunks']) > 1
+    assert reader.find('display version') == 0
+    assert reader.read('display interface brief') == OUTPUTS[1][1].decode()
+
+
+def test_export_text_matches_plain_layout(tmp_path):
+    path = str(tmp_path / 'run.cap')
+    encode(path, OUTPUTS)
+    out = CaptureReader(path).export_text(str(tmp_path / 'run.txt'))
+    with open(out, 'rb') as f:
+        assert f.read() == b''.join(output for _, output in OUTPUTS)
+
+
+@pytest.mark.parametrize('cut', [1, 8, 16, 40])
+def test_truncated_trailer_falls_back_to_scan(tmp_path, cut):
+    path = str(tmp_path / 'run.cap')
+    encode(path, OUTPUTS)
+    with open(path, 'r+b') as f:
+        f.truncate(f.seek(0, 2) - cut)
+
+    reader = CaptureReader(path)
+    assert [c['command'] for c in reader.commands] == [c for c, _ in OUTPUTS]
+    for i, (_, output) in enumerate(OUTPUTS):
+        assert reader.read_bytes(i) == output
+
+
+def test_interrupted_capture_keeps_complete_records(tmp_path):
+    path = str(tmp_path / 'run.cap')
+    encode(path, OUTPUTS[:2], finish=False)
+    with open(path, 'r+b') as f:
+        # 截断在最后一条命令的某个数据记录中间
+        f.truncate(f.seek(0, 2) - 200)
+
+    reader = CaptureReader(path)
+    assert reader.read_bytes(0) == OUTPUTS[0][1]
+    partial = reader.read_bytes(1)
+    assert OUTPUTS[1][1].startswith(partial)
+    assert len(partial) < len(OUTPUTS[1][1])
+
+
+def test_recover_continues_after_offset(tmp_path):
+    path = str(tmp_path / 'run.cap')
+    first = encode(path, OUTPUTS[:1], finish=False)
+    offset = first.offset
+
+    encoder = CaptureEncoder.recover(path, offset)
+    tail = encoder.begin(OUTPUTS[1][0]) + encoder.feed(OUTPUTS[1][1]) + encoder.end(True) + encoder.finish()
+    with open(path, 'ab') as f:
+        f.write(tail)
+
+    reader = CaptureReader(path)
+    assert [reader.read_bytes(i) for i in range(len(reader.commands))] == [OUTPUTS[0][1], OUTPUTS[1][1]]
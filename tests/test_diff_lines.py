@@ -0,0 +1,77 @@
+"""diff_lines：操作序列连续覆盖两侧且能由变更前重建变更后"""
+import random
+
+import pytest
+
+from compare.histogram import FALLBACK_LIMIT, diff_lines
+
+
+def apply_opcodes(a, b, opcodes):
+    """按操作序列由 a 重建 b，同时检查序列首尾相接、equal 段确实相等"""
+    out = []
+    i = j = 0
+    for tag, i1, i2, j1, j2 in opcodes:
+        assert (i1, j1) == (i, j)
+        if tag == 'equal':
+            assert a[i1:i2] == b[j1:j2]
+            out.extend(a[i1:i2])
+        else:
+            assert tag in ('replace', 'delete', 'insert')
+            assert (tag == 'insert') == (i1 == i2) and (tag == 'delete') == (j1 == j2)
+            out.extend(b[j1:j2])
+        i, j = i2, j2
+    assert (i, j) == (len(a), len(b))
+    return out
+
+
+def lines(text):
+    return [line.encode() for line in text.split()]
+
+
+@pytest.mark.parametrize('a, b', [
+    ([], []),
+    ([], lines('x y')),
+    (lines('x y'), []),
+    (lines('a b c'), lines('a b c')),
+    (lines('a b c d'), lines('a x c d')),
+    (lines('a b c d e'), lines('e d c b a')),
+    (lines('# # a # # b #'), lines('# a # # # b # #')),
+])
+def test_reconstructs_after(a, b):
+    assert apply_opcodes(a, b, diff_lines(a, b)) == b
+
+
+def test_identical_is_single_equal():
+    a = lines('a b c')
+    assert diff_lines(a, list(a)) == [('equal', 0, 3, 0, 3)]
+
+
+def test_insertion_keeps_unique_lines_aligned():
+    a = [f'interface GE0/0/{i}'.encode() for i in range(50)]
+    b = a[:10] + [b'interface Vlanif100'] + a[10:]
+    assert diff_lines(a, b) == [('equal', 0, 10, 0, 10), ('insert', 10, 10, 10, 11), ('equal', 10, 50, 11, 51)]
+
+
+def test_random_edits_reconstruct():
+    rng = random.Random(23)
+    vocab = [f'line {i}'.encode() for i in range(40)] + [b'#', b'', b' quit']
+    for _ in range(200):
+        a = [rng.choice(vocab) for _ in range(rng.randint(0, 80))]
+        b = list(a)
+        for _ in range(rng.randint(0, 10)):
+            pos = rng.randint(0, len(b))
+            op = rng.random()
+            if op < 0.4:
+                b.insert(pos, rng.choice(vocab))
+            elif b and op < 0.8:
+                del b[min(pos, len(b) - 1)]
+            elif b:
+                b[min(pos, len(b) - 1)] = rng.choice(vocab)
+        assert apply_opcodes(a, b, diff_lines(a, b)) == b
+
+
+def test_large_region_without_common_lines_is_replaced():
+    half = FALLBACK_LIMIT // 2 + 1
+    a = [f'a{i}'.encode() for i in range(half)]
+    b = [f'b{i}'.encode() for i in range(half)]
+    assert diff_lines(a, b) == [('replace', 0, half, 0, half)]
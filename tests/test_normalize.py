@@ -0,0 +1,112 @@
+"""易变字段规范化：内置规则（按厂商）、表头之后的列掩码、triggers/within 跳过与 masked 计数"""
+import pytest
+
+from compare.normalize import BUILTIN_RULES, MaskRule, RuleBook, RuleSet
+
+
+def normalize(vendor, command, text, stats=None, chunk_lines=None):
+    data = text.encode('utf-8')
+    if chunk_lines:
+        lines = data.splitlines(keepends=True)
+        chunks = [b''.join(lines[i:i + chunk_lines]) for i in range(0, len(lines), chunk_lines)]
+    else:
+        chunks = [data]
+    ruleset = RuleBook.instance().ruleset(vendor, command)
+    return [line.decode('utf-8') for line in ruleset.normalize(chunks, stats)]
+
+
+def rule(name):
+    return next(r for r in BUILTIN_RULES if r.name == name)
+
+
+@pytest.mark.parametrize('vendor, command, text, expected', [
+    ('generic', 'display clock', "2024-05-01 10:20:30+08:00",
+     ["<time>"]),
+    ('generic', 'display logbuffer', "May  1 2024 10:20:30.123 R1 %%01SHELL/5/CMDRECORD",
+     ["<time> R1 %%01SHELL/5/CMDRECORD"]),
+    ('huawei', 'display version', "HUAWEI NE40E uptime is 12 days, 3 hours, 5 minutes",
+     ["HUAWEI NE40E uptime is <uptime>"]),
+    ('huawei', 'display cpu-usage', "CPU Usage            : 12% Max: 87%",
+     ["CPU Usage            : <n>% Max: <n>%"]),
+    ('huawei', 'display arp', "10.0.0.2        00e0-fc12-3456  20        D-0         GE0/0/1",
+     ["10.0.0.2        00e0-fc12-3456  <n> D-0         GE0/0/1"]),
+    ('h3c', 'display bgp peer ipv4',
+     "  Peer                    AS  MsgRcvd  MsgSent OutQ PrefRcv Up/Down  State\n"
+     "  10.0.0.2              65001     1200     1300    0      10 12h03m   Established",
+     ["  Peer                    AS  MsgRcvd  MsgSent OutQ PrefRcv Up/Down  State",
+      "  10.0.0.2              65001 <*> <*> <*> 10 <*> Established"]),
+    ('cisco', 'show ip arp',
+     "Protocol  Address          Age (min)  Hardware Addr   Type   Interface\n"
+     "Internet  10.0.0.2                12   0050.56ab.0001  ARPA   Gi0/1",
+     ["Protocol  Address          Age (min)  Hardware Addr   Type   Interface",
+      "Internet  10.0.0.2 <*> 0050.56ab.0001  ARPA   Gi0/1"]),
+    ('cisco', 'show interfaces GigabitEthernet0/1',
+     "  Last input 00:00:01, output 00:00:02, output hang never\n"
+     "     5 minute input rate 2000 bits/sec, 3 packets/sec",
+     ["  Last input <time>, output <time>, output hang never",
+      "     <n> minute input rate <n> bits/sec, <n> packets/sec"]),
+    ('linux', 'uptime', " 10:20:30 up 12 days,  3:04,  1 user,  load average: 0.01, 0.05, 0.00",
+     ["<uptime>"]),
+])
+def test_builtin_rule_per_vendor(vendor, command, text, expected):
+    assert normalize(vendor, command, text) == expected
+
+
+def test_vendor_rules_do_not_cross_vendors():
+    text = "10.0.0.2        00e0-fc12-3456  20        D-0         GE0/0/1"
+    assert normalize('cisco', 'display arp', text) == [text]
+    # 厂商未识别时各厂商规则都参与
+    assert normalize('generic', 'display arp', text) == ["10.0.0.2        00e0-fc12-3456  <n> D-0         GE0/0/1"]
+
+
+def test_columns_masked_only_after_header():
+    text = ("GE0/0/9 up up 0.01% 0.02% 0 0\n"
+            "Interface                   PHY      Protocol  InUti OutUti   inErrors  outErrors\n"
+            "GE0/0/1                     up       up        0.01%  0.02%          0          0\n"
+            "GE0/0/2                     down     down         0%     0%\n")
+    assert normalize('huawei', 'display interface brief', text, chunk_lines=1) == [
+        "GE0/0/9 up up 0.01% 0.02% 0 0",
+        "Interface                   PHY      Protocol  InUti OutUti   inErrors  outErrors",
+        "GE0/0/1                     up       up <*> <*> <*> <*>",
+        # 列数不足的行不掩码
+        "GE0/0/2                     down     down         0%     0%",
+    ]
+
+
+def test_column_rule_header_in_earlier_chunk():
+    header = "Neighbor ID     Pri   State           Dead Time   Address         Interface\n"
+    row = "10.0.0.2          1   FULL/DR         00:00:35    10.1.1.2        Gi0/1\n"
+    assert normalize('cisco', 'show ip ospf neighbor', header + row, chunk_lines=1)[1] == \
+        "10.0.0.2          1   FULL/DR <*> 10.1.1.2        Gi0/1"
+
+
+def test_triggers_skip_chunk():
+    uptime = rule('uptime')
+    chunk = b"System is up for a while\n"
+    result, count = uptime.apply(chunk)
+    assert (result, count) == (chunk, 0)
+    assert uptime.apply(b"Switch UPTIME is 3 weeks\n") == (b"Switch UPTIME is <uptime>\n", 1)
+
+
+def test_within_limits_lines():
+    memory = rule('memory-usage')
+    chunk = b"Slot 1\nMemory Using Percentage Is: 35%\nSlot 2\n"
+    assert memory.apply(chunk) == (b"Slot 1\nMemory Using Percentage Is: <n>%\nSlot 2\n", 1)
+    assert memory.apply(b"Slot 1\nSlot 2\n") == (b"Slot 1\nSlot 2\n", 0)
+
+
+def test_masked_counter_accumulates():
+    stats = {}
+    normalize('huawei', 'display cpu-usage', "CPU Usage : 12% Max: 87%\n", stats)
+    assert stats['masked'] == 2
+    normalize('cisco', 'show ip arp', "Protocol  Address  Age (min)  Hardware Addr  Type  Interface\n"
+                                      "Internet  10.0.0.2  12  0050.56ab.0001  ARPA  Gi0/1\n", stats)
+    assert stats['masked'] == 3
+
+
+def test_custom_rule_requires_pattern_or_columns():
+    with pytest.raises(ValueError):
+        MaskRule('broken', columns=(1,))
+    custom = RuleSet([MaskRule.from_dict({'name': 'session-id', 'pattern': r'session \d+', 'replace': 'session <id>',
+                                          'triggers': ['session']})])
+    assert list(custom.normalize([b"session 42 open\nidle\n"])) == [b"session <id> open", b"idle"]
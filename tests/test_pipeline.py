@@ -0,0 +1,83 @@
+"""流水线回显：提示符计数、按提示符边界切分与放弃后的通道对齐判定"""
+import re
+
+from connection.pipeline import (PipelineReadState, PipelineResync, is_read_only_command, resync_marker,
+                                 split_pipelined_output)
+from connection.prompt_matcher import StreamingPromptMatcher
+
+PROMPT = '<R1>'
+PROMPT_RE = re.compile(rb'(?:^|\n)<R1>\s*$')
+
+
+def test_read_only_commands():
+    assert is_read_only_command('display version')
+    assert is_read_only_command('  SH ip int br')
+    assert not is_read_only_command('system-view')
+    assert not is_read_only_command('reset counters interface')
+
+
+def test_prompt_count_across_chunks():
+    state = PipelineReadState(b'<R1>', 2)
+    assert state.feed(b'display a\nout\n<R') == 0
+    assert state.feed(b'1>display b\nout\n<R1') == 1
+    assert not state.complete
+    assert state.feed(b'>') == 2
+    assert state.complete
+
+
+def test_split_segments():
+    commands = ['display a', 'display b']
+    text = "display a\nA1\n<R1>display b\nB1\nB2\n<R1>"
+    assert split_pipelined_output(commands, text, PROMPT) == ["display a\nA1\n<R1>", "display b\nB1\nB2\n<R1>"]
+
+
+def test_prompt_echoed_inside_output_is_ambiguous():
+    # 输出中含行首提示符样式文本（如 display history-command / 日志回显），提示符数量多于命令数
+    commands = ['display a', 'display b']
+    text = "display a\n<R1>display version\n<R1>display b\nB1\n<R1>"
+    assert split_pipelined_output(commands, text, PROMPT) is None
+
+
+def test_interleaved_echo_is_ambiguous():
+    # 提示符数量一致，但预输入回显与输出交错，第二段首行不是对应命令的回显
+    commands = ['display a', 'display b']
+    text = "display a\ndisplay b\nA1\n<R1>B1\n<R1>"
+    assert split_pipelined_output(commands, text, PROMPT) is None
+
+
+def test_fewer_prompts_than_commands():
+    # 设备丢弃了预输入：只执行了第一条
+    commands = ['display a', 'display b', 'display c']
+    text = "display a\nA1\n<R1>"
+    assert split_pipelined_output(commands, text, PROMPT) is None
+
+
+def test_resync_waits_for_queued_commands_and_marker():
+    state = PipelineReadState(b'<R1>', 3)
+    state.feed(b'display a\nA1\n<R1>')
+    marker = resync_marker()
+    assert marker != resync_marker()
+    resync = PipelineResync(state, marker.encode(), StreamingPromptMatcher(PROMPT_RE))
+    chunks = [b'display b\nB1\n<R1>', b'display c\nC1\n<R1>', marker.encode()[:5],
+              marker.encode()[5:] + b'\nError: Unrecognized command\n<R1>']
+    assert [resync.feed(chunk) for chunk in chunks] == [False, False, False, True]
+
+
+def test_resync_marker_echoed_early_waits_for_batch():
+    # 类 Linux 终端立即回显预输入：标记先于剩余命令的输出出现，仍需等到整批提示符计数
+    state = PipelineReadState(b'<R1>', 2)
+    marker = b'icc-sync-test'
+    resync = PipelineResync(state, marker, StreamingPromptMatcher(PROMPT_RE))
+    assert not resync.feed(b'display a\n' + marker + b'\nA1\n<R1>')
+    assert resync.settled
+    assert resync.feed(b'display b\nB1\n<R1>') is False
+    assert resync.feed(b'icc-sync-test: command not found\n<R1>')
+
+
+def test_resync_after_dropped_type_ahead_is_settled_only():
+    state = PipelineReadState(b'<R1>', 3)
+    state.feed(b'display a\nA1\n<R1>')
+    resync = PipelineResync(state, b'icc-sync-test', StreamingPromptMatcher(PROMPT_RE))
+    # 剩余命令被丢弃：计数达不到，由调用方在静默后按 settled 判定对齐
+    assert not resync.feed(b'icc-sync-test\nError: Unrecognized command\n<R1>')
+    assert resync.settled
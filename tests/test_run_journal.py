@@ -0,0 +1,110 @@
+"""RunJournal 检查点/续采偏移，以及 BufferManager 回滚到检查点"""
+import os
+
+from connection.buffer_manager import BufferManager
+from connection.run_journal import RunJournal
+
+KEY = RunJournal.device_key('变更前', 'ssh', '10.0.0.1', 22)
+DIGEST = RunJournal.commands_digest(['display version', 'display interface brief'])
+
+
+def write_output(path, size):
+    with open(path, 'wb') as f:
+        f.write(b'x' * size)
+
+
+def test_pending_returns_last_checkpoint(tmp_path):
+    out = str(tmp_path / 'out.txt')
+    write_output(out, 300)
+    journal = RunJournal(str(tmp_path / RunJournal.FILENAME))
+    journal.begin(KEY, out, DIGEST, 2)
+    journal.checkpoint(KEY, 1, 120, 1, 0)
+    journal.checkpoint(KEY, 2, 250, 1, 1)
+
+    state = journal.pending(KEY, DIGEST)
+    assert (state['file'], state['next_index'], state['offset']) == (out, 2, 250)
+    assert (state['completed'], state['failed'], state['total']) == (1, 1, 2)
+
+
+def test_resume_from_journal_file(tmp_path):
+    out = str(tmp_path / 'out.txt')
+    write_output(out, 200)
+    path = str(tmp_path / RunJournal.FILENAME)
+    journal = RunJournal(path)
+    journal.begin(KEY, out, DIGEST, 2)
+    journal.checkpoint(KEY, 1, 150, 1, 0)
+
+    # 新进程重新加载日志
+    state = RunJournal(path).pending(KEY, DIGEST)
+    assert (state['next_index'], state['offset']) == (1, 150)
+
+
+def test_finished_or_changed_runs_are_not_resumed(tmp_path):
+    out = str(tmp_path / 'out.txt')
+    write_output(out, 100)
+    journal = RunJournal(str(tmp_path / RunJournal.FILENAME))
+    journal.begin(KEY, out, DIGEST, 2)
+    journal.checkpoint(KEY, 1, 80, 1, 0)
+    assert journal.pending(KEY, RunJournal.commands_digest(['display version'])) is None
+
+    journal.finish(KEY)
+    assert journal.pending(KEY, DIGEST) is None
+
+
+def test_output_shorter_than_checkpoint_is_not_resumed(tmp_path):
+    out = str(tmp_path / 'out.txt')
+    write_output(out, 50)
+    journal = RunJournal(str(tmp_path / RunJournal.FILENAME))
+    journal.begin(KEY, out, DIGEST, 2)
+    journal.checkpoint(KEY, 1, 80, 1, 0)
+    assert journal.pending(KEY, DIGEST) is None
+
+
+def test_torn_last_line_is_ignored(tmp_path):
+    out = str(tmp_path / 'out.txt')
+    write_output(out, 100)
+    path = str(tmp_path / RunJournal.FILENAME)
+    journal = RunJournal(path)
+    journal.begin(KEY, out, DIGEST, 2)
+    journal.checkpoint(KEY, 1, 60, 1, 0)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"event": "checkpoint", "device": "')
+
+    reloaded = RunJournal(path)
+    assert reloaded.pending(KEY, DIGEST)['offset'] == 60
+    # 后续记录从新行开始，不与半行拼接
+    reloaded.checkpoint(KEY, 2, 90, 2, 0)
+    assert RunJournal(path).pending(KEY, DIGEST)['offset'] == 90
+
+
+def test_rollback_truncates_to_checkpoint(tmp_path):
+    buffers = BufferManager(str(tmp_path), '变更前', '10.0.0.1')
+    journal = RunJournal(str(tmp_path / RunJournal.FILENAME))
+    journal.begin(KEY, buffers.filepath, DIGEST, 2)
+
+    buffers.add_data("display version\nVRP V8\n\n")
+    offset = buffers.checkpoint(lambda durable: journal.checkpoint(KEY, 1, durable, 1, 0))
+    buffers.add_data("display interface brief\npartial")
+    buffers.flush_buffer()
+    buffers.rollback()
+    buffers.close()
+
+    assert os.path.getsize(buffers.filepath) == offset
+    state = journal.pending(KEY, DIGEST)
+    assert (state['next_index'], state['offset']) == (1, offset)
+
+
+def test_resume_from_continues_after_checkpoint(tmp_path):
+    first = BufferManager(str(tmp_path), '变更前', '10.0.0.1')
+    first.add_data("cmd1\nout1\n\n")
+    offset = first.checkpoint()
+    first.add_data("cmd2\npart")
+    first.close()
+
+    second = BufferManager(str(tmp_path), '变更前', '10.0.0.1')
+    second.resume_from(first.filepath, offset)
+    second.add_data("cmd2\nout2\n\n")
+    second.close()
+
+    with open(first.filepath, 'rb') as f:
+        assert f.read().replace(os.linesep.encode(), b'\n') == b"cmd1\nout1\n\ncmd2\nout2\n\n"
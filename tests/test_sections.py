@@ -0,0 +1,53 @@
+"""SectionIndex：纯文本采集文件的命令块边界判定"""
+from compare.sections import LineRange, SectionIndex
+
+
+def write(tmp_path, data, name='before.txt'):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def bodies(index):
+    return [(ref.command, ref.occurrence, b'\n'.join(index.body(ref).lines())) for ref in index]
+
+
+def test_boundaries_by_prompt(tmp_path):
+    path = write(tmp_path, b"display version\nVRP V8\n<R1>\n\n"
+                           b"display current-configuration\nsysname R1\n\n#\nreturn\n<R1>\n\n")
+    index = SectionIndex(path)
+    assert index.prompt == b'<R1>'
+    # 回显中的空行不是块边界：空行之前不是提示符
+    assert bodies(index) == [
+        ('display version', 0, b"VRP V8\n<R1>"),
+        ('display current-configuration', 0, b"sysname R1\n\n#\nreturn\n<R1>"),
+    ]
+
+
+def test_boundaries_by_known_commands(tmp_path):
+    # 回显不以提示符结尾（如读取超时），按命令列表判定边界
+    path = write(tmp_path, b"display clock\n10:00:00\n\ndisplay arp\nIP ADDRESS\n\n10.0.0.1\n\ndisplay clock\n10:00:05\n")
+    index = SectionIndex(path, commands=['display clock', 'display arp'])
+    assert bodies(index) == [
+        ('display clock', 0, b"10:00:00"),
+        ('display arp', 0, b"IP ADDRESS\n\n10.0.0.1"),
+        ('display clock', 1, b"10:00:05"),
+    ]
+    assert set(index.by_key()) == {('display clock', 0), ('display arp', 0), ('display clock', 1)}
+
+
+def test_crlf_and_leading_blank_lines(tmp_path):
+    path = write(tmp_path, b"\r\n\r\ndisplay version\r\nVRP V8\r\n<R1>\r\n\r\ndisplay clock\r\n10:00\r\n<R1>\r\n\r\n")
+    index = SectionIndex(path)
+    assert bodies(index) == [('display version', 0, b"VRP V8\n<R1>"), ('display clock', 0, b"10:00\n<R1>")]
+
+
+def test_empty_file(tmp_path):
+    assert list(SectionIndex(write(tmp_path, b''))) == []
+
+
+def test_line_range_chunks_end_on_newlines():
+    data = b''.join(f'line {i}\n'.encode() for i in range(1000))
+    chunks = list(LineRange.from_bytes(data).chunks(chunk_size=100))
+    assert b''.join(chunks) == data
+    assert all(chunk.endswith(b'\n') for chunk in chunks)
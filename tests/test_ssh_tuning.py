@@ -0,0 +1,44 @@
+"""SSH 传输画像：asyncssh 后端按画像的压缩开关协商压缩算法"""
+import asyncio
+
+import pytest
+
+from connection.async_connection import AsyncSSHConnection
+from connection.ssh_tuning import TRANSPORT_PROFILES
+
+asyncssh = pytest.importorskip('asyncssh')
+
+
+class _PromptServer(asyncssh.SSHServer):
+    def begin_auth(self, username):
+        return True
+
+    def password_auth_supported(self):
+        return True
+
+    def validate_password(self, username, password):
+        return True
+
+
+async def _negotiated_compression(profile_name):
+    server_key = asyncssh.generate_private_key('ssh-ed25519')
+    server = await asyncssh.create_server(
+        _PromptServer, '127.0.0.1', 0, server_host_keys=[server_key],
+        process_factory=lambda process: process.stdout.write('<R1>'))
+    port = server.sockets[0].getsockname()[1]
+    connection = AsyncSSHConnection('127.0.0.1', port, 'admin', 'admin')
+    connection.transport_profile = TRANSPORT_PROFILES[profile_name]
+    try:
+        assert await connection._open(), connection.last_error
+        return connection._conn.get_extra_info('send_compression')
+    finally:
+        await connection._close()
+        server.close()
+        await server.wait_closed()
+
+
+@pytest.mark.parametrize('name', sorted(TRANSPORT_PROFILES))
+def test_asyncssh_compression_follows_profile(name):
+    algorithm = asyncio.run(_negotiated_compression(name))
+    expected = 'zlib@openssh.com' if TRANSPORT_PROFILES[name].compress else 'none'
+    assert algorithm == expected
@@ -0,0 +1,83 @@
+"""diff_table：按记录键的 hash join（行重排、重复键、续行、无表头）"""
+from compare.tables import diff_table, table_specs
+
+HEADER = [b"PHY: Physical", b"Interface                   PHY      Protocol  InUti OutUti   inErrors  outErrors"]
+
+
+def rows(*lines):
+    return [line.encode() for line in lines]
+
+
+def brief_specs():
+    return table_specs('huawei', 'display interface brief')
+
+
+def test_reordered_rows_are_not_changes():
+    before = HEADER + rows("GE0/0/1  up  up  0%  0%  0  0", "GE0/0/2  up  up  0%  0%  0  0", "GE0/0/3  down  down  0%  0%  0  0")
+    after = HEADER + rows("GE0/0/3  down  down  0%  0%  0  0", "GE0/0/1  up  up  0%  0%  0  0", "GE0/0/2  up  up  0%  0%  0  0")
+    result = diff_table(brief_specs(), before, after)
+    assert result is not None and result.spec.name == 'interface-brief'
+    assert not result
+    assert result.other_before == HEADER and result.other_after == HEADER
+
+
+def test_added_removed_and_changed_rows():
+    before = HEADER + rows("GE0/0/1  up  up  0%  0%  0  0", "GE0/0/2  up  up  0%  0%  0  0")
+    after = HEADER + rows("GE0/0/3  up  up  0%  0%  0  0", "GE0/0/1  down  down  0%  0%  0  0")
+    result = diff_table(brief_specs(), before, after)
+    assert result.added == [b"GE0/0/3  up  up  0%  0%  0  0"]
+    assert result.removed == [b"GE0/0/2  up  up  0%  0%  0  0"]
+    assert result.changed == ["~ GE0/0/1: PHY up -> down, Protocol up -> down"]
+    assert result.lines()[0].startswith("@@ 表格 interface-brief（键 Interface）：新增 1，删除 1，变更 1 @@")
+
+
+def test_duplicate_keys_pair_in_order():
+    before = HEADER + rows("GE0/0/1  up  up  1%  0%  0  0", "GE0/0/1  up  up  2%  0%  0  0", "GE0/0/1  up  up  3%  0%  0  0")
+    after = HEADER + rows("GE0/0/1  up  up  1%  0%  0  0", "GE0/0/1  up  up  5%  0%  0  0")
+    result = diff_table(brief_specs(), before, after)
+    # 同键按出现顺序配对：第 1 行相同、第 2 行变更、第 3 行删除
+    assert result.changed == ["~ GE0/0/1: InUti 2% -> 5%"]
+    assert result.removed == [b"GE0/0/1  up  up  3%  0%  0  0"]
+    assert result.added == []
+
+
+def test_duplicate_keys_added_on_after_side():
+    before = HEADER + rows("GE0/0/1  up  up  0%  0%  0  0")
+    after = HEADER + rows("GE0/0/1  up  up  0%  0%  0  0", "GE0/0/1  up  up  0%  0%  0  0")
+    result = diff_table(brief_specs(), before, after)
+    assert result.added == [b"GE0/0/1  up  up  0%  0%  0  0"]
+    assert result.removed == [] and result.changed == []
+
+
+def test_continuation_lines_belong_to_row():
+    specs = table_specs('huawei', 'display arp')
+    header = rows("IP ADDRESS      MAC ADDRESS     EXPIRE(M) TYPE        INTERFACE      VPN-INSTANCE",
+                  "                                          VLAN/CEVLAN PVC")
+    before = header + rows("10.0.0.2  00e0-fc12-3456  20  D-0  GE0/0/1", "                          100/-",
+                           "10.0.0.3  00e0-fc12-3457  20  D-0  GE0/0/1", "                          100/-")
+    after = header + rows("10.0.0.3  00e0-fc12-3457  15  D-0  GE0/0/1", "                          100/-",
+                          "10.0.0.2  00e0-fc12-3456  20  D-0  GE0/0/1", "                          200/-")
+    result = diff_table(specs, before, after)
+    assert result.spec.name == 'arp'
+    assert sorted(result.changed) == ["~ 10.0.0.2: VLAN/CEVLAN 100/- -> 200/-", "~ 10.0.0.3: EXPIRE(M) 20 -> 15"]
+
+
+def test_continuation_columns_named_independently_of_first_line():
+    specs = table_specs('huawei', 'display arp')
+    header = rows("IP ADDRESS      MAC ADDRESS     EXPIRE(M) TYPE        INTERFACE      VPN-INSTANCE",
+                  "                                          VLAN/CEVLAN PVC")
+    # 首行 VPN-INSTANCE 有值时续行字段不随之错位
+    before = header + rows("10.0.0.2  00e0-fc12-3456  20  D-0  GE0/0/1  vpn-a", "                          100/-  1/32",
+                           "10.0.0.3  00e0-fc12-3457  20  D-0  GE0/0/1  vpn-a", "                          100/-")
+    after = header + rows("10.0.0.2  00e0-fc12-3456  20  D-0  GE0/0/1  vpn-b", "                          100/-  1/33",
+                          "10.0.0.3  00e0-fc12-3457  20  D-0  GE0/0/1  vpn-a")
+    result = diff_table(specs, before, after)
+    assert result.changed == ["~ 10.0.0.2: VPN-INSTANCE vpn-a -> vpn-b, PVC 1/32 -> 1/33",
+                              "~ 10.0.0.3: 续行 100/- -> "]
+
+
+def test_missing_header_falls_back_to_lines():
+    before = rows("Error: Unrecognized command found at '^' position.")
+    after = HEADER + rows("GE0/0/1  up  up  0%  0%  0  0")
+    assert diff_table(brief_specs(), before, after) is None
+    assert diff_table(brief_specs(), after, before) is None
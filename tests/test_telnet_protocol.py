@@ -0,0 +1,78 @@
+"""TelnetProtocolParser：IAC 转义与跨读取拆分的协议序列"""
+from connection.telnet_protocol import (TelnetProtocolParser, IAC, DO, DONT, WILL, WONT, SB, SE,
+                                        OPT_ECHO, OPT_NAWS, OPT_TTYPE, TTYPE_IS, TTYPE_SEND)
+
+
+def feed_all(parser, chunks):
+    data, replies = b'', b''
+    for chunk in chunks:
+        d, r = parser.feed(chunk)
+        data += d
+        replies += r
+    return data, replies
+
+
+def test_plain_data_passes_through():
+    assert TelnetProtocolParser().feed(b'<R1>display version\r\n') == (b'<R1>display version\r\n', b'')
+
+
+def test_escape_doubles_iac():
+    assert TelnetProtocolParser.escape(b'a\xffb\xff') == b'a\xff\xffb\xff\xff'
+    assert TelnetProtocolParser.escape(b'no iac') == b'no iac'
+
+
+def test_escaped_iac_round_trip():
+    payload = bytes(range(256)) * 2
+    data, replies = TelnetProtocolParser().feed(TelnetProtocolParser.escape(payload))
+    assert data == payload
+    assert replies == b''
+
+
+def test_escaped_iac_split_across_reads():
+    data, replies = feed_all(TelnetProtocolParser(), [b'ab\xff', b'\xffcd'])
+    assert data == b'ab\xffcd'
+    assert replies == b''
+
+
+def test_negotiation_split_across_reads():
+    parser = TelnetProtocolParser()
+    data, replies = feed_all(parser, [b'x' + bytes([IAC]), bytes([WILL]), bytes([OPT_ECHO]) + b'y'])
+    assert data == b'xy'
+    assert replies == bytes([IAC, DO, OPT_ECHO])
+    assert parser.in_data
+
+
+def test_subnegotiation_split_across_reads():
+    parser = TelnetProtocolParser(terminal_type=b'VT100')
+    stream = bytes([IAC, SB, OPT_TTYPE, TTYPE_SEND, IAC, SE]) + b'login:'
+    data, replies = feed_all(parser, [stream[:2], stream[2:5], stream[5:]])
+    assert data == b'login:'
+    assert replies == bytes([IAC, SB, OPT_TTYPE, TTYPE_IS]) + b'VT100' + bytes([IAC, SE])
+
+
+def test_byte_by_byte_matches_single_feed():
+    stream = (b'Username:' + bytes([IAC, DO, OPT_NAWS, IAC, WILL, OPT_ECHO]) + b'\xff\xff'
+              + bytes([IAC, SB, OPT_TTYPE, TTYPE_SEND, IAC, SE, IAC, 241]) + b'end')
+    whole = TelnetProtocolParser().feed(stream)
+    single = feed_all(TelnetProtocolParser(), [stream[i:i + 1] for i in range(len(stream))])
+    assert single == whole
+    assert whole[0] == b'Username:\xffend'
+
+
+def test_no_repeated_replies():
+    parser = TelnetProtocolParser()
+    request = bytes([IAC, WILL, OPT_ECHO, IAC, DO, 99])
+    _, first = parser.feed(request)
+    _, second = parser.feed(request)
+    assert first == bytes([IAC, DO, OPT_ECHO, IAC, WONT, 99])
+    assert second == b''
+    _, reply = parser.feed(bytes([IAC, WONT, OPT_ECHO]))
+    assert reply == bytes([IAC, DONT, OPT_ECHO])
+
+
+def test_offered_naws_confirmed_without_extra_will():
+    parser = TelnetProtocolParser(width=255, height=0)
+    assert parser.initial_offers() == bytes([IAC, WILL, OPT_NAWS])
+    _, replies = parser.feed(bytes([IAC, DO, OPT_NAWS]))
+    # 宽度 255 (0x00FF) 中的 0xFF 需转义
+    assert replies == bytes([IAC, SB, OPT_NAWS, 0, IAC, IAC, 0, 0, IAC, SE])
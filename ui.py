@@ -1,23 +1,65 @@
 import os
 import subprocess
-import winreg
 import chardet
+try:
+    import winreg
+except ImportError:  # 非 Windows（如 Linux 跳板机）没有注册表，跳过 Beyond Compare 自动查找
+    winreg = None
 from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                              QLabel, QLineEdit, QPushButton, QRadioButton, QButtonGroup,
                              QTextEdit, QProgressBar, QMessageBox, QFileDialog,
                              QListWidget, QListWidgetItem, QGroupBox, QGridLayout, QDesktopWidget)
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QThread, pyqtSignal
 from datetime import datetime
 
 from connection.connection_worker import HighPerformanceConnectionWorker
+from connection.fleet_collector import DeviceInventory, ParallelCollectionManager
+from connection.session_pool import SessionPool
+from connection.device_profile import DeviceProfileCache
+from connection.jump_host import JumpHost
+from connection.rate_limiter import BandwidthScheduler
+from connection.command_history import CommandHistory
+from connection.capture_store import CaptureReader
+from compare import RuleBook, compare_files as compare_capture_files
 from config_loader import load_config, get_commands
 
+class CompareWorker(QThread):
+    """内置分段比对工作线程：大文件的分段比对与报告写入不阻塞界面"""
+    finished_signal = pyqtSignal(object, str)
+    error_signal = pyqtSignal(str)
+
+    def __init__(self, before_file, after_file, commands=None, normalize=True, rules_file='', tables=True):
+        super().__init__()
+        self.before_file = before_file
+        self.after_file = after_file
+        self.commands = commands
+        self.normalize = normalize
+        self.rules_file = rules_file
+        self.tables = tables
+
+    def run(self):
+        try:
+            rules = RuleBook.load(self.rules_file)
+            report = compare_capture_files(self.before_file, self.after_file, commands=self.commands,
+                                           normalize=self.normalize, rules=rules, tables=self.tables)
+            report_path = report.write(f"{os.path.splitext(self.after_file)[0]}.diff.txt")
+        except Exception as e:
+            self.error_signal.emit(str(e))
+            return
+        self.finished_signal.emit(report, report_path)
+
+
 class NetworkCutoverTool(QMainWindow):
     """主窗口类，负责UI的创建和事件处理"""
     def __init__(self):
         super().__init__()
         self.config = load_config()
+        DeviceProfileCache.instance().path = self.config.get('DEFAULT', 'device_profile_cache',
+                                                             fallback='device_profiles.json').strip('"')
+        CommandHistory.instance().path = self.config.get('DEFAULT', 'command_history_file',
+                                                         fallback='command_history.json').strip('"')
         self.connection_worker = None
+        self.fleet_manager = None
         self.before_files = []
         self.after_files = []
         self.init_ui()
@@ -137,7 +179,12 @@ class NetworkCutoverTool(QMainWindow):
         self.compare_btn.setMinimumHeight(40)
         self.compare_btn.clicked.connect(self.compare_files)
         self.compare_btn.setEnabled(False)
+        self.batch_btn = QPushButton("批量采集")
+        self.batch_btn.setObjectName("batchBtn")
+        self.batch_btn.setMinimumHeight(40)
+        self.batch_btn.clicked.connect(self.start_batch_collection)
         button_layout.addWidget(self.start_btn)
+        button_layout.addWidget(self.batch_btn)
         button_layout.addWidget(self.compare_btn)
         control_layout.addWidget(button_group, 1)
         
@@ -330,24 +377,164 @@ class NetworkCutoverTool(QMainWindow):
             os.makedirs(output_dir)
         
         self.start_btn.setEnabled(False)
+        self.batch_btn.setEnabled(False)
         self.progress_bar.setVisible(True)
         self.progress_bar.setValue(0)
         
-        self.connection_worker = HighPerformanceConnectionWorker(protocol, ip, port, username, password, commands, mode, output_dir)
+        pipeline_commands = self.config.getboolean('DEFAULT', 'pipeline_commands', fallback=False)
+        exec_channels = self.config.getint('DEFAULT', 'exec_channels', fallback=0)
+        self.connection_worker = HighPerformanceConnectionWorker(protocol, ip, port, username, password, commands, mode, output_dir,
+                                                                 pipeline_commands=pipeline_commands,
+                                                                 exec_channels=exec_channels,
+                                                                 reuse_session=self._reuse_sessions_enabled(),
+                                                                 transport_profile=self.config.get('DEFAULT', 'ssh_transport_profile', fallback='auto'),
+                                                                 jump_host=self._configured_jump_host(username, password) if protocol == 'ssh' else None,
+                                                                 resume=self.config.getboolean('DEFAULT', 'resume_interrupted', fallback=False),
+                                                                 scheduler=self._bandwidth_scheduler(),
+                                                                 use_command_history=self.config.getboolean('DEFAULT', 'command_history', fallback=True),
+                                                                 output_format=self.config.get('DEFAULT', 'output_format', fallback='text').strip().lower(),
+                                                                 device_charset=self.config.get('DEFAULT', 'device_charset', fallback='auto'))
+        self._apply_output_limits(self.connection_worker)
         self.connection_worker.progress_signal.connect(self.update_progress)
         self.connection_worker.finished_signal.connect(self.collection_finished)
         self.connection_worker.error_signal.connect(self.handle_error)
         self.connection_worker.start()
     
+    def start_batch_collection(self):
+        """按设备清单批量并行采集"""
+        inventory_file, _ = QFileDialog.getOpenFileName(
+            self, "选择设备清单", "",
+            "设备清单 (*.csv *.ini *.cfg *.txt);;所有文件 (*)"
+        )
+        if not inventory_file:
+            return
+
+        devices, errors = DeviceInventory.load(inventory_file)
+        for error in errors:
+            self.log_message(f"设备清单: {error}")
+        if not devices:
+            self.show_styled_message_box(QMessageBox.Warning, "警告", "设备清单中没有有效设备")
+            return
+
+        command_file = self.command_file_input.text().strip()
+        commands, error = self.get_commands_from_file(command_file)
+        if error or not commands:
+            self.show_styled_message_box(QMessageBox.Warning, "警告", error or "文件中没有有效命令")
+            return
+
+        mode = "变更前" if self.mode_before.isChecked() else "变更后"
+        output_dir = f"变更-{datetime.now().strftime('%Y%m%d')}"
+        max_concurrency = self.config.getint('DEFAULT', 'max_concurrency', fallback=16)
+
+        self.start_btn.setEnabled(False)
+        self.batch_btn.setEnabled(False)
+        self.progress_bar.setVisible(True)
+        self.progress_bar.setValue(0)
+        self.log_message(f"批量采集开始: 设备 {len(devices)} 台, 并发上限 {max_concurrency}")
+
+        self.fleet_manager = ParallelCollectionManager(devices, commands, mode, output_dir, max_concurrency, self)
+        self.fleet_manager.pipeline_commands = self.config.getboolean('DEFAULT', 'pipeline_commands', fallback=False)
+        self.fleet_manager.exec_channels = self.config.getint('DEFAULT', 'exec_channels', fallback=0)
+        self.fleet_manager.reuse_session = self._reuse_sessions_enabled()
+        self.fleet_manager.transport_profile = self.config.get('DEFAULT', 'ssh_transport_profile', fallback='auto')
+        self.fleet_manager.default_jump_host = self.config.get('DEFAULT', 'jump_host', fallback='').strip()
+        self.fleet_manager.jump_username = self.config.get('DEFAULT', 'jump_username', fallback='')
+        self.fleet_manager.jump_password = self.config.get('DEFAULT', 'jump_password', fallback='')
+        self.fleet_manager.jump_max_channels = self.config.getint('DEFAULT', 'jump_max_channels', fallback=10)
+        self.fleet_manager.resume = self.config.getboolean('DEFAULT', 'resume_interrupted', fallback=False)
+        self.fleet_manager.scheduler = self._bandwidth_scheduler()
+        self.fleet_manager.use_command_history = self.config.getboolean('DEFAULT', 'command_history', fallback=True)
+        self.fleet_manager.output_format = self.config.get('DEFAULT', 'output_format', fallback='text').strip().lower()
+        self.fleet_manager.device_charset = self.config.get('DEFAULT', 'device_charset', fallback='auto')
+        self.fleet_manager.async_sessions = self.config.getboolean('DEFAULT', 'async_sessions', fallback=False)
+        self._apply_output_limits(self.fleet_manager)
+        self.fleet_manager.progress_signal.connect(self.update_progress)
+        self.fleet_manager.device_finished_signal.connect(
+            lambda ip, filepath, success, stats, m=mode: self.batch_device_finished(ip, filepath, success, m))
+        self.fleet_manager.all_finished_signal.connect(self.batch_collection_finished)
+        self.fleet_manager.start()
+
+    def batch_device_finished(self, ip, filepath, success, mode):
+        """批量采集中单台设备完成：仅记录日志并刷新文件列表，不弹窗"""
+        if not success or not filepath:
+            return
+        if mode == "变更前":
+            self.before_files.append(filepath)
+            self.refresh_file_list(self.before_list, self.before_files)
+        else:
+            self.after_files.append(filepath)
+            self.refresh_file_list(self.after_list, self.after_files)
+        self.compare_btn.setEnabled(len(self.before_files) > 0 and len(self.after_files) > 0)
+
+    def batch_collection_finished(self, summary):
+        """批量采集全部完成"""
+        self.start_btn.setEnabled(True)
+        self.batch_btn.setEnabled(True)
+        self.progress_bar.setVisible(False)
+        text = (f"批量采集完成：成功 {summary['succeeded_devices']} 台，失败 {summary['failed_devices']} 台，"
+                f"耗时 {summary['duration']}s，共 {summary['total_bytes']} 字节")
+        self.log_message(text)
+        for device in summary.get('devices', []):
+            if not device.get('success'):
+                self.log_message(f"失败设备 {device['ip']}:{device['port']} {device.get('error', '')}")
+        self._log_oversize_commands(summary.get('oversize_commands'))
+        self.show_styled_message_box(QMessageBox.Information, "完成", text)
+
+    def _reuse_sessions_enabled(self):
+        """读取会话复用配置，同时按配置调整会话池的空闲超时"""
+        enabled = self.config.getboolean('DEFAULT', 'reuse_sessions', fallback=True)
+        if enabled:
+            SessionPool.instance().idle_timeout = self.config.getint('DEFAULT', 'session_idle_timeout', fallback=900)
+        return enabled
+
+    def _configured_jump_host(self, username, password):
+        """配置中的跳板机（未配置时返回 None）；跳板机凭据留空时使用设备凭据"""
+        address = self.config.get('DEFAULT', 'jump_host', fallback='').strip()
+        if not address:
+            return None
+        host, port = JumpHost.parse_address(address)
+        return JumpHost.shared(host, port,
+                               self.config.get('DEFAULT', 'jump_username', fallback='') or username,
+                               self.config.get('DEFAULT', 'jump_password', fallback='') or password,
+                               self.config.getint('DEFAULT', 'jump_max_channels', fallback=10))
+
+    def _bandwidth_scheduler(self):
+        """按配置创建本次采集的带宽调度（设备/站点预算与大输出命令并发上限均为 0 时返回 None）"""
+        scheduler = BandwidthScheduler(
+            self.config.getint('DEFAULT', 'device_bandwidth_kbps', fallback=0),
+            BandwidthScheduler.parse_budgets(self.config.get('DEFAULT', 'site_bandwidth_kbps', fallback='')),
+            self.config.getint('DEFAULT', 'large_output_concurrency', fallback=0))
+        return scheduler if scheduler.enabled else None
+
+    def _apply_output_limits(self, target):
+        """按配置设置单条命令输出的软上限/硬上限与内存预算（MB → KB）"""
+        target.soft_output_kb = self.config.getint('DEFAULT', 'output_soft_limit_mb', fallback=48) * 1024
+        target.max_output_kb = self.config.getint('DEFAULT', 'output_hard_limit_mb', fallback=0) * 1024
+        target.output_memory_kb = self.config.getint('DEFAULT', 'output_memory_mb', fallback=16) * 1024
+
+    def _log_oversize_commands(self, entries):
+        """列出输出超过软上限的命令（已完整保存，仅提示）"""
+        for entry in entries or []:
+            where = f"{entry['ip']} " if entry.get('ip') else ""
+            self.log_message(f"大输出命令 {where}{entry['command']}: {entry['bytes'] / 1024 / 1024:.1f}MB（超过软上限，已完整保存）")
+
+    def closeEvent(self, event):
+        """窗口关闭时释放会话池中的空闲会话与跳板机共享传输，并保存命令执行历史"""
+        SessionPool.instance().close_all()
+        JumpHost.close_all()
+        CommandHistory.instance().save(force=True)
+        super().closeEvent(event)
+
     def update_progress(self, value, message):
         """更新进度条和状态标签"""
         self.progress_bar.setValue(value)
         self.status_label.setText(message)
         self.log_message(message)
     
-    def collection_finished(self, filepath, success, mode):
+    def collection_finished(self, filepath, success, mode, stats=None):
         """采集完成后的处理"""
         self.start_btn.setEnabled(True)
+        self.batch_btn.setEnabled(True)
         self.progress_bar.setVisible(False)
         
         if success:
@@ -360,6 +547,7 @@ class NetworkCutoverTool(QMainWindow):
             
             self.compare_btn.setEnabled(len(self.before_files) > 0 and len(self.after_files) > 0)
             self.log_message(f"采集完成（{mode}），文件已保存到: {filepath}")
+            self._log_oversize_commands((stats or {}).get('oversize_commands'))
             self.show_styled_message_box(QMessageBox.Information, "完成", f"采集完成，文件已保存到: {filepath}")
         else:
             self.log_message("采集失败")
@@ -368,6 +556,7 @@ class NetworkCutoverTool(QMainWindow):
     def handle_error(self, error_message):
         """处理采集过程中的错误"""
         self.start_btn.setEnabled(True)
+        self.batch_btn.setEnabled(True)
         self.progress_bar.setVisible(False)
         self.log_message(f"错误: {error_message} 连接失败!")
         self.show_styled_message_box(QMessageBox.Information, "错误", f"{error_message} 连接失败，请检查配置参数!")
@@ -385,6 +574,8 @@ class NetworkCutoverTool(QMainWindow):
         """查看文件内容"""
         filepath = item.data(256)
         try:
+            # 压缩采集容器先导出为同名纯文本
+            filepath = CaptureReader.as_text_file(filepath)
             with open(filepath, 'r', encoding='utf-8') as f:
                 content = f.read()
             
@@ -400,7 +591,7 @@ class NetworkCutoverTool(QMainWindow):
             self.show_styled_message_box(QMessageBox.Warning, "错误", f"无法读取文件: {str(e)}")
     
     def compare_files(self):
-        """使用Beyond Compare比对文件"""
+        """比对文件：默认使用内置分段比对，compare_tool = beyond_compare 时调用 Beyond Compare"""
         before_item = self.before_list.currentItem()
         after_item = self.after_list.currentItem()
 
@@ -422,6 +613,16 @@ class NetworkCutoverTool(QMainWindow):
 
         before_file = before_item.data(256)
         after_file = after_item.data(Qt.UserRole)
+        if self.config.get('DEFAULT', 'compare_tool', fallback='builtin').strip().lower() != 'beyond_compare':
+            self.compare_builtin(before_file, after_file)
+            return
+        try:
+            # 压缩采集容器导出为原有纯文本布局后再交给 Beyond Compare
+            before_file = CaptureReader.as_text_file(before_file)
+            after_file = CaptureReader.as_text_file(after_file)
+        except Exception as e:
+            self.show_styled_message_box(QMessageBox.Warning, "错误", f"导出采集容器失败: {str(e)}")
+            return
         
         bc_path = self._get_bc_path()
         
@@ -436,6 +637,50 @@ class NetworkCutoverTool(QMainWindow):
         else:
             self.show_styled_message_box(QMessageBox.Warning, "配置错误", "找不到Beyond Compare程序。\n请在config.ini中配置正确路径，或确保已安装Beyond Compare。")
 
+    def compare_builtin(self, before_file, after_file):
+        """内置分段比对：在工作线程中按命令块配对比对，完成后报告保存在变更后文件旁并在只读窗口中显示"""
+        commands = None
+        command_file = self.command_file_input.text().strip()
+        if command_file and os.path.exists(command_file):
+            commands, _ = self.get_commands_from_file(command_file)
+        worker = CompareWorker(
+            before_file, after_file, commands=commands,
+            normalize=self.config.getboolean('DEFAULT', 'compare_normalize', fallback=True),
+            rules_file=self.config.get('DEFAULT', 'compare_rules_file', fallback='').strip('"'),
+            tables=self.config.getboolean('DEFAULT', 'compare_tables', fallback=True))
+        worker.finished_signal.connect(self.compare_finished)
+        worker.error_signal.connect(self.compare_error)
+        # 保持引用直到下一次比对，避免线程收尾前被回收；比对期间禁用比对按钮
+        self._compare_worker = worker
+        self.compare_btn.setEnabled(False)
+        self.log_message(f"开始比对 {os.path.basename(before_file)} 和 {os.path.basename(after_file)}...")
+        worker.start()
+
+    def compare_finished(self, report, report_path):
+        """内置比对完成：记录摘要并在非模态只读窗口中显示报告"""
+        worker = self._compare_worker
+        self.compare_btn.setEnabled(len(self.before_files) > 0 and len(self.after_files) > 0)
+        before_name, after_name = os.path.basename(worker.before_file), os.path.basename(worker.after_file)
+        self.log_message(f"比对 {before_name} 和 {after_name}: {report.summary()}")
+        self.log_message(f"比对报告已保存到: {report_path}")
+
+        dialog = QTextEdit()
+        dialog.setWindowTitle(f"比对结果 - {before_name} ↔ {after_name}")
+        dialog.setPlainText(report.text())
+        dialog.setReadOnly(True)
+        dialog.setLineWrapMode(QTextEdit.NoWrap)
+        dialog.resize(1000, 700)
+        dialog.setAttribute(Qt.WA_DeleteOnClose)
+        dialog.show()
+        # 保持引用，避免非模态窗口被回收
+        self._compare_dialog = dialog
+
+    def compare_error(self, message):
+        """内置比对失败"""
+        self.compare_btn.setEnabled(len(self.before_files) > 0 and len(self.after_files) > 0)
+        self.log_message(f"文件比对失败: {message}")
+        self.show_styled_message_box(QMessageBox.Warning, "错误", f"文件比对失败: {message}")
+
     def _get_bc_path(self):
         """获取Beyond Compare路径，优先从配置读取，失败则自动查找"""
         # 1. 优先从config.ini获取
@@ -455,8 +700,8 @@ class NetworkCutoverTool(QMainWindow):
 
     def __get_auto_bc_path(self):
         """自动查找Beyond Compare路径"""
-        # 2a. 从注册表查找
-        reg_paths = [
+        # 2a. 从注册表查找（仅 Windows）
+        reg_paths = [] if winreg is None else [
             (winreg.HKEY_CURRENT_USER, r"Software\Scooter Software\Beyond Compare 4"),
             (winreg.HKEY_LOCAL_MACHINE, r"Software\Scooter Software\Beyond Compare 4"),
             (winreg.HKEY_LOCAL_MACHINE, r"Software\WOW6432Node\Scooter Software\Beyond Compare 4")
@@ -487,7 +732,7 @@ class NetworkCutoverTool(QMainWindow):
                     path, _ = winreg.QueryValueEx(key, "ExePath")
                     if path:
                         return path.strip('"')
-            except WindowsError:
+            except OSError:
                 continue # 找不到键，继续下一个视图
         return None
 
@@ -511,6 +756,8 @@ class NetworkCutoverTool(QMainWindow):
             QPushButton:disabled { background-color: #bdc3c7; }
             QPushButton#startBtn { background-color: #27ae60; }
             QPushButton#startBtn:hover { background-color: #229954; }
+            QPushButton#batchBtn { background-color: #8e44ad; }
+            QPushButton#batchBtn:hover { background-color: #7d3c98; }
             QPushButton#compareBtn { background-color: #e74c3c; }
             QPushButton#compareBtn:hover { background-color: #c0392b; }
             QLineEdit { padding: 6px; border: 2px solid #bdc3c7; border-radius: 4px; }